@@ -19,8 +19,9 @@ if config.config_file_name is not None:
 
 # add your model's MetaData object here
 # for 'autogenerate' support
-from models import Base
-from database import DATABASE_URL
+from models import Base, DEFAULT_DATABASE_URL
+
+DATABASE_URL = os.getenv("DATABASE_URL", DEFAULT_DATABASE_URL)
 
 target_metadata = Base.metadata
 
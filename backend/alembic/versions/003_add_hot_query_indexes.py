@@ -0,0 +1,40 @@
+"""Add indexes for hot query shapes (orders, order items, stock movements)
+
+Revision ID: 003_add_hot_query_indexes
+Revises: 002_add_product_stock
+Create Date: 2026-10-17
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '003_add_hot_query_indexes'
+down_revision = '002_add_product_stock'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Dashboard, raporlar ve mutfak akışı: durum + tarih filtreleri
+    op.create_index('ix_orders_status_created_at', 'orders', ['status', 'created_at'], unique=False)
+    op.create_index('ix_orders_created_at', 'orders', ['created_at'], unique=False)
+    op.create_index('ix_orders_updated_at', 'orders', ['updated_at'], unique=False)
+    # Açık masalar ve masa detayı: masa + durum
+    op.create_index('ix_orders_table_id_status', 'orders', ['table_id', 'status'], unique=False)
+    # Sipariş kalemi join'leri ve ürün bazlı raporlar
+    op.create_index('ix_order_items_order_id', 'order_items', ['order_id'], unique=False)
+    op.create_index('ix_order_items_product_id', 'order_items', ['product_id'], unique=False)
+    # Günlük stok hareketi raporu
+    op.create_index('ix_stock_movements_created_at', 'stock_movements', ['created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_stock_movements_created_at', table_name='stock_movements')
+    op.drop_index('ix_order_items_product_id', table_name='order_items')
+    op.drop_index('ix_order_items_order_id', table_name='order_items')
+    op.drop_index('ix_orders_table_id_status', table_name='orders')
+    op.drop_index('ix_orders_updated_at', table_name='orders')
+    op.drop_index('ix_orders_created_at', table_name='orders')
+    op.drop_index('ix_orders_status_created_at', table_name='orders')
@@ -0,0 +1,59 @@
+"""Add payment split and version to daily sales summary, unique (date, product) to product summary
+
+Revision ID: 004_add_daily_summary_payment_columns
+Revises: 003_add_hot_query_indexes
+Create Date: 2026-10-17
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '004_add_daily_summary_payment_columns'
+down_revision = '003_add_hot_query_indexes'
+branch_labels = None
+depends_on = None
+
+
+def _existing(table):
+    # Özet tabloları uygulama açılışında create_all ile oluşturulur; henüz yoksa
+    # create_all onları güncel kolonlarla kuracağı için burada atlanır.
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(table):
+        return None
+    return inspector
+
+
+def upgrade():
+    inspector = _existing('daily_sales_summary')
+    if inspector is not None:
+        columns = {c['name'] for c in inspector.get_columns('daily_sales_summary')}
+        if 'cash_total' not in columns:
+            op.add_column('daily_sales_summary', sa.Column('cash_total', sa.Float(), nullable=True, server_default='0'))
+        if 'card_total' not in columns:
+            op.add_column('daily_sales_summary', sa.Column('card_total', sa.Float(), nullable=True, server_default='0'))
+        if 'version' not in columns:
+            op.add_column('daily_sales_summary', sa.Column('version', sa.Integer(), nullable=True, server_default='0'))
+
+    inspector = _existing('daily_product_summary')
+    if inspector is not None:
+        indexes = {i['name'] for i in inspector.get_indexes('daily_product_summary')}
+        if 'ux_daily_product_summary_date_product' not in indexes:
+            # Tekil indeksten önce olası mükerrer özet satırlarını temizle
+            op.execute("""
+                DELETE FROM daily_product_summary
+                WHERE id NOT IN (SELECT MIN(id) FROM daily_product_summary GROUP BY date, product_id)
+            """)
+            op.create_index('ux_daily_product_summary_date_product', 'daily_product_summary',
+                            ['date', 'product_id'], unique=True)
+
+
+def downgrade():
+    if _existing('daily_product_summary') is not None:
+        op.drop_index('ux_daily_product_summary_date_product', table_name='daily_product_summary')
+    if _existing('daily_sales_summary') is not None:
+        op.drop_column('daily_sales_summary', 'version')
+        op.drop_column('daily_sales_summary', 'card_total')
+        op.drop_column('daily_sales_summary', 'cash_total')
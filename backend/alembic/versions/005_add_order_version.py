@@ -0,0 +1,29 @@
+"""Add version column to orders table
+
+Revision ID: 005_add_order_version
+Revises: 004_add_daily_summary_payment_columns
+Create Date: 2026-10-17
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005_add_order_version'
+down_revision = '004_add_daily_summary_payment_columns'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Sipariş her değiştiğinde artan sürüm; istemciler eski WebSocket olaylarını atlar
+    op.add_column('orders', sa.Column('version', sa.Integer(), nullable=True, server_default='1'))
+
+    # Mevcut kayıtlar 1. sürümden başlar
+    op.execute("UPDATE orders SET version = 1 WHERE version IS NULL")
+
+
+def downgrade():
+    op.drop_column('orders', 'version')
@@ -0,0 +1,28 @@
+"""Add pin_fingerprint column and unique index to users table
+
+Revision ID: 006_add_user_pin_fingerprint
+Revises: 005_add_order_version
+Create Date: 2026-10-17
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '006_add_user_pin_fingerprint'
+down_revision = '005_add_order_version'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Garson PIN'inin HMAC'i; mevcut garsonlar boş kalır ve ilk PIN girişinde doldurulur
+    op.add_column('users', sa.Column('pin_fingerprint', sa.String(), nullable=True))
+    op.create_index('ix_users_pin_fingerprint', 'users', ['pin_fingerprint'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_users_pin_fingerprint', table_name='users')
+    op.drop_column('users', 'pin_fingerprint')
@@ -4,9 +4,17 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import exists
 from sqlalchemy.orm import Session
-from models import User, get_session
+from models import User, UserRole, get_sessionmaker
+from cache_utils import TTLCache
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
+import hashlib
+import hmac
 import os
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -15,9 +23,26 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 240
+# Doğrulanmış kullanıcıların önbellekte kalma süresi (sn)
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+
+# Garson PIN parmak izi anahtarı; tanımlı değilse SECRET_KEY'den türetilir (değişirse PIN'ler yeniden atanmalı)
+PIN_HMAC_KEY = (os.getenv("PIN_HMAC_KEY") or hmac.new(SECRET_KEY.encode("utf-8"), b"pin-fingerprint", hashlib.sha256).hexdigest()).encode("utf-8")
 
 # Password hashing - Use pbkdf2_sha256 instead of bcrypt for Windows compatibility
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+# Tur sayısı ayardan gelir; farklı turla kaydedilmiş hash'ler girişte yeniden hesaplanır
+PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", "29000"))
+# Aynı anda çalışan hash işlemi (iş parçacığı) ve kuyrukta bekleyebilecek en fazla işlem
+AUTH_HASH_WORKERS = max(1, int(os.getenv("AUTH_HASH_WORKERS", str(min(4, os.cpu_count() or 1)))))
+AUTH_HASH_MAX_PENDING = max(AUTH_HASH_WORKERS, int(os.getenv("AUTH_HASH_MAX_PENDING", "64")))
+
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    pbkdf2_sha256__default_rounds=PASSWORD_HASH_ROUNDS,
+    pbkdf2_sha256__min_rounds=PASSWORD_HASH_ROUNDS,
+    pbkdf2_sha256__max_rounds=PASSWORD_HASH_ROUNDS,
+)
 security = HTTPBearer()
 security_optional = HTTPBearer(auto_error=False)
 
@@ -27,6 +52,112 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+_hash_executor = None
+_hash_lock = threading.Lock()
+_hash_pending = 0
+
+def _get_hash_executor() -> ThreadPoolExecutor:
+    global _hash_executor
+    if _hash_executor is None:
+        with _hash_lock:
+            if _hash_executor is None:
+                _hash_executor = ThreadPoolExecutor(max_workers=AUTH_HASH_WORKERS, thread_name_prefix="pw-hash")
+    return _hash_executor
+
+async def _run_hash(fn, *args):
+    """pbkdf2 işlemini event loop dışında, sınırlı havuzda çalıştırır; kuyruk doluysa 503 döner"""
+    global _hash_pending
+    with _hash_lock:
+        if _hash_pending >= AUTH_HASH_MAX_PENDING:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent logins, try again",
+                headers={"Retry-After": "1"},
+            )
+        _hash_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_hash_executor(), partial(fn, *args))
+    finally:
+        with _hash_lock:
+            _hash_pending -= 1
+
+async def hash_password(password: str) -> str:
+    return await _run_hash(pwd_context.hash, password)
+
+async def verify_and_update(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """(doğru mu, yeni hash); yeni hash yalnızca kayıtlı hash güncel ayarlarla üretilmemişse döner"""
+    return await _run_hash(pwd_context.verify_and_update, plain_password, hashed_password)
+
+async def authenticate_password(user: User, plain_password: str) -> bool:
+    """Parolayı doğrular; hash eski ayarlardaysa kullanıcıya yenisini yazar (çağıran commit eder)"""
+    ok, new_hash = await verify_and_update(plain_password, user.password_hash)
+    if ok and new_hash:
+        user.password_hash = new_hash
+    return ok
+
+def shutdown_hash_pool():
+    global _hash_executor
+    with _hash_lock:
+        if _hash_executor is not None:
+            _hash_executor.shutdown(wait=True)
+            _hash_executor = None
+
+def pin_fingerprint(pin: str) -> str:
+    """PIN'in anahtarlı HMAC'i: benzersizlik ve PIN ile giriş tek indeks aramasıyla yapılır"""
+    return hmac.new(PIN_HMAC_KEY, pin.encode("utf-8"), hashlib.sha256).hexdigest()
+
+# Parmak izi olmayan eski garson kaydı kaldı mı; None ise bilinmiyor, sonraki aramada bir kez sorulur
+_legacy_pins: Optional[bool] = None
+
+def _has_legacy_pins(db: Session) -> bool:
+    global _legacy_pins
+    if _legacy_pins is None:
+        _legacy_pins = bool(db.query(exists().where(User.role == UserRole.WAITER, User.pin_fingerprint.is_(None))).scalar())
+    return _legacy_pins
+
+def backfill_pin_fingerprint(db: Session, user: User, pin: str) -> bool:
+    """Garson kaydına güncel parmak izini yazar (çağıran commit eder); PIN başka kullanıcıdaysa yazmaz"""
+    global _legacy_pins
+    fingerprint = pin_fingerprint(pin)
+    if db.query(User.id).filter(User.pin_fingerprint == fingerprint).first() is not None:
+        return False
+    user.pin_fingerprint = fingerprint
+    _legacy_pins = None
+    return True
+
+async def _find_legacy_user(db: Session, pin: str) -> Optional[User]:
+    """Parmak izi olmayan eski garson kayıtlarında PIN'in sahibi; bulunursa parmak izi yazılır.
+
+    Her kayıt için pbkdf2 doğrulaması demektir; eski kayıt kalmadığı bilindiğinde tarama hiç yapılmaz.
+    """
+    global _legacy_pins
+    if not _has_legacy_pins(db):
+        return None
+    legacy_users = db.query(User).filter(User.role == UserRole.WAITER, User.pin_fingerprint.is_(None)).all()
+    if not legacy_users:
+        _legacy_pins = False
+    for legacy in legacy_users:
+        if await authenticate_password(legacy, pin):
+            backfill_pin_fingerprint(db, legacy, pin)
+            return legacy
+    return None
+
+async def find_user_by_pin(db: Session, pin: str) -> Optional[User]:
+    """PIN'in sahibi: önce parmak izi indeksinden, yoksa parmak izi olmayan eski garson kayıtlarından"""
+    user = db.query(User).filter(User.pin_fingerprint == pin_fingerprint(pin)).first()
+    if user is not None:
+        return user if await authenticate_password(user, pin) else None
+    return await _find_legacy_user(db, pin)
+
+async def pin_in_use(db: Session, pin: str) -> bool:
+    """Yeni PIN için benzersizlik kontrolü. Eski kayıt kaldığı sürece onların hash'leri de
+    denenir: aksi halde yeni PIN eski bir garsonunkiyle çakışır ve PIN ile giriş yanlış
+    kullanıcıya token verir."""
+    if db.query(User.id).filter(User.pin_fingerprint == pin_fingerprint(pin)).first() is not None:
+        return True
+    return await _find_legacy_user(db, pin) is not None
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -34,7 +165,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -56,27 +187,104 @@ def verify_token(token: str) -> dict:
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_session)):
-    token = credentials.credentials
-    payload = verify_token(token)
+def token_claims(user: User) -> dict:
+    """Token'a gömülen imzalı kimlik bilgileri: rol ve aktiflik veritabanına gitmeden kontrol edilir"""
+    return {
+        "sub": user.username,
+        "uid": user.id,
+        "role": user.role.value if user.role else None,
+        "active": bool(user.is_active),
+    }
+
+class Principal:
+    """Doğrulanmış kullanıcının istekler arasında paylaşılan salt okunur kopyası"""
+    __slots__ = ("id", "username", "email", "full_name", "role", "is_active", "created_at")
+
+    def __init__(self, user: User):
+        self.id = user.id
+        self.username = user.username
+        self.email = user.email
+        self.full_name = user.full_name
+        self.role = user.role
+        self.is_active = user.is_active
+        self.created_at = user.created_at
+
+# Kullanıcı adına göre süreç içi önbellek; kullanıcıyı değiştiren yollar invalidate_principal() çağırır.
+# Diğer worker'lardaki kopyalar en geç AUTH_CACHE_TTL saniye sonra yenilenir.
+_principals = TTLCache(AUTH_CACHE_TTL, max_entries=1024)
+_principal_lock = threading.Lock()
+_generation = 0
+
+def invalidate_principal(username: Optional[str] = None):
+    """Tek kullanıcının (ya da tümünün) önbellekteki kaydını siler"""
+    global _generation
+    with _principal_lock:
+        _generation += 1
+        _principals.invalidate(username)
+
+def _credentials_error(detail: str = "Could not validate credentials"):
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def _load_principal(payload: dict) -> Optional[Principal]:
     username = payload.get("sub")
-    
-    user = db.query(User).filter(User.username == username).first()
+    principal = _principals.get(username)
+    if principal is None:
+        with _principal_lock:
+            generation = _generation
+        db = get_sessionmaker()()
+        try:
+            user = db.query(User).filter(User.username == username).first()
+            principal = Principal(user) if user is not None else None
+        finally:
+            db.close()
+        if principal is None:
+            return None
+        # Okuma sırasında kullanıcı değiştiyse eski kopyayı önbelleğe yazma
+        with _principal_lock:
+            if generation == _generation:
+                _principals.set(username, principal)
+    # Aynı adla (SQLite'ta aynı id ile) yeniden oluşturulmuş kullanıcı eski token'ı kullanamaz
+    uid = payload.get("uid")
+    if uid is not None and uid != principal.id:
+        return None
+    iat = payload.get("iat")
+    if iat is not None and principal.created_at is not None and iat < int(principal.created_at.timestamp()):
+        return None
+    return principal
+
+def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    payload = verify_token(credentials.credentials)
+    user = _load_principal(payload)
     if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise _credentials_error("User not found")
     return user
 
-def get_current_active_user(current_user: User = Depends(get_current_user)):
+def get_current_active_user(current_user: Principal = Depends(get_current_user)):
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
 def require_role(allowed_roles: list):
-    def role_checker(current_user: User = Depends(get_current_active_user)):
+    def role_checker(credentials: HTTPAuthorizationCredentials = Depends(security)):
+        payload = verify_token(credentials.credentials)
+        # İmzalı claim'lerle erken ret: yetkisiz istek önbelleğe / veritabanına ulaşmaz
+        if payload.get("active") is False:
+            raise HTTPException(status_code=400, detail="Inactive user")
+        claimed_role = payload.get("role")
+        if claimed_role is not None and claimed_role not in allowed_roles:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not enough permissions"
+            )
+        current_user = _load_principal(payload)
+        if current_user is None:
+            raise _credentials_error("User not found")
+        if not current_user.is_active:
+            raise HTTPException(status_code=400, detail="Inactive user")
         if current_user.role not in allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -85,16 +293,13 @@ def require_role(allowed_roles: list):
         return current_user
     return role_checker
 
-def optional_current_user(credentials: HTTPAuthorizationCredentials | None = Depends(security_optional), db: Session = Depends(get_session)):
+def optional_current_user(credentials: HTTPAuthorizationCredentials | None = Depends(security_optional)):
     try:
         if not credentials:
             return None
-        token = credentials.credentials
-        payload = verify_token(token)
-        username = payload.get("sub")
-        if not username:
+        payload = verify_token(credentials.credentials)
+        if not payload.get("sub"):
             return None
-        user = db.query(User).filter(User.username == username).first()
-        return user
+        return _load_principal(payload)
     except Exception:
         return None
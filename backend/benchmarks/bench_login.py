@@ -0,0 +1,68 @@
+"""
+Eşzamanlı PIN girişleri: parola hash havuzu ve event loop gecikmesi (user-023).
+
+Garsonlar oluşturulur, ardından hepsi aynı anda /api/auth/pin-login çağırır. Giriş
+başına gecikme (p50/p95), toplam giriş/sn ve event loop'un en fazla ne kadar
+bloklandığı (5 ms'lik uyku sondasının gecikmesi) yazdırılır. Hash işleri havuzda
+çalıştığı için loop gecikmesi tek bir pbkdf2 süresinin çok altında kalmalıdır.
+
+    python benchmarks/bench_login.py [garson_sayısı] [--workers N] [--rounds N]
+"""
+import argparse
+import asyncio
+import time
+from harness import percentile, running_app
+
+PROBE_INTERVAL = 0.005
+
+async def _burst(app, waiters, pin_only: bool):
+    import httpx
+    lag = 0.0
+    done = asyncio.Event()
+
+    async def probe():
+        nonlocal lag
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(PROBE_INTERVAL)
+            lag = max(lag, time.perf_counter() - started - PROBE_INTERVAL)
+
+    async def login(client, waiter):
+        body = {"pin": waiter["pin"]} if pin_only else {"username": waiter["username"], "pin": waiter["pin"]}
+        started = time.perf_counter()
+        response = await client.post("/api/auth/pin-login", json=body)
+        return time.perf_counter() - started, response.status_code
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        prober = asyncio.create_task(probe())
+        await asyncio.sleep(0.02)
+        started = time.perf_counter()
+        results = await asyncio.gather(*(login(client, w) for w in waiters))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await prober
+    return elapsed, [r[0] for r in results], [r[1] for r in results], lag
+
+def main_bench(count: int, env: dict, runs: int = 3):
+    with running_app(**env) as (client, headers, main):
+        waiters = [client.post("/api/waiters", json={"full_name": f"Bench {i}"}, headers=headers).json() for i in range(count)]
+        print(f"waiters={count} env={env or 'default'}")
+        for pin_only in (False, True):
+            for _ in range(runs):
+                elapsed, latencies, codes, lag = asyncio.run(_burst(main.app, waiters, pin_only))
+                failed = sum(1 for code in codes if code != 200)
+                print(f"{'pin-only' if pin_only else 'username+pin':13} {count / elapsed:6.0f} login/s  p50 {percentile(latencies, 50) * 1000:6.0f} ms"
+                      f"  p95 {percentile(latencies, 95) * 1000:6.0f} ms  max loop lag {lag * 1000:5.0f} ms  failed {failed}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("count", nargs="?", type=int, default=30)
+    parser.add_argument("--workers", type=int, help="AUTH_HASH_WORKERS")
+    parser.add_argument("--rounds", type=int, help="PASSWORD_HASH_ROUNDS")
+    args = parser.parse_args()
+    env = {}
+    if args.workers:
+        env["AUTH_HASH_WORKERS"] = args.workers
+    if args.rounds:
+        env["PASSWORD_HASH_ROUNDS"] = args.rounds
+    main_bench(args.count, env)
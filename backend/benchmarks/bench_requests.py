@@ -0,0 +1,39 @@
+"""
+İstek başına engine/bağlantı yeniden kullanımı ve istek hızı (user-001).
+
+Kimlik doğrulamalı ve doğrulamasız okuma uçlarını sırayla çağırır; saniyedeki istek
+sayısını ve bu sürede açılan yeni DBAPI bağlantısı sayısını yazdırır. Havuz çalışıyorsa
+engine tek kalır ve yeni bağlantı sayısı havuz boyutunu aşmaz (istek sayısından
+bağımsızdır).
+
+    python benchmarks/bench_requests.py [istek_sayısı]
+"""
+import sys
+import time
+from harness import running_app, seed_menu
+
+def main_bench(requests_per_endpoint: int = 500):
+    with running_app() as (client, headers, main):
+        from sqlalchemy import event
+        from models import get_engine
+        seed_menu(client, headers)
+        engine = get_engine()
+        connects = [0]
+        event.listen(engine.pool, "connect", lambda *_: connects.__setitem__(0, connects[0] + 1))
+        endpoints = [
+            ("GET /api/products", lambda: client.get("/api/products")),
+            ("GET /api/auth/me (auth)", lambda: client.get("/api/auth/me", headers=headers)),
+            ("GET /api/tables/open", lambda: client.get("/api/tables/open")),
+        ]
+        print(f"{'endpoint':28} {'req/s':>8} {'new conns':>10}")
+        for name, call in endpoints:
+            connects[0] = 0
+            started = time.perf_counter()
+            for _ in range(requests_per_endpoint):
+                assert call().status_code == 200
+            elapsed = time.perf_counter() - started
+            print(f"{name:28} {requests_per_endpoint / elapsed:8.0f} {connects[0]:10d}")
+        print(f"engine reused: {get_engine() is engine}, pool: {engine.pool.status()}")
+
+if __name__ == "__main__":
+    main_bench(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,70 @@
+"""
+Eşzamanlı sipariş yazma + rapor okuma karışımı (user-002).
+
+Siparişler (stok takipli ürün dahil) ve admin rapor/dashboard okumaları aynı anda
+gönderilir. Her tür için istek/sn, p50/p95 gecikme ve hata sayısını ("database is
+locked" dahil) yazdırır; sonda verilen sipariş sayısıyla veritabanındaki sayı ve stok
+düşümü karşılaştırılır.
+
+    python benchmarks/bench_writer.py [sipariş_sayısı] [--profile production]
+"""
+import argparse
+import asyncio
+import time
+from collections import defaultdict
+from harness import percentile, running_app, seed_menu
+
+READS = ["/api/admin/dashboard", "/api/admin/reports/sales", "/api/tables/open", "/api/orders/kitchen-tickets"]
+
+async def _burst(app, headers, product_ids, orders: int, tables: int):
+    import httpx
+    latencies, errors = defaultdict(list), defaultdict(int)
+
+    async def timed(kind, request):
+        started = time.perf_counter()
+        try:
+            response = await request
+            ok = response.status_code < 400
+        except Exception:
+            ok = False
+        latencies[kind].append(time.perf_counter() - started)
+        if not ok:
+            errors[kind] += 1
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        calls = []
+        for i in range(orders):
+            items = [{"product_id": product_ids[0], "quantity": 1}, {"product_id": product_ids[1], "quantity": 2}]
+            calls.append(timed("write /api/orders", client.post("/api/orders", json={"table_number": i % tables + 1, "items": items})))
+            path = READS[i % len(READS)]
+            calls.append(timed(f"read {path}", client.get(path, headers=headers)))
+        started = time.perf_counter()
+        await asyncio.gather(*calls)
+        return time.perf_counter() - started, latencies, errors
+
+def main_bench(orders: int, profile: str):
+    env = {"SQLITE_PROFILE": profile} if profile else {}
+    with running_app(**env) as (client, headers, main):
+        from models import Order, Product, get_sessionmaker
+        tables = 10
+        product_ids = seed_menu(client, headers, tables=tables)
+        elapsed, latencies, errors = asyncio.run(_burst(main.app, headers, product_ids, orders, tables))
+        print(f"profile={profile or 'default'} orders={orders} wall={elapsed:.2f}s")
+        print(f"{'kind':38} {'n':>5} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+        for kind in sorted(latencies):
+            values = latencies[kind]
+            print(f"{kind:38} {len(values):5d} {len(values) / elapsed:7.0f} {percentile(values, 50) * 1000:8.1f} {percentile(values, 95) * 1000:8.1f} {errors[kind]:7d}")
+        db = get_sessionmaker()()
+        try:
+            stored = db.query(Order).count()
+            stock = db.query(Product.stock).filter(Product.id == product_ids[0]).scalar()
+        finally:
+            db.close()
+        print(f"orders stored: {stored}/{orders}, tracked stock consumed: {1_000_000 - stock}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("orders", nargs="?", type=int, default=200)
+    parser.add_argument("--profile", default="", help="SQLITE_PROFILE (ör. production)")
+    args = parser.parse_args()
+    main_bench(args.orders, args.profile)
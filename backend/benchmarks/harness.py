@@ -0,0 +1,60 @@
+"""
+Benchmark betikleri için ortak kurulum.
+
+Her betik geçici bir SQLite veritabanıyla uygulamayı süreç içinde başlatır (lifespan
+dahil), admin ile giriş yapar ve örnek masa/ürün oluşturur. Betikler backend/
+klasöründen çalıştırılır:  python benchmarks/bench_requests.py
+"""
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def prepare_env(**overrides):
+    """Geçici veritabanı ve sahte AI arka ucu; ortam değişkenleri modüller yüklenmeden ayarlanır"""
+    tmp_dir = tempfile.mkdtemp(prefix="adisyon-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+    os.environ["AI_BACKEND"] = "fake"
+    os.environ["GOOGLE_API_KEY"] = ""
+    os.environ["REPORT_PRECOMPUTE"] = "false"
+    for key, value in overrides.items():
+        os.environ[key] = str(value)
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    return tmp_dir
+
+@contextlib.contextmanager
+def running_app(**env):
+    """(client, admin_headers, main) döndürür; çıkışta uygulama kapatılır ve veritabanı silinir"""
+    tmp_dir = prepare_env(**env)
+    from fastapi.testclient import TestClient
+    import main
+    try:
+        with TestClient(main.app) as client:
+            token = client.post("/api/auth/login", json={"username": "admin", "password": "admin123"}).json()["access_token"]
+            yield client, {"Authorization": f"Bearer {token}"}, main
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def seed_menu(client, headers, tables: int = 1, products: int = 2):
+    """Masalar ve (biri stok takipli) ürünler oluşturur; ürün id listesini döndürür"""
+    category = client.post("/api/products/categories", json={"name": f"Bench {time.time_ns()}"}, headers=headers).json()
+    ids = []
+    for i in range(products):
+        body = {"name": f"Ürün {i}", "price": 10 + i, "category_id": category["id"]}
+        if i == 0:
+            body.update(track_stock=True, stock=1_000_000)
+        ids.append(client.post("/api/products", json=body, headers=headers).json()["id"])
+    for n in range(1, tables + 1):
+        client.post("/api/tables", json={"name": f"masa - {n}", "number": n}, headers=headers)
+    return ids
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
@@ -0,0 +1,55 @@
+"""
+Veritabanı yazma kuyruğu.
+
+Sipariş oluşturma, masa kapatma ve stok güncellemeleri gibi yazma işlemleri
+tek bir arka plan iş parçacığında sırayla çalıştırılır. Böylece aynı süreçteki
+yazıcılar SQLite yazma kilidi için yarışmaz ve event loop beklemez.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from models import get_sessionmaker
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = max(1, int(os.getenv("DB_WRITER_THREADS", "1")))
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db-writer")
+    return _executor
+
+def _run_in_session(fn, args, kwargs):
+    # Yazıcı kendi oturumunu açar; commit sonrası nesneler okunabilir kalsın diye
+    # expire_on_commit kapalıdır.
+    db = get_sessionmaker()(expire_on_commit=False)
+    try:
+        result = fn(db, *args, **kwargs)
+        db.commit()
+        return result
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+async def run_write(fn, *args, **kwargs):
+    """fn(db, *args, **kwargs) fonksiyonunu yazma kuyruğunda tek transaction olarak çalıştırır.
+
+    fn içinde fırlatılan hatalar (HTTPException dahil) rollback sonrası çağırana iletilir.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), partial(_run_in_session, fn, args, kwargs))
+
+def shutdown_writer():
+    """Uygulama kapanırken kuyruktaki işlerin bitmesini bekler"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
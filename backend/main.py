@@ -3,20 +3,28 @@ from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depe
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
-from models import create_tables, ensure_schema, User, UserRole, RestaurantConfig, get_session
+from models import create_tables, ensure_schema, get_engine, User, UserRole, RestaurantConfig, get_session
 from pathlib import Path
 from routers import products_new as products, orders, admin, auth, tables, waiters
 from sqlalchemy.orm import Session
 from models import get_session
-from auth import get_password_hash
+from auth import get_password_hash, require_role, shutdown_hash_pool
 import json
 import asyncio
-from typing import List, Dict, Any
+from typing import Dict, Any, Optional
+from datetime import datetime
 import os
 from dotenv import load_dotenv
 import logging
 from contextlib import asynccontextmanager
-from websocket_utils import set_connection_manager, broadcast_order_update
+from websocket_utils import ConnectionManager, set_connection_manager, topics_for_client, client_address
+from db_writer import run_write, shutdown_writer
+from services.kitchen_service import get_kitchen_tickets
+from services.table_service import get_open_tables
+from services.rollup_service import backfill_missing_days, reconcile_recent_days, run_reconcile_loop
+from services.report_artifacts import run_precompute_loop
+from services.report_jobs import shutdown_report_pool
+from services import ai_service
 
 # Load environment variables
 load_dotenv()
@@ -60,7 +68,8 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             logger.warning(f"IP setup check skipped: {e}")
 
-    # 1. Tabloları Oluştur
+    # 1. Bağlantı havuzunu DATABASE_URL ile kur ve tabloları oluştur
+    get_engine(DATABASE_URL)
     create_tables()
     ensure_schema()
     logger.info("Database tables created/verified")
@@ -100,8 +109,34 @@ async def lifespan(app: FastAPI):
     finally:
         db.close()
 
+    # 3. Günlük özetler: eksik geçmiş günleri doldur, son günleri uzlaştır, periyodik işi başlat
+    try:
+        filled = await run_write(backfill_missing_days)
+        await run_write(reconcile_recent_days)
+        if filled:
+            logger.info(f"Günlük özetler {filled} gün için dolduruldu")
+    except Exception as e:
+        logger.error(f"Günlük özet doldurma hatası: {e}")
+    reconcile_task = asyncio.create_task(run_reconcile_loop())
+
+    # 4. AI çağrıları (rapor iş havuzundakiler dahil) uygulama döngüsünde çalışır
+    ai_service.start()
+
+    # 5. WebSocket pub/sub arka ucu (memory ya da redis)
+    await manager.start()
+
+    # 6. Kapsamlı raporların ön hesaplaması (açılışta ve her gün kapanıştan sonra)
+    precompute_task = asyncio.create_task(run_precompute_loop())
+
     yield
     logger.info("Shutting down Restaurant Order System...")
+    reconcile_task.cancel()
+    precompute_task.cancel()
+    await manager.stop()
+    shutdown_report_pool()
+    shutdown_writer()
+    shutdown_hash_pool()
+    get_engine().dispose()
 
 app = FastAPI(
     title="Restaurant Order System",
@@ -127,93 +162,16 @@ app.include_router(admin.router, prefix="/api")
 app.include_router(waiters.router, prefix="/api")
 
 @app.get("/api/kitchen-tickets")
-async def kitchen_tickets_alias(db: Session = Depends(get_session)):
-    from models import Order, OrderStatus
-    result = []
-    orders = db.query(Order).filter(
-        Order.status.in_([OrderStatus.BEKLIYOR, OrderStatus.HAZIRLANIYOR])
-    ).order_by(Order.created_at.asc()).all()
-    for order in orders:
-        items = []
-        for item in order.items:
-            p_name = item.product.name if item.product else "Silinmiş Ürün"
-            items.append({
-                "id": item.id,
-                "product_id": item.product_id,
-                "product_name": p_name,
-                "quantity": item.quantity,
-                "extras": item.extras,
-                "subtotal": item.subtotal
-            })
-        table_name = order.table.name if order.table else "Masa Bilinmiyor"
-        result.append({
-            "id": order.id,
-            "table_name": table_name,
-            "status": order.status,
-            "customer_notes": order.customer_notes,
-            "created_at": order.created_at.isoformat(),
-            "items": items,
-            "total_amount": order.total_amount
-        })
-    return result
+async def kitchen_tickets_alias(updated_since: Optional[datetime] = None, db: Session = Depends(get_session)):
+    return get_kitchen_tickets(db, updated_since)
 
 @app.get("/api/tables/open")
 async def open_tables_alias(db: Session = Depends(get_session)):
-    from models import Table, Order, OrderStatus, TableState
-    tables = db.query(Table).filter(Table.is_active == True).all()
-    result = []
-    for t in tables:
-        orders = db.query(Order).filter(Order.table_id == t.id).all()
-        active_items = []
-        total = 0.0
-        for o in orders:
-            if o.status not in [OrderStatus.TESLIM_EDILDI, OrderStatus.IPTAL]:
-                total += float(o.total_amount or 0.0)
-                for it in o.items:
-                    active_items.append({"order_id": o.id, "product_id": it.product_id, "quantity": it.quantity, "subtotal": float(it.subtotal or 0.0)})
-        occupied = False
-        ts = db.query(TableState).filter(TableState.table_id == t.id).first()
-        if ts and bool(ts.is_occupied):
-            occupied = True
-        if active_items or occupied:
-            result.append({
-                "table_id": t.id,
-                "table_number": t.number,
-                "table_name": t.name,
-                "total_amount": total,
-                "items": active_items,
-                "is_occupied": occupied
-            })
-    return result
+    return get_open_tables(db)
 
 @app.get("/api/tables/open-list")
 async def open_tables_list_alias(db: Session = Depends(get_session)):
-    from models import Table, Order, OrderStatus, TableState
-    tables = db.query(Table).filter(Table.is_active == True).all()
-    result = []
-    for t in tables:
-        orders = db.query(Order).filter(Order.table_id == t.id).all()
-        active_items = []
-        total = 0.0
-        for o in orders:
-            if o.status not in [OrderStatus.TESLIM_EDILDI, OrderStatus.IPTAL]:
-                total += float(o.total_amount or 0.0)
-                for it in o.items:
-                    active_items.append({"order_id": o.id, "product_id": it.product_id, "quantity": it.quantity, "subtotal": float(it.subtotal or 0.0)})
-        occupied = False
-        ts = db.query(TableState).filter(TableState.table_id == t.id).first()
-        if ts and bool(ts.is_occupied):
-            occupied = True
-        if active_items or occupied:
-            result.append({
-                "table_id": t.id,
-                "table_number": t.number,
-                "table_name": t.name,
-                "total_amount": total,
-                "items": active_items,
-                "is_occupied": occupied
-            })
-    return result
+    return get_open_tables(db)
 
 if os.path.exists(STATIC_DIR):
     app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
@@ -249,70 +207,58 @@ async def serve_waiter():
     waiter_path = STATIC_DIR / "waiter.html"
     return FileResponse(waiter_path)
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        self.kitchen_connections: List[WebSocket] = []
-        self.admin_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket, client_type: str = "customer"):
-        self.active_connections.append(websocket)
-        if client_type == "kitchen":
-            self.kitchen_connections.append(websocket)
-        elif client_type == "admin":
-            self.admin_connections.append(websocket)
-        logger.info(f"WS Connected: {client_type}")
-
-    def disconnect(self, websocket: WebSocket, client_type: str = "customer"):
-        if websocket in self.active_connections: self.active_connections.remove(websocket)
-        if client_type == "kitchen" and websocket in self.kitchen_connections: self.kitchen_connections.remove(websocket)
-        if client_type == "admin" and websocket in self.admin_connections: self.admin_connections.remove(websocket)
-        logger.info(f"WS Disconnected: {client_type}")
-
-    async def broadcast_to_all(self, message: dict):
-        if self.active_connections:
-            await asyncio.gather(*[self.send_message(ws, json.dumps(message)) for ws in self.active_connections], return_exceptions=True)
-
-    async def broadcast_to_kitchen(self, message: dict):
-        if self.kitchen_connections:
-            await asyncio.gather(*[self.send_message(ws, json.dumps(message)) for ws in self.kitchen_connections], return_exceptions=True)
-
-    async def broadcast_to_admin(self, message: dict):
-        if self.admin_connections:
-            await asyncio.gather(*[self.send_message(ws, json.dumps(message)) for ws in self.admin_connections], return_exceptions=True)
-
-    async def send_message(self, websocket: WebSocket, message: str):
-        try: await websocket.send_text(message)
-        except: pass
-
 manager = ConnectionManager()
 set_connection_manager(manager)
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
+    client_ip = client_address(websocket)
+    reject_reason = manager.admit(client_ip)
     await websocket.accept()
-    
+    if reject_reason:
+        logger.warning(f"WS rejected ({client_ip}): {reject_reason}")
+        await websocket.close(code=1013, reason=reject_reason)
+        return
+
     client_type = "customer"
     try:
-        initial_data = await websocket.receive_text()
+        # Register mesajı ve sonraki her mesaj (pong dahil) idle_timeout içinde gelmeli
+        initial_data = await asyncio.wait_for(websocket.receive_text(), timeout=manager.idle_timeout)
         try:
             msg = json.loads(initial_data)
             if msg.get("type") == "register":
                 client_type = msg.get("client_type", "customer")
-            
-            await manager.connect(websocket, client_type)
+                # Yeniden bağlanan istemci son gördüğü sıra numarasını gönderir; kaçırılanlar tekrar iletilir
+                last_seq = msg.get("last_seq")
+                await manager.connect(
+                    websocket, client_type, topics_for_client(client_type, msg),
+                    last_seq=last_seq if isinstance(last_seq, int) else None,
+                    stream_id=msg.get("stream_id"),
+                )
+            else:
+                await manager.connect(websocket, client_type)
             
         except json.JSONDecodeError:
             await manager.connect(websocket, client_type)
 
         while True:
-            data = await websocket.receive_text()
+            data = await asyncio.wait_for(websocket.receive_text(), timeout=manager.idle_timeout)
+            manager.touch(websocket)
             
     except WebSocketDisconnect:
         manager.disconnect(websocket, client_type)
+    except asyncio.TimeoutError:
+        await manager.close_idle(websocket)
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
         manager.disconnect(websocket, client_type)
+    finally:
+        manager.release(client_ip)
+
+@app.get("/ws/stats")
+async def websocket_stats(current_user = Depends(require_role([UserRole.ADMIN]))):
+    """Bu worker'daki canlı WebSocket bağlantıları (rol bazında) ve dağıtım sayaçları"""
+    return manager.stats()
 
 @app.get("/health")
 async def health_check():
@@ -1,8 +1,12 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, DateTime, JSON, Enum, ForeignKey, Table, Date
+from sqlalchemy import create_engine, event, Column, Integer, String, Float, Boolean, DateTime, JSON, Enum, ForeignKey, Table, Date, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.exc import OperationalError, ProgrammingError
 from datetime import datetime
 import enum
+import os
+import threading
+import time
 
 Base = declarative_base()
 
@@ -39,6 +43,7 @@ class User(Base):
     role = Column(Enum(UserRole), default=UserRole.WAITER)
     is_active = Column(Boolean, default=True)
     full_name = Column(String, nullable=True)
+    pin_fingerprint = Column(String, nullable=True, unique=True, index=True)  # Garson PIN'inin HMAC'i (auth.pin_fingerprint)
     created_at = Column(DateTime, default=datetime.now) # Değişti
 
 class Category(Base):
@@ -118,16 +123,22 @@ class Order(Base):
     total_amount = Column(Float, default=0.0)
     payment_method = Column(String, nullable=True)  # "cash" veya "card"
     daily_order_number = Column(Integer, nullable=True)  # Günlük sipariş numarası (her gün 1'den başlar)
-    created_at = Column(DateTime, default=datetime.now) # Değişti
-    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now) # Değişti
+    created_at = Column(DateTime, default=datetime.now, index=True) # Değişti
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, index=True) # Değişti
+    version = Column(Integer, default=1)  # Her değişiklikte artar; istemciler eski WebSocket olaylarını atlar
     table = relationship("Table", back_populates="orders")
     items = relationship("OrderItem", back_populates="order")
+    # Mutfak/dashboard (durum + tarih) ve açık masalar (masa + durum) sorguları için
+    __table_args__ = (
+        Index("ix_orders_status_created_at", "status", "created_at"),
+        Index("ix_orders_table_id_status", "table_id", "status"),
+    )
 
 class OrderItem(Base):
     __tablename__ = "order_items"
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
-    product_id = Column(Integer, ForeignKey("products.id"))
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), index=True)
     quantity = Column(Integer, default=1)
     unit_price = Column(Float, nullable=False)
     extras = Column(JSON, default={})
@@ -176,7 +187,7 @@ class StockMovement(Base):
     quantity = Column(Integer, nullable=False)
     movement_type = Column(Enum(MovementType), default=MovementType.GIRIS)
     description = Column(String, nullable=True)
-    created_at = Column(DateTime, default=datetime.now)
+    created_at = Column(DateTime, default=datetime.now, index=True)
     product = relationship("Product", back_populates="stock_movements")
 class WaiterTableAssignment(Base):
     __tablename__ = "waiter_table_assignments"
@@ -184,6 +195,11 @@ class WaiterTableAssignment(Base):
     user_id = Column(Integer, ForeignKey("users.id"), index=True)
     table_id = Column(Integer, ForeignKey("tables.id"), index=True)
     created_at = Column(DateTime, default=datetime.now)
+class DailyOrderCounter(Base):
+    __tablename__ = "daily_order_counters"
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    business_date = Column(Date, nullable=False, unique=True)  # İş günü (BUSINESS_DAY_START_HOUR'a göre)
+    last_number = Column(Integer, default=0)  # O gün verilen son sipariş numarası
 class DailySalesSummary(Base):
     __tablename__ = "daily_sales_summary"
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
@@ -192,6 +208,9 @@ class DailySalesSummary(Base):
     total_revenue = Column(Float, default=0.0)
     cancelled_orders = Column(Integer, default=0)
     avg_order = Column(Float, default=0.0)
+    cash_total = Column(Float, default=0.0)
+    card_total = Column(Float, default=0.0)
+    version = Column(Integer, default=0)  # Gün özeti her değiştiğinde artar
     created_at = Column(DateTime, default=datetime.now)
 class DailyProductSummary(Base):
     __tablename__ = "daily_product_summary"
@@ -201,14 +220,107 @@ class DailyProductSummary(Base):
     qty = Column(Integer, default=0)
     revenue = Column(Float, default=0.0)
     created_at = Column(DateTime, default=datetime.now)
+    # Artımlı güncellemelerdeki upsert (ON CONFLICT) için gün + ürün tekil olmalı
+    __table_args__ = (
+        Index("ux_daily_product_summary_date_product", "date", "product_id", unique=True),
+    )
+class EventOutbox(Base):
+    """Yayınlanan WebSocket olaylarının kalıcı kaydı (WS_EVENT_OUTBOX açıksa)"""
+    __tablename__ = "event_outbox"
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    stream_id = Column(String, nullable=False)
+    seq = Column(Integer, nullable=False)
+    topics = Column(String, nullable=False)  # sekmeyle ayrılmış konular
+    payload = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.now)
+    __table_args__ = (
+        Index("ix_event_outbox_stream_seq", "stream_id", "seq"),
+    )
+class ReportArtifact(Base):
+    """Önceden hesaplanmış rapor (veri + AI yorumu); data_version günlük özet sürümlerinden türetilir"""
+    __tablename__ = "report_artifacts"
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    kind = Column(String, nullable=False)  # daily | weekly | monthly
+    period_start = Column(Date, nullable=False)
+    period_end = Column(Date, nullable=False)
+    data_version = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.now)
+    __table_args__ = (
+        Index("ux_report_artifacts_kind_start", "kind", "period_start", unique=True),
+    )
 # Database setup
-def get_engine():
-    return create_engine("sqlite:///./restaurant.db", connect_args={"check_same_thread": False})
+# Engine ve sessionmaker süreç başına bir kez (ilk kullanımda) oluşturulur.
+# Havuz ayarları ortam değişkenlerinden okunur.
+DEFAULT_DATABASE_URL = "sqlite:///./restaurant.db"
+
+_engine = None
+_SessionLocal = None
+_engine_lock = threading.Lock()
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+def _sqlite_profile_pragmas():
+    """SQLITE_PROFILE=production ise bağlantı açılışında uygulanacak PRAGMA'lar"""
+    if os.getenv("SQLITE_PROFILE", "").strip().lower() != "production":
+        return []
+    return [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))}",
+        f"PRAGMA cache_size={int(os.getenv('SQLITE_CACHE_SIZE', '-64000'))}",
+        f"PRAGMA busy_timeout={int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+def _build_engine(database_url: str):
+    kwargs = {"pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True)}
+    is_sqlite = database_url.startswith("sqlite")
+    if is_sqlite:
+        kwargs["connect_args"] = {"check_same_thread": False}
+    if ":memory:" not in database_url and database_url != "sqlite://":
+        # In-memory SQLite kendi özel havuzunu kullanır, boyut ayarı kabul etmez
+        kwargs["pool_size"] = int(os.getenv("DB_POOL_SIZE", "10"))
+        kwargs["max_overflow"] = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+        kwargs["pool_recycle"] = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    engine = create_engine(database_url, **kwargs)
+
+    pragmas = _sqlite_profile_pragmas() if is_sqlite else []
+    if pragmas:
+        @event.listens_for(engine, "connect")
+        def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for pragma in pragmas:
+                    cursor.execute(pragma)
+            finally:
+                cursor.close()
+    return engine
+
+def get_engine(database_url: str = None):
+    """Süreç genelinde paylaşılan engine'i döndürür (ilk çağrıda oluşturulur).
+
+    URL önceliği: parametre > DATABASE_URL ortam değişkeni > varsayılan SQLite.
+    Engine oluşturulduktan sonra verilen URL dikkate alınmaz.
+    """
+    global _engine, _SessionLocal
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                url = database_url or os.getenv("DATABASE_URL", DEFAULT_DATABASE_URL)
+                _engine = _build_engine(url)
+                _SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=_engine)
+    return _engine
+
+def get_sessionmaker():
+    get_engine()
+    return _SessionLocal
 
 def get_session():
-    engine = get_engine()
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    db = SessionLocal()
+    # FastAPI aynı istek içindeki tüm Depends(get_session) çağrılarını önbelleğe alır;
+    # böylece router ve auth bağımlılıkları tek bir oturumu paylaşır.
+    db = get_sessionmaker()()
     try:
         yield db
     finally:
@@ -216,7 +328,16 @@ def get_session():
 
 def create_tables():
     engine = get_engine()
-    Base.metadata.create_all(bind=engine)
+    # Birden fazla worker boş veritabanında aynı anda başlarsa tablo başka süreçte
+    # oluşturulmuş olabilir ("already exists"); create_all checkfirst ile yeniden denenir.
+    for attempt in range(3):
+        try:
+            Base.metadata.create_all(bind=engine)
+            return
+        except (OperationalError, ProgrammingError):
+            if attempt == 2:
+                raise
+            time.sleep(0.2)
 
 def ensure_schema():
     engine = get_engine()
@@ -227,6 +348,9 @@ def ensure_schema():
             names = set([c[1] for c in cols])
             if "full_name" not in names:
                 conn.exec_driver_sql("ALTER TABLE users ADD COLUMN full_name TEXT")
+            if "pin_fingerprint" not in names:
+                conn.exec_driver_sql("ALTER TABLE users ADD COLUMN pin_fingerprint TEXT")
+            conn.exec_driver_sql("CREATE UNIQUE INDEX IF NOT EXISTS ix_users_pin_fingerprint ON users (pin_fingerprint)")
             
             # Orders tablosu için payment_method alanı
             order_cols = conn.exec_driver_sql("PRAGMA table_info(orders)").fetchall()
@@ -263,6 +387,10 @@ def ensure_schema():
             if "waiter_id" not in order_names:
                 conn.exec_driver_sql("ALTER TABLE orders ADD COLUMN waiter_id INTEGER")
             
+            # Orders tablosu için version alanı (WebSocket delta olayları)
+            if "version" not in order_names:
+                conn.exec_driver_sql("ALTER TABLE orders ADD COLUMN version INTEGER DEFAULT 1")
+            
             # UserStats tablosu için total_orders alanı
             try:
                 stats_cols = conn.exec_driver_sql("PRAGMA table_info(user_stats)").fetchall()
@@ -272,6 +400,34 @@ def ensure_schema():
             except Exception:
                 pass
             
+            # Günlük satış özeti için ödeme dağılımı ve sürüm alanları
+            try:
+                summary_cols = conn.exec_driver_sql("PRAGMA table_info(daily_sales_summary)").fetchall()
+                summary_names = set([c[1] for c in summary_cols])
+                if "cash_total" not in summary_names:
+                    conn.exec_driver_sql("ALTER TABLE daily_sales_summary ADD COLUMN cash_total FLOAT DEFAULT 0")
+                if "card_total" not in summary_names:
+                    conn.exec_driver_sql("ALTER TABLE daily_sales_summary ADD COLUMN card_total FLOAT DEFAULT 0")
+                if "version" not in summary_names:
+                    conn.exec_driver_sql("ALTER TABLE daily_sales_summary ADD COLUMN version INTEGER DEFAULT 0")
+                # Gün + ürün tekil indeksinden önce olası mükerrer özet satırlarını temizle
+                conn.exec_driver_sql("""
+                    DELETE FROM daily_product_summary
+                    WHERE id NOT IN (SELECT MIN(id) FROM daily_product_summary GROUP BY date, product_id)
+                """)
+            except Exception:
+                pass
+            
             conn.commit()
     except Exception:
         pass
+    
+    # Modelde tanımlı ama eski veritabanlarında olmayan indeksleri oluştur
+    # (tekil indeks eski veride çakışırsa yalnızca o indeks atlanır)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                with engine.begin() as conn:
+                    index.create(bind=conn, checkfirst=True)
+            except Exception:
+                pass
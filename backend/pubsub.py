@@ -0,0 +1,179 @@
+"""
+WebSocket olayları için yayın/abone (pub/sub) arka uçları.
+
+ConnectionManager bir olayı bir kez yayınlar; arka uç olayı, soketi tutan her
+süreçteki manager'ın deliver() fonksiyonuna ulaştırır. Olay sıra numaraları da
+arka uçtan alınır (stream_id + artan seq), böylece tüm worker'lar aynı sırayı görür.
+
+- memory: tek süreç (varsayılan); olay doğrudan aynı süreçte dağıtılır.
+- redis:  birden fazla uvicorn worker'ı; olay Redis kanalına yayınlanır ve her
+          worker kendi soketlerine dağıtır (REDIS_URL, WS_PUBSUB_CHANNEL).
+"""
+import asyncio
+import logging
+import os
+import uuid
+from typing import Callable, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger("pubsub")
+
+# deliver(topics, payload, seq): payload bir kez JSON'a çevrilmiş mesajdır
+DeliverFn = Callable[[List[str], str, Optional[int]], int]
+
+def encode_envelope(topics: List[str], payload: str, seq: Optional[int] = None) -> str:
+    # İlk satır: sıra numarası ve sekmeyle ayrılmış konular; kalanı mesajın kendisi (yeniden kodlanmaz)
+    return "\t".join(["" if seq is None else str(seq)] + list(topics)) + "\n" + payload
+
+def decode_envelope(data) -> tuple:
+    if isinstance(data, bytes):
+        data = data.decode("utf-8")
+    header, _, payload = data.partition("\n")
+    seq, *topics = header.split("\t")
+    return [t for t in topics if t], payload, (int(seq) if seq else None)
+
+class InProcessBackend:
+    """Tek süreçli dağıtım: yayınlanan olay doğrudan yerel manager'a verilir"""
+    name = "memory"
+
+    def __init__(self):
+        self._deliver: Optional[DeliverFn] = None
+        self.stream_id = uuid.uuid4().hex[:12]
+        self._seq = 0
+
+    def attach(self, deliver: DeliverFn):
+        self._deliver = deliver
+
+    def seed(self, stream_id: str, seq: int):
+        """Sırayı kalıcı kayıttan (outbox) devam ettirir"""
+        self.stream_id = stream_id
+        self._seq = seq
+
+    async def start(self):
+        pass
+
+    async def next_sequence(self) -> Optional[int]:
+        self._seq += 1
+        return self._seq
+
+    async def current_sequence(self) -> int:
+        return self._seq
+
+    async def publish(self, topics: List[str], payload: str, seq: Optional[int] = None):
+        if self._deliver is not None:
+            self._deliver(topics, payload, seq)
+
+    async def stop(self):
+        pass
+
+class RedisBackend:
+    """Redis kanalı üzerinden süreçler arası dağıtım (redis.asyncio)"""
+    name = "redis"
+
+    def __init__(self, url: str, channel: str, reconnect_delay: float = 2.0):
+        self.url = url
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self._deliver: Optional[DeliverFn] = None
+        self._redis = None
+        self._listener: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+        self.stream_id = ""
+        self._seq_key = f"{channel}:seq"
+        self._stream_key = f"{channel}:stream"
+
+    def attach(self, deliver: DeliverFn):
+        self._deliver = deliver
+
+    def seed(self, stream_id: str, seq: int):
+        # Sıra Redis'te tutulur; yerel tohumlama gerekmez
+        pass
+
+    async def start(self):
+        import redis.asyncio as aioredis
+        self._redis = aioredis.from_url(self.url)
+        # Tüm worker'lar aynı stream kimliğini paylaşır; Redis sıfırlanırsa yeni kimlik oluşur
+        try:
+            await self._redis.set(self._stream_key, uuid.uuid4().hex[:12], nx=True)
+            self.stream_id = (await self._redis.get(self._stream_key)).decode("utf-8")
+        except Exception as e:
+            logger.error(f"Redis stream kimliği alınamadı: {e}")
+            self.stream_id = uuid.uuid4().hex[:12]
+        self._listener = asyncio.create_task(self._listen())
+        # İlk abonelik tamamlanmadan yayınlanan olaylar bu worker'a geri dönmeyebilir
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=5)
+        except asyncio.TimeoutError:
+            logger.warning(f"Redis kanalına abone olunamadı: {self.channel}")
+
+    async def _listen(self):
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                self._ready.set()
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    topics, payload, seq = decode_envelope(message["data"])
+                    if self._deliver is not None:
+                        self._deliver(topics, payload, seq)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Redis pub/sub bağlantı hatası, yeniden deneniyor: {e}")
+                await asyncio.sleep(self.reconnect_delay)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    async def next_sequence(self) -> Optional[int]:
+        try:
+            return int(await self._redis.incr(self._seq_key))
+        except Exception as e:
+            logger.error(f"Redis sıra numarası alınamadı: {e}")
+            return None
+
+    async def current_sequence(self) -> int:
+        try:
+            return int(await self._redis.get(self._seq_key) or 0)
+        except Exception:
+            return 0
+
+    async def publish(self, topics: List[str], payload: str, seq: Optional[int] = None):
+        try:
+            await self._redis.publish(self.channel, encode_envelope(topics, payload, seq))
+        except Exception as e:
+            # Redis erişilemezse en azından bu worker'daki soketlere ulaştır
+            logger.error(f"Redis yayın hatası, yalnızca yerel dağıtım yapılıyor: {e}")
+            if self._deliver is not None:
+                self._deliver(topics, payload, seq)
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception):
+                pass
+        if self._redis is not None:
+            await self._redis.aclose()
+
+def create_pubsub_backend():
+    """WS_PUBSUB_BACKEND ortam değişkenine göre arka ucu oluşturur (memory | redis)"""
+    kind = os.getenv("WS_PUBSUB_BACKEND", "memory").strip().lower()
+    if kind == "redis":
+        try:
+            import redis.asyncio  # noqa: F401
+        except ImportError:
+            logger.error("redis modülü yüklü değil; WebSocket olayları yalnızca bu süreçte dağıtılacak")
+            return InProcessBackend()
+        return RedisBackend(
+            os.getenv("REDIS_URL", "redis://localhost:6379"),
+            os.getenv("WS_PUBSUB_CHANNEL", "adisyon:ws-events"),
+        )
+    return InProcessBackend()
@@ -1,15 +1,18 @@
 from fastapi import APIRouter, HTTPException, Depends, Query, UploadFile, File
-from typing import List, Optional, Dict, Any
+from typing import List, Optional
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from models import User, Product, Category, Order, Table, OrderItem, OrderStatus, RestaurantConfig, StockMovement, Inventory, UserStats, get_session
-from services.ai_service import generate_analysis_text, generate_ai_answer, generate_daily_report_analysis, generate_weekly_report_analysis, generate_monthly_report_analysis
+from services.ai_service import generate_analysis_text
 from collections import defaultdict
-from io import BytesIO
 from fastapi.responses import FileResponse
-import importlib
 from auth import require_role, get_current_active_user
 from models import UserRole
+from db_writer import run_write
+from services.dashboard_service import get_dashboard_stats
+from services.rollup_service import get_daily_sales, get_product_sales, rebuild_days
+from services.report_jobs import REPORT_KINDS, submit_report, get_job, wait_for_job
+from services.report_artifacts import get_report
 from datetime import datetime, date, timedelta
 from sqlalchemy import func, desc, String
 import os
@@ -32,88 +35,14 @@ class SettingsUpdate(BaseModel):
     order_timeout_minutes: int
     logo_url: Optional[str] = None
 
-# --- YARDIMCI FONKSİYONLAR ---
-def safe_parse_date(date_val):
-    """Tarih verisini her türlü formattan kurtarmaya çalışan fonksiyon"""
-    if not date_val:
-        return None
-    
-    if isinstance(date_val, datetime):
-        return date_val
-    
-    if isinstance(date_val, str):
-        try:
-            return datetime.fromisoformat(date_val)
-        except:
-            pass
-        try:
-            return datetime.strptime(date_val, "%Y-%m-%d %H:%M:%S.%f")
-        except:
-            pass
-        try:
-            return datetime.strptime(date_val, "%Y-%m-%d %H:%M:%S")
-        except:
-            pass
-    return None
-
 # --- ENDPOINTLER ---
 
 @router.get("/dashboard")
-async def get_dashboard_stats(
+async def get_dashboard_stats_endpoint(
     current_user = Depends(require_role([UserRole.ADMIN, UserRole.SUPERVISOR])),
     db: Session = Depends(get_session)
 ):
-    all_orders = db.query(Order).all()
-    
-    total_products = db.query(Product).filter(Product.is_active == True).count()
-    total_tables = db.query(Table).filter(Table.is_active == True).count()
-    
-    today = date.today()
-    today_order_count = 0
-    today_revenue = 0.0
-    active_orders = 0
-    
-    daily_revenue = {} 
-    for i in range(6, -1, -1):
-        d = (today - timedelta(days=i)).isoformat()
-        daily_revenue[d] = 0.0
-
-    for o in all_orders:
-        o_dt = safe_parse_date(o.created_at)
-        if not o_dt: continue
-        
-        o_date = o_dt.date()
-        o_date_str = o_date.isoformat()
-        
-        status = (o.status.value if o.status else "").lower()
-        is_cancelled = status in ["cancelled", "iptal"]
-        is_active = status in ["pending", "preparing", "bekliyor", "hazirlaniyor"]
-        
-        if o_date == today:
-            today_order_count += 1
-            if not is_cancelled:
-                today_revenue += (o.total_amount or 0.0)
-        
-        if is_active:
-            active_orders += 1
-            
-        if o_date_str in daily_revenue and not is_cancelled:
-            daily_revenue[o_date_str] += (o.total_amount or 0.0)
-
-    daily_trend = [{"date": k, "revenue": v} for k, v in daily_revenue.items()]
-
-    return {
-        "overview": {
-            "total_products": total_products,
-            "total_tables": total_tables,
-        },
-        "sales": {
-            "today_orders": today_order_count,
-            "today_revenue": today_revenue,
-            "active_orders": active_orders,
-            "daily_trend": daily_trend
-        }
-    }
+    return get_dashboard_stats(db)
 
 @router.get("/reports/sales")
 async def get_sales_report(
@@ -128,77 +57,39 @@ async def get_sales_report(
     # EMOJİSİZ PRINT (HATA VERMEYECEK)
     print(f"[INFO] Rapor Istegi: {start_date} - {end_date}")
     
-    all_orders = db.query(Order).all()
-    print(f"[INFO] Veritabanindaki Toplam Siparis: {len(all_orders)}")
-
-    filtered_orders = []
+    # Geçmiş günler günlük özetlerden, bugün ham siparişlerden okunur
+    days = get_daily_sales(db, start_date, end_date)
+    
     total_revenue = 0.0
     cash_total = 0.0
     card_total = 0.0
-    
-    breakdown = {}
+    total_orders = 0
+    daily_data = []
     delta = end_date - start_date
     for i in range(delta.days + 1):
-        day = (start_date + timedelta(days=i)).isoformat()
-        breakdown[day] = {"revenue": 0, "count": 0}
-
-    product_stats = {}
-    processed_count = 0
-
-    for o in all_orders:
-        o_dt = safe_parse_date(o.created_at)
-        
-        if not o_dt: 
+        d = start_date + timedelta(days=i)
+        v = days.get(d)
+        if not v:
+            daily_data.append({"date": d.isoformat(), "revenue": 0, "count": 0})
             continue
-            
-        o_date = o_dt.date()
-        
-        if start_date <= o_date <= end_date:
-            processed_count += 1
-            
-            status = str(o.status).lower() if o.status else ""
-            if status in ["cancelled", "iptal"]:
-                continue
-                
-            filtered_orders.append(o)
-            amount = o.total_amount or 0.0
-            total_revenue += amount
-            
-            # Ödeme yöntemi dağılımı
-            payment_method = getattr(o, 'payment_method', None)
-            if payment_method == "cash":
-                cash_total += amount
-            elif payment_method == "card":
-                card_total += amount
-            
-            d_str = o_date.isoformat()
-            if d_str in breakdown:
-                breakdown[d_str]["revenue"] += amount
-                breakdown[d_str]["count"] += 1
-            
-            for item in o.items:
-                if not item.product: continue
-                pid = item.product_id
-                if pid not in product_stats:
-                    product_stats[pid] = {"name": item.product.name, "qty": 0, "total": 0}
-                
-                product_stats[pid]["qty"] += item.quantity
-                product_stats[pid]["total"] += (item.subtotal or 0.0)
+        count = v["total_orders"] - v["cancelled_orders"]
+        total_revenue += v["total_revenue"]
+        cash_total += v["cash_total"]
+        card_total += v["card_total"]
+        total_orders += count
+        daily_data.append({"date": d.isoformat(), "revenue": v["total_revenue"], "count": count})
 
-    # EMOJİSİZ PRINTLER
-    print(f"[OK] Tarih Araligina Giren: {processed_count}")
-    print(f"[OK] Rapora Dahil Edilen: {len(filtered_orders)}")
     print(f"[OK] Toplam Ciro: {total_revenue}")
 
-    top_products = sorted(product_stats.values(), key=lambda x: x["total"], reverse=True)[:10]
-    daily_data = [{"date": k, **v} for k, v in sorted(breakdown.items())]
+    product_stats = get_product_sales(db, start_date, end_date)
+    top_products = [{"name": p["name"], "qty": p["qty"], "total": p["total"]} for p in sorted(product_stats, key=lambda x: x["total"], reverse=True)[:10]]
 
     return {
         "total_revenue": total_revenue,
         "cash_total": cash_total,
         "card_total": card_total,
-        "total_orders": len(filtered_orders),
-        "average_order": total_revenue / len(filtered_orders) if len(filtered_orders) > 0 else 0,
+        "total_orders": total_orders,
+        "average_order": total_revenue / total_orders if total_orders > 0 else 0,
         "daily_breakdown": daily_data,
         "top_products": top_products
     }
@@ -224,9 +115,29 @@ async def product_matrix(
         profit = float(p.price or 0.0)
         tag = "Star" if vol >= threshold and profit >= (p.price or 0.0)*0.5 else "Dog"
         matrix.append({"id": p.id, "name": p.name, "volume": vol, "profit_proxy": profit, "tag": tag})
-    analysis = generate_analysis_text(matrix)
+    analysis = await generate_analysis_text(matrix)
     return {"matrix": matrix, "analysis": analysis}
 
+class ReportJobRequest(BaseModel):
+    kind: str = "closing"
+    report_date: Optional[date] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    include_ai: bool = True
+
+def _submit_report(db: Session, kind: str, **params):
+    if kind not in REPORT_KINDS:
+        raise HTTPException(status_code=400, detail="Geçersiz rapor türü")
+    return submit_report(db, kind, **params)
+
+async def _report_file(job):
+    """İş bitene kadar bekleyip PDF'i döndürür (eski senkron uç noktalar için)"""
+    await wait_for_job(job)
+    if job.status != "done":
+        logger.error(f"PDF generation failed: {job.error}")
+        raise HTTPException(status_code=500, detail=f"PDF olusturulamadi: {job.error}")
+    return FileResponse(job.path, media_type="application/pdf", filename=job.download_name)
+
 @router.get("/reports/closing-report-pdf")
 async def closing_report_pdf(
     report_date: date = Query(None),
@@ -234,325 +145,37 @@ async def closing_report_pdf(
     db: Session = Depends(get_session)
 ):
     """Günlük kapanış PDF raporu"""
-    if not report_date:
-        report_date = date.today()
-    
-    # Bugünün verilerini al
-    start = datetime.combine(report_date, datetime.min.time())
-    end = datetime.combine(report_date, datetime.max.time())
-    
-    orders = db.query(Order).filter(Order.created_at >= start, Order.created_at <= end).all()
-    
-    total_revenue = 0.0
-    cash_total = 0.0
-    card_total = 0.0
-    total_orders = 0
-    cancelled_orders = 0
-    
-    for o in orders:
-        total_orders += 1
-        status = (o.status.value if o.status else "").lower()
-        if status in ["cancelled", "iptal"]:
-            cancelled_orders += 1
-        else:
-            amount = float(o.total_amount or 0.0)
-            total_revenue += amount
-            pm = getattr(o, 'payment_method', None)
-            if pm == "cash":
-                cash_total += amount
-            elif pm == "card":
-                card_total += amount
-    
-    # Ürün satışları
-    items = db.query(OrderItem).join(Order).filter(Order.created_at >= start, Order.created_at <= end).all()
-    counts = defaultdict(int)
-    totals = defaultdict(float)
-    for item in items:
-        if item.product_id:
-            counts[item.product_id] += item.quantity or 0
-            totals[item.product_id] += float(item.subtotal or 0.0)
-    
-    products = db.query(Product).all()
-    product_map = {p.id: p.name for p in products}
-    
-    top = sorted([
-        {"name": product_map.get(pid, str(pid)), "qty": qty, "total": totals.get(pid, 0.0)} 
-        for pid, qty in counts.items()
-    ], key=lambda x: x["qty"], reverse=True)[:10]
-    
-    # AI analizi
-    matrix_data = [{"name": x["name"], "volume": x["qty"], "profit_proxy": x["total"]} for x in top]
-    analysis = generate_analysis_text(matrix_data)
-    
-    try:
-        pagesizes = importlib.import_module("reportlab.lib.pagesizes")
-        pdfcanvas = importlib.import_module("reportlab.pdfgen.canvas")
-        A4 = pagesizes.A4
-        Canvas = pdfcanvas.Canvas
-        buf = BytesIO()
-        c = Canvas(buf, pagesize=A4)
-        
-        # Font ayarı
-        font_name = "Helvetica"
-        try:
-            pdfmetrics = importlib.import_module("reportlab.pdfbase.pdfmetrics")
-            ttfonts = importlib.import_module("reportlab.pdfbase.ttfonts")
-            font_candidates = [
-                os.path.join(os.environ.get("WINDIR", "C:\\Windows"), "Fonts", "arial.ttf"),
-                os.path.join(os.environ.get("WINDIR", "C:\\Windows"), "Fonts", "segoeui.ttf"),
-                "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
-                "/System/Library/Fonts/Helvetica.ttc"
-            ]
-            font_path = next((p for p in font_candidates if os.path.exists(p)), None)
-            if font_path:
-                pdfmetrics.registerFont(ttfonts.TTFont("UIFont", font_path))
-                font_name = "UIFont"
-        except Exception:
-            pass
-        
-        c.setFont(font_name, 16)
-        c.drawString(50, 800, f"GUNLUK KAPANIS RAPORU")
-        c.setFont(font_name, 12)
-        c.drawString(50, 780, f"Tarih: {report_date.strftime('%d.%m.%Y')}")
-        
-        c.drawString(50, 740, "=" * 60)
-        
-        # Finansal özet
-        c.setFont(font_name, 14)
-        c.drawString(50, 710, "FINANSAL OZET")
-        c.setFont(font_name, 12)
-        c.drawString(60, 690, f"Toplam Ciro: {total_revenue:.2f} TL")
-        c.drawString(60, 672, f"Nakit: {cash_total:.2f} TL")
-        c.drawString(60, 654, f"Kredi Karti: {card_total:.2f} TL")
-        c.drawString(60, 636, f"Toplam Siparis: {total_orders}")
-        c.drawString(60, 618, f"Iptal Edilen: {cancelled_orders}")
-        
-        avg_order = total_revenue / max(1, (total_orders - cancelled_orders))
-        c.drawString(60, 600, f"Ortalama Sepet: {avg_order:.2f} TL")
-        
-        c.drawString(50, 570, "=" * 60)
-        
-        # En çok satanlar
-        c.setFont(font_name, 14)
-        c.drawString(50, 540, "EN COK SATANLAR")
-        c.setFont(font_name, 11)
-        y = 520
-        for i, row in enumerate(top[:10], 1):
-            # Türkçe karakterleri ASCII'ye çevir
-            name = row['name'].replace('ı', 'i').replace('ğ', 'g').replace('ü', 'u').replace('ş', 's').replace('ö', 'o').replace('ç', 'c')
-            name = name.replace('İ', 'I').replace('Ğ', 'G').replace('Ü', 'U').replace('Ş', 'S').replace('Ö', 'O').replace('Ç', 'C')
-            c.drawString(60, y, f"{i}. {name} - {row['qty']} adet - {row['total']:.2f} TL")
-            y -= 18
-            if y < 100:
-                c.showPage()
-                c.setFont(font_name, 11)
-                y = 800
-        
-        # AI Analizi
-        c.showPage()
-        c.setFont(font_name, 14)
-        c.drawString(50, 800, "AI ANALIZI VE ONERILER")
-        c.setFont(font_name, 10)
-        y = 770
-        for line in analysis.split("\n"):
-            # Türkçe karakterleri ASCII'ye çevir
-            line = line.replace('ı', 'i').replace('ğ', 'g').replace('ü', 'u').replace('ş', 's').replace('ö', 'o').replace('ç', 'c')
-            line = line.replace('İ', 'I').replace('Ğ', 'G').replace('Ü', 'U').replace('Ş', 'S').replace('Ö', 'O').replace('Ç', 'C')
-            if len(line) > 80:
-                # Uzun satırları böl
-                words = line.split()
-                current_line = ""
-                for word in words:
-                    if len(current_line + " " + word) < 80:
-                        current_line += " " + word if current_line else word
-                    else:
-                        c.drawString(60, y, current_line)
-                        y -= 14
-                        current_line = word
-                        if y < 100:
-                            c.showPage()
-                            c.setFont(font_name, 10)
-                            y = 800
-                if current_line:
-                    c.drawString(60, y, current_line)
-                    y -= 14
-            else:
-                c.drawString(60, y, line)
-                y -= 14
-            if y < 100:
-                c.showPage()
-                c.setFont(font_name, 10)
-                y = 800
-        
-        c.save()
-        buf.seek(0)
-        
-        uploads_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "frontend", "static", "uploads")
-        os.makedirs(uploads_dir, exist_ok=True)
-        filename = f"kapanis_raporu_{report_date.strftime('%Y%m%d')}.pdf"
-        path = os.path.join(uploads_dir, filename)
-        with open(path, "wb") as f:
-            f.write(buf.read())
-        return FileResponse(path, media_type="application/pdf", filename=filename)
-    except Exception as e:
-        logger.error(f"PDF generation failed: {e}")
-        raise HTTPException(status_code=500, detail=f"PDF olusturulamadi: {str(e)}")
+    return await _report_file(_submit_report(db, "closing", report_date=report_date))
+
 @router.get("/reports/full-pdf")
 async def full_report_pdf(start_date: date = Query(None), end_date: date = Query(None), include_ai: bool = Query(True), current_user = Depends(require_role([UserRole.ADMIN])), db: Session = Depends(get_session)):
-    if not start_date: start_date = date.today() - timedelta(days=7)
-    if not end_date: end_date = date.today()
-    s = datetime.combine(start_date, datetime.min.time())
-    e = datetime.combine(end_date, datetime.max.time())
-    orders = db.query(Order).filter(Order.created_at >= s, Order.created_at <= e).all()
-    total_revenue = 0.0
-    total_orders = 0
-    cancelled_orders = 0
-    for o in orders:
-        st = (o.status.value if o.status else "").lower()
-        total_orders += 1
-        if st in ["cancelled", "iptal"]:
-            cancelled_orders += 1
-        else:
-            total_revenue += float(o.total_amount or 0.0)
-    products = db.query(Product).all()
-    inv_map = {i.product_id: i.quantity for i in db.query(Inventory).all()}
-    users = db.query(User).all()
-    tables_total = db.query(Table).filter(Table.is_active == True).count()
-    table_rows = db.query(Table).filter(Table.is_active == True).order_by(Table.number.asc()).all()
-    items = db.query(OrderItem).join(Order, OrderItem.order_id == Order.id).filter(Order.created_at >= s, Order.created_at <= e).all()
-    prod_counts = {}
-    for it in items:
-        pid = it.product_id
-        if pid not in prod_counts:
-            prod_counts[pid] = {"name": it.product.name if it.product else str(pid), "qty": 0, "total": 0.0}
-        prod_counts[pid]["qty"] += int(it.quantity or 0)
-        prod_counts[pid]["total"] += float(it.subtotal or 0.0)
-    prev_end = start_date - timedelta(days=1)
-    prev_start = prev_end - (end_date - start_date)
-    ps = datetime.combine(prev_start, datetime.min.time())
-    pe = datetime.combine(prev_end, datetime.max.time())
-    prev_orders = db.query(Order).filter(Order.created_at >= ps, Order.created_at <= pe).all()
-    prev_rev = sum(float(o.total_amount or 0.0) for o in prev_orders if (o.status and o.status.value.lower() not in ["cancelled","iptal"]))
-    try:
-        pagesizes = importlib.import_module("reportlab.lib.pagesizes")
-        pdfcanvas = importlib.import_module("reportlab.pdfgen.canvas")
-        A4 = pagesizes.A4
-        Canvas = pdfcanvas.Canvas
-        buf = BytesIO()
-        c = Canvas(buf, pagesize=A4)
-        try:
-            pdfmetrics = importlib.import_module("reportlab.pdfbase.pdfmetrics")
-            ttfonts = importlib.import_module("reportlab.pdfbase.ttfonts")
-            font_candidates = [
-                os.path.join(os.environ.get("WINDIR", "C:\\Windows"), "Fonts", "arial.ttf"),
-                os.path.join(os.environ.get("WINDIR", "C:\\Windows"), "Fonts", "segoeui.ttf")
-            ]
-            font_path = next((p for p in font_candidates if os.path.exists(p)), None)
-            if font_path:
-                pdfmetrics.registerFont(ttfonts.TTFont("UIFont", font_path))
-                c.setFont("UIFont", 14)
-            else:
-                c.setFont("Helvetica-Bold", 14)
-        except Exception:
-            c.setFont("Helvetica-Bold", 14)
-        c.drawString(50, 800, "Kapsamlı Yönetim Raporu")
-        # İçindekiler
-        toc = [
-            "1. Genel Bakış",
-            "2. Ürün Satışları",
-            "3. Envanter",
-            "4. Personel",
-            "5. Masalar",
-            "6. AI İçgörü (opsiyonel)"
-        ]
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(50, 730, "İçindekiler")
-        c.setFont("Helvetica", 10)
-        ytoc = 710
-        for line in toc:
-            c.drawString(60, ytoc, line)
-            ytoc -= 16
-        c.showPage()
-        c.setFont("Helvetica", 10)
-        c.drawString(50, 780, f"Aralık: {start_date.isoformat()} - {end_date.isoformat()}")
-        c.drawString(50, 760, f"Toplam Ciro: {total_revenue:.2f} ₺ | Toplam Sipariş: {total_orders} | İptaller: {cancelled_orders}")
-        c.drawString(50, 740, f"Önceki Aralık Cirosu: {prev_rev:.2f} ₺ | Fark: {(total_revenue - prev_rev):.2f} ₺")
-        y = 720
-        # Türkçe karakter dönüştürme fonksiyonu
-        def tr_to_ascii(text):
-            return text.replace('ı', 'i').replace('ğ', 'g').replace('ü', 'u').replace('ş', 's').replace('ö', 'o').replace('ç', 'c').replace('İ', 'I').replace('Ğ', 'G').replace('Ü', 'U').replace('Ş', 'S').replace('Ö', 'O').replace('Ç', 'C')
-        
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(50, y, "Urun Satislari (Top 15)")
-        y -= 20
-        c.setFont("Helvetica", 10)
-        top = sorted([{**v} for v in prod_counts.values()], key=lambda x: x["total"], reverse=True)[:15]
-        for row in top:
-            name = tr_to_ascii(row['name'])
-            c.drawString(60, y, f"{name} - {row['qty']} adet - {row['total']:.2f} TL")
-            y -= 16
-            if y < 100:
-                c.showPage(); c.setFont("Helvetica", 10); y = 800
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(50, y, "Envanter Durumu")
-        y -= 20
-        c.setFont("Helvetica", 10)
-        for p in products[:20]:
-            qty = int(inv_map.get(p.id, 0))
-            name = tr_to_ascii(p.name)
-            c.drawString(60, y, f"{name} - Stok: {qty}")
-            y -= 16
-            if y < 100:
-                c.showPage(); c.setFont("Helvetica", 10); y = 800
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(50, y, "Personel")
-        y -= 20
-        c.setFont("Helvetica", 10)
-        for u in users[:25]:
-            username = tr_to_ascii(u.username)
-            c.drawString(60, y, f"{username} ({u.role.value if u.role else ''})")
-            y -= 16
-            if y < 100:
-                c.showPage(); c.setFont("Helvetica", 10); y = 800
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(50, y, "Masalar")
-        y -= 20
-        c.setFont("Helvetica", 10)
-        c.drawString(60, y, f"Aktif Masa Sayisi: {tables_total}")
-        y -= 20
-        c.setFont("Helvetica", 10)
-        for t in table_rows[:40]:
-            tname = tr_to_ascii(t.name)
-            c.drawString(60, y, f"masa - {t.number} - {tname}")
-            y -= 16
-            if y < 100:
-                c.showPage(); c.setFont("Helvetica", 10); y = 800
-        y -= 10
-        if include_ai:
-            c.setFont("Helvetica-Bold", 12)
-            c.drawString(50, y, "AI Icgoru ve Tahmin")
-            y -= 20
-            matrix = [{"name": x["name"], "volume": x["qty"], "profit_proxy": x["total"]} for x in top]
-            insight = generate_analysis_text(matrix)
-            c.setFont("Helvetica", 10)
-            for line in insight.split("\n"):
-                line = tr_to_ascii(line)
-                c.drawString(60, y, line)
-                y -= 16
-                if y < 100:
-                    c.showPage(); c.setFont("Helvetica", 10); y = 800
-        c.showPage(); c.setFont("Helvetica", 10)
-        uploads_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "frontend", "static", "uploads")
-        os.makedirs(uploads_dir, exist_ok=True)
-        fname = f"full_report_{start_date.isoformat()}_{end_date.isoformat()}.pdf"
-        path = os.path.join(uploads_dir, fname)
-        c.save(); buf.seek(0)
-        with open(path, "wb") as f:
-            f.write(buf.read())
-        return FileResponse(path, media_type="application/pdf", filename=fname)
-    except Exception as e:
-        logger.error(f"Full PDF generation failed: {e}")
-        raise HTTPException(status_code=500, detail="PDF oluşturulamadı")
+    return await _report_file(_submit_report(db, "full", start_date=start_date, end_date=end_date, include_ai=include_ai))
+
+@router.post("/reports/jobs")
+async def create_report_job(req: ReportJobRequest, current_user = Depends(require_role([UserRole.ADMIN])), db: Session = Depends(get_session)):
+    """PDF üretimini arka planda başlatır; aynı rapor ve veri için mevcut işi döndürür"""
+    if req.kind == "closing":
+        job = _submit_report(db, "closing", report_date=req.report_date)
+    else:
+        job = _submit_report(db, req.kind, start_date=req.start_date, end_date=req.end_date, include_ai=req.include_ai)
+    return job.to_dict()
+
+@router.get("/reports/jobs/{job_id}")
+async def get_report_job(job_id: str, current_user = Depends(require_role([UserRole.ADMIN]))):
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Rapor işi bulunamadı")
+    return job.to_dict()
+
+@router.get("/reports/jobs/{job_id}/download")
+async def download_report_job(job_id: str, current_user = Depends(require_role([UserRole.ADMIN]))):
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Rapor işi bulunamadı")
+    if job.status != "done" or not os.path.exists(job.path):
+        raise HTTPException(status_code=409, detail="Rapor henüz hazır değil")
+    return FileResponse(job.path, media_type="application/pdf", filename=job.download_name)
+
 @router.get("/reports/archive")
 async def reports_archive(current_user = Depends(require_role([UserRole.ADMIN]))):
     uploads_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "frontend", "static", "uploads")
@@ -582,91 +205,28 @@ async def delete_report_file(filename: str, current_user = Depends(require_role(
 @router.post("/reports/snapshot/run")
 async def run_daily_snapshot(run_date: date = Query(None), current_user = Depends(require_role([UserRole.ADMIN])), db: Session = Depends(get_session)):
     d = run_date or date.today()
-    start = datetime.combine(d, datetime.min.time())
-    end = datetime.combine(d, datetime.max.time())
-    orders = db.query(Order).filter(Order.created_at >= start, Order.created_at <= end).all()
-    total_orders = len(orders)
-    total_revenue = 0.0
-    cancelled_orders = 0
-    for o in orders:
-        status = (o.status.value if o.status else "").lower()
-        if status in ["cancelled", "iptal"]:
-            cancelled_orders += 1
-        else:
-            total_revenue += float(o.total_amount or 0.0)
-    avg_order = (total_revenue / (total_orders - cancelled_orders)) if (total_orders - cancelled_orders) > 0 else 0.0
-    from models import DailySalesSummary, DailyProductSummary
-    existing = db.query(DailySalesSummary).filter(DailySalesSummary.date == d).first()
-    if not existing:
-        existing = DailySalesSummary(date=d)
-        db.add(existing)
-    existing.total_orders = total_orders
-    existing.total_revenue = total_revenue
-    existing.cancelled_orders = cancelled_orders
-    existing.avg_order = avg_order
-    items = db.query(OrderItem).join(Order, OrderItem.order_id == Order.id).filter(Order.created_at >= start, Order.created_at <= end).all()
-    agg = {}
-    for it in items:
-        pid = it.product_id
-        if pid not in agg:
-            agg[pid] = {"qty": 0, "rev": 0.0}
-        agg[pid]["qty"] += int(it.quantity or 0)
-        agg[pid]["rev"] += float(it.subtotal or 0.0)
-    for pid, vals in agg.items():
-        r = db.query(DailyProductSummary).filter(DailyProductSummary.date == d, DailyProductSummary.product_id == pid).first()
-        if not r:
-            r = DailyProductSummary(date=d, product_id=pid)
-            db.add(r)
-        r.qty = vals["qty"]
-        r.revenue = vals["rev"]
-    db.commit()
-    return {"message": "snapshot ok", "date": d.isoformat(), "total_orders": total_orders}
+    await run_write(rebuild_days, d, d)
+    summary = get_daily_sales(db, d, d).get(d)
+    return {"message": "snapshot ok", "date": d.isoformat(), "total_orders": summary["total_orders"] if summary else 0}
 
 @router.post("/reports/snapshot/backfill")
 async def backfill_snapshot(start_date: date = Query(...), end_date: date = Query(...), current_user = Depends(require_role([UserRole.ADMIN])), db: Session = Depends(get_session)):
-    delta = end_date - start_date
-    done = 0
-    for i in range(delta.days + 1):
-        d = start_date + timedelta(days=i)
-        await run_daily_snapshot(d, current_user, db)
-        done += 1
-    return {"message": "backfill ok", "days": done}
+    await run_write(rebuild_days, start_date, end_date)
+    return {"message": "backfill ok", "days": max(0, (end_date - start_date).days + 1)}
 
 @router.get("/reports/overview")
 async def reports_overview(start_date: date = Query(None), end_date: date = Query(None), current_user = Depends(require_role([UserRole.ADMIN])), db: Session = Depends(get_session)):
     if not start_date: start_date = date.today() - timedelta(days=7)
     if not end_date: end_date = date.today()
-    from models import DailySalesSummary
-    rows = db.query(DailySalesSummary).filter(DailySalesSummary.date >= start_date, DailySalesSummary.date <= end_date).order_by(DailySalesSummary.date.asc()).all()
-    if rows:
-        total_orders = sum(int(r.total_orders or 0) for r in rows)
-        total_revenue = sum(float(r.total_revenue or 0.0) for r in rows)
-        cancelled_orders = sum(int(r.cancelled_orders or 0) for r in rows)
-        daily_trend = [{"date": r.date.isoformat(), "revenue": float(r.total_revenue or 0.0)} for r in rows]
-        return {"total_orders": total_orders, "total_revenue": total_revenue, "cancelled_orders": cancelled_orders, "daily_trend": daily_trend, "avg_order": (total_revenue / max(1, (total_orders - cancelled_orders)))}
-    s = datetime.combine(start_date, datetime.min.time())
-    e = datetime.combine(end_date, datetime.max.time())
-    orders = db.query(Order).filter(Order.created_at >= s, Order.created_at <= e).all()
-    total_revenue = 0.0
-    total_orders = 0
-    cancelled_orders = 0
-    daily_map = {}
+    days = get_daily_sales(db, start_date, end_date)
+    total_orders = sum(v["total_orders"] for v in days.values())
+    total_revenue = sum(v["total_revenue"] for v in days.values())
+    cancelled_orders = sum(v["cancelled_orders"] for v in days.values())
+    daily_trend = []
     delta = end_date - start_date
     for i in range(delta.days + 1):
-        d = (start_date + timedelta(days=i)).isoformat()
-        daily_map[d] = 0.0
-    for o in orders:
-        od = (o.created_at.date() if isinstance(o.created_at, datetime) else safe_parse_date(o.created_at).date())
-        status = (o.status.value if o.status else "").lower()
-        total_orders += 1
-        if status in ["cancelled", "iptal"]:
-            cancelled_orders += 1
-        else:
-            total_revenue += float(o.total_amount or 0.0)
-            ds = od.isoformat()
-            if ds in daily_map:
-                daily_map[ds] += float(o.total_amount or 0.0)
-    daily_trend = [{"date": k, "revenue": v} for k, v in sorted(daily_map.items())]
+        d = start_date + timedelta(days=i)
+        daily_trend.append({"date": d.isoformat(), "revenue": days[d]["total_revenue"] if d in days else 0.0})
     return {"total_orders": total_orders, "total_revenue": total_revenue, "cancelled_orders": cancelled_orders, "daily_trend": daily_trend, "avg_order": (total_revenue / max(1, (total_orders - cancelled_orders)))}
 
 @router.get("/reports/proto")
@@ -683,33 +243,7 @@ async def reports_proto(start_date: date = Query(None), end_date: date = Query(N
 async def reports_products(start_date: date = Query(None), end_date: date = Query(None), limit: int = Query(10, ge=1, le=100), current_user = Depends(require_role([UserRole.ADMIN])), db: Session = Depends(get_session)):
     if not start_date: start_date = date.today() - timedelta(days=7)
     if not end_date: end_date = date.today()
-    from models import DailyProductSummary, Product
-    rows = db.query(DailyProductSummary).filter(DailyProductSummary.date >= start_date, DailyProductSummary.date <= end_date).all()
-    if rows:
-        agg = {}
-        for r in rows:
-            k = r.product_id
-            if k not in agg:
-                agg[k] = {"qty": 0, "revenue": 0.0}
-            agg[k]["qty"] += int(r.qty or 0)
-            agg[k]["revenue"] += float(r.revenue or 0.0)
-        prods = db.query(Product).filter(Product.id.in_(list(agg.keys()))).all()
-        name_map = {p.id: p.name for p in prods}
-        arr = [{"product_id": pid, "name": name_map.get(pid, str(pid)), "qty": v["qty"], "total": v["revenue"]} for pid, v in agg.items()]
-        arr = sorted(arr, key=lambda x: x["total"], reverse=True)[:limit]
-        return {"items": arr}
-    s = datetime.combine(start_date, datetime.min.time())
-    e = datetime.combine(end_date, datetime.max.time())
-    items = db.query(OrderItem).join(Order, OrderItem.order_id == Order.id).filter(Order.created_at >= s, Order.created_at <= e).all()
-    agg = {}
-    for it in items:
-        pid = it.product_id
-        if pid not in agg:
-            agg[pid] = {"qty": 0, "revenue": 0.0, "name": it.product.name if it.product else str(pid)}
-        agg[pid]["qty"] += int(it.quantity or 0)
-        agg[pid]["revenue"] += float(it.subtotal or 0.0)
-    arr = [{"product_id": pid, "name": v["name"], "qty": v["qty"], "total": v["revenue"]} for pid, v in agg.items()]
-    arr = sorted(arr, key=lambda x: x["total"], reverse=True)[:limit]
+    arr = sorted(get_product_sales(db, start_date, end_date), key=lambda x: x["total"], reverse=True)[:limit]
     return {"items": arr}
 
 @router.get("/reports/cancellations")
@@ -754,7 +288,7 @@ async def reports_export(format: str = Query("pdf"), start_date: date = Query(No
     orders = db.query(Order).filter(Order.created_at >= s, Order.created_at <= e).all()
     if format.lower() != "pdf":
         raise HTTPException(status_code=400, detail="Yalnızca PDF destekleniyor")
-    return await closing_report_pdf(current_user, db)
+    return await closing_report_pdf(report_date=end_date, current_user=current_user, db=db)
 
 @router.get("/reports/insights")
 async def reports_insights(start_date: date = Query(None), end_date: date = Query(None), current_user = Depends(require_role([UserRole.ADMIN])), db: Session = Depends(get_session)):
@@ -771,7 +305,7 @@ async def reports_insights(start_date: date = Query(None), end_date: date = Quer
         counts[pid]["qty"] += int(it.quantity or 0)
         counts[pid]["total"] += float(it.subtotal or 0.0)
     matrix = [{"name": v["name"], "volume": v["qty"], "profit_proxy": v["total"]} for _, v in counts.items()]
-    text = generate_analysis_text(matrix)
+    text = await generate_analysis_text(matrix)
     return {"analysis": text}
 
 @router.get("/reports/stock-status")
@@ -854,25 +388,26 @@ async def list_inventory(
     inv_map = {i.product_id: i.quantity for i in db.query(Inventory).all()}
     return [{"product_id": p.id, "name": p.name, "quantity": int(inv_map.get(p.id, 0))} for p in products]
 
-@router.put("/inventory/{product_id}")
-async def update_inventory(
-    product_id: int,
-    data: InventoryUpdate,
-    current_user = Depends(require_role([UserRole.ADMIN])),
-    db: Session = Depends(get_session)
-):
+def _update_inventory_tx(db: Session, product_id: int, quantity: int):
     p = db.query(Product).filter(Product.id == product_id).first()
     if not p:
         raise HTTPException(status_code=404, detail="Ürün bulunamadı")
     inv = db.query(Inventory).filter(Inventory.product_id == product_id).first()
     if not inv:
-        inv = Inventory(product_id=product_id, quantity=int(data.quantity or 0))
+        inv = Inventory(product_id=product_id, quantity=quantity)
         db.add(inv)
     else:
-        inv.quantity = int(data.quantity or 0)
-    db.commit()
+        inv.quantity = quantity
     return {"product_id": product_id, "quantity": inv.quantity}
 
+@router.put("/inventory/{product_id}")
+async def update_inventory(
+    product_id: int,
+    data: InventoryUpdate,
+    current_user = Depends(require_role([UserRole.ADMIN]))
+):
+    return await run_write(_update_inventory_tx, product_id, int(data.quantity or 0))
+
 @router.get("/settings")
 async def get_system_settings(db: Session = Depends(get_session)):
     config = db.query(RestaurantConfig).first()
@@ -1008,7 +543,6 @@ async def get_waiter_league(
     Garsonları toplam sipariş sayısına (puan) göre azalan sırada listeler.
     Bahşiş bilgisi dahil edilmez.
     """
-    from models import UserStats
     
     # Sadece garson rolündeki kullanıcıları al
     waiters = db.query(User).filter(
@@ -1036,126 +570,7 @@ async def get_waiter_league(
 
 
 # --- KAPSAMLI RAPORLAMA SİSTEMİ ---
-
-def _get_report_data(db: Session, start_date: date, end_date: date) -> Dict[str, Any]:
-    """Belirli tarih aralığı için tüm rapor verilerini toplar"""
-    s = datetime.combine(start_date, datetime.min.time())
-    e = datetime.combine(end_date, datetime.max.time())
-    
-    # Siparişler
-    orders = db.query(Order).filter(Order.created_at >= s, Order.created_at <= e).all()
-    
-    total_revenue = 0.0
-    cash_total = 0.0
-    card_total = 0.0
-    total_orders = 0
-    cancelled_orders = 0
-    
-    for o in orders:
-        total_orders += 1
-        status = (o.status.value if o.status else "").lower()
-        if status in ["cancelled", "iptal"]:
-            cancelled_orders += 1
-        else:
-            amount = float(o.total_amount or 0.0)
-            total_revenue += amount
-            pm = getattr(o, 'payment_method', None)
-            if pm == "cash":
-                cash_total += amount
-            elif pm == "card":
-                card_total += amount
-    
-    avg_order = total_revenue / max(1, (total_orders - cancelled_orders))
-    
-    # Ürün satışları
-    items = db.query(OrderItem).join(Order).filter(Order.created_at >= s, Order.created_at <= e).all()
-    product_stats = {}
-    for it in items:
-        pid = it.product_id
-        if pid not in product_stats:
-            product_stats[pid] = {"name": it.product.name if it.product else str(pid), "qty": 0, "total": 0.0}
-        product_stats[pid]["qty"] += int(it.quantity or 0)
-        product_stats[pid]["total"] += float(it.subtotal or 0.0)
-    
-    sorted_products = sorted(product_stats.values(), key=lambda x: x["qty"], reverse=True)
-    top_products = sorted_products[:10]
-    low_products = [p for p in sorted_products if p["qty"] > 0][-5:] if sorted_products else []
-    
-    # Garson performansı
-    waiters = db.query(User).filter(User.role == UserRole.WAITER, User.is_active == True).all()
-    waiter_stats = []
-    for w in waiters:
-        stats = db.query(UserStats).filter(UserStats.user_id == w.id).first()
-        waiter_stats.append({
-            "name": w.full_name or w.username,
-            "total_orders": int(stats.total_orders or 0) if stats else 0
-        })
-    waiter_stats.sort(key=lambda x: x["total_orders"], reverse=True)
-    
-    # Stok durumu
-    products = db.query(Product).filter(Product.is_active == True, Product.track_stock == True).all()
-    stock_status = []
-    critical_stock = []
-    for p in products:
-        stock = int(p.stock or 0)
-        stock_status.append({"name": p.name, "stock": stock})
-        if stock <= 10:
-            critical_stock.append({"name": p.name, "stock": stock})
-    
-    # Masa sayısı
-    total_tables = db.query(Table).filter(Table.is_active == True).count()
-    total_products = db.query(Product).filter(Product.is_active == True).count()
-    
-    # Günlük dağılım
-    daily_breakdown = {}
-    delta = (end_date - start_date).days + 1
-    for i in range(delta):
-        d = (start_date + timedelta(days=i)).isoformat()
-        daily_breakdown[d] = {"revenue": 0.0, "orders": 0}
-    
-    for o in orders:
-        od = o.created_at.date() if isinstance(o.created_at, datetime) else o.created_at
-        ds = od.isoformat()
-        status = (o.status.value if o.status else "").lower()
-        if ds in daily_breakdown and status not in ["cancelled", "iptal"]:
-            daily_breakdown[ds]["revenue"] += float(o.total_amount or 0.0)
-            daily_breakdown[ds]["orders"] += 1
-    
-    return {
-        "start_date": start_date.isoformat(),
-        "end_date": end_date.isoformat(),
-        "total_revenue": total_revenue,
-        "cash_total": cash_total,
-        "card_total": card_total,
-        "total_orders": total_orders,
-        "cancelled_orders": cancelled_orders,
-        "avg_order": avg_order,
-        "top_products": top_products,
-        "low_products": low_products,
-        "waiter_stats": waiter_stats,
-        "stock_status": stock_status,
-        "critical_stock": critical_stock,
-        "total_tables": total_tables,
-        "total_products": total_products,
-        "daily_breakdown": daily_breakdown
-    }
-
-def _format_for_ai(data: Dict[str, Any]) -> Dict[str, Any]:
-    """AI için veriyi formatla"""
-    top_text = "\n".join([f"- {p['name']}: {p['qty']} adet, {p['total']:.2f} ₺" for p in data.get("top_products", [])[:5]])
-    low_text = "\n".join([f"- {p['name']}: {p['qty']} adet" for p in data.get("low_products", [])[:5]])
-    waiter_text = "\n".join([f"- {w['name']}: {w['total_orders']} sipariş" for w in data.get("waiter_stats", [])[:5]])
-    stock_text = "\n".join([f"- {s['name']}: {s['stock']} adet (KRİTİK!)" for s in data.get("critical_stock", [])[:5]])
-    daily_text = "\n".join([f"- {d}: {v['revenue']:.2f} ₺, {v['orders']} sipariş" for d, v in sorted(data.get("daily_breakdown", {}).items())])
-    
-    return {
-        **data,
-        "top_products_text": top_text or "Veri yok",
-        "low_products_text": low_text or "Veri yok",
-        "waiter_stats_text": waiter_text or "Veri yok",
-        "stock_status_text": stock_text or "Kritik stok yok",
-        "daily_breakdown_text": daily_text or "Veri yok"
-    }
+# Rapor verisi ve AI yorumu report_artifacts'ta saklanır; veri değişmedikçe yeniden hesaplanmaz
 
 @router.get("/reports/daily-comprehensive")
 async def get_daily_comprehensive_report(
@@ -1166,18 +581,7 @@ async def get_daily_comprehensive_report(
     """Günlük kapsamlı rapor - tüm veriler + AI analizi"""
     if not report_date:
         report_date = date.today()
-    
-    data = _get_report_data(db, report_date, report_date)
-    data["date"] = report_date.isoformat()
-    
-    # AI analizi
-    ai_data = _format_for_ai(data)
-    ai_analysis = generate_daily_report_analysis(ai_data)
-    
-    return {
-        **data,
-        "ai_analysis": ai_analysis
-    }
+    return await get_report(db, "daily", report_date)
 
 @router.get("/reports/weekly-comprehensive")
 async def get_weekly_comprehensive_report(
@@ -1189,34 +593,7 @@ async def get_weekly_comprehensive_report(
     if not start_date:
         today = date.today()
         start_date = today - timedelta(days=today.weekday())  # Pazartesi
-    end_date = start_date + timedelta(days=6)
-    
-    data = _get_report_data(db, start_date, end_date)
-    
-    # Önceki hafta karşılaştırması
-    prev_start = start_date - timedelta(days=7)
-    prev_end = end_date - timedelta(days=7)
-    prev_data = _get_report_data(db, prev_start, prev_end)
-    
-    revenue_change = ((data["total_revenue"] - prev_data["total_revenue"]) / max(1, prev_data["total_revenue"])) * 100
-    order_change = ((data["total_orders"] - prev_data["total_orders"]) / max(1, prev_data["total_orders"])) * 100
-    
-    data["revenue_change"] = revenue_change
-    data["order_change"] = order_change
-    data["avg_daily_revenue"] = data["total_revenue"] / 7
-    
-    # AI analizi
-    ai_data = _format_for_ai(data)
-    ai_analysis = generate_weekly_report_analysis(ai_data)
-    
-    return {
-        **data,
-        "ai_analysis": ai_analysis,
-        "previous_week": {
-            "total_revenue": prev_data["total_revenue"],
-            "total_orders": prev_data["total_orders"]
-        }
-    }
+    return await get_report(db, "weekly", start_date)
 
 @router.get("/reports/monthly-comprehensive")
 async def get_monthly_comprehensive_report(
@@ -1231,63 +608,11 @@ async def get_monthly_comprehensive_report(
         year = today.year
     if not month:
         month = today.month
-    
-    start_date = date(year, month, 1)
-    if month == 12:
-        end_date = date(year + 1, 1, 1) - timedelta(days=1)
-    else:
-        end_date = date(year, month + 1, 1) - timedelta(days=1)
-    
-    data = _get_report_data(db, start_date, end_date)
-    
-    # Önceki ay karşılaştırması
-    if month == 1:
-        prev_start = date(year - 1, 12, 1)
-        prev_end = date(year, 1, 1) - timedelta(days=1)
-    else:
-        prev_start = date(year, month - 1, 1)
-        prev_end = start_date - timedelta(days=1)
-    
-    prev_data = _get_report_data(db, prev_start, prev_end)
-    
-    revenue_change = ((data["total_revenue"] - prev_data["total_revenue"]) / max(1, prev_data["total_revenue"])) * 100
-    order_change = ((data["total_orders"] - prev_data["total_orders"]) / max(1, prev_data["total_orders"])) * 100
-    
-    days_in_month = (end_date - start_date).days + 1
-    data["revenue_change"] = revenue_change
-    data["order_change"] = order_change
-    data["avg_daily_revenue"] = data["total_revenue"] / days_in_month
-    
-    # Haftalık dağılım
-    weekly_breakdown = {}
-    current = start_date
-    week_num = 1
-    while current <= end_date:
-        week_end = min(current + timedelta(days=6), end_date)
-        week_data = _get_report_data(db, current, week_end)
-        weekly_breakdown[f"Hafta {week_num}"] = {
-            "revenue": week_data["total_revenue"],
-            "orders": week_data["total_orders"]
-        }
-        current = week_end + timedelta(days=1)
-        week_num += 1
-    
-    data["weekly_breakdown"] = weekly_breakdown
-    weekly_text = "\n".join([f"- {w}: {v['revenue']:.2f} ₺, {v['orders']} sipariş" for w, v in weekly_breakdown.items()])
-    
-    # AI analizi
-    ai_data = _format_for_ai(data)
-    ai_data["weekly_breakdown_text"] = weekly_text
-    ai_analysis = generate_monthly_report_analysis(ai_data)
-    
-    return {
-        **data,
-        "ai_analysis": ai_analysis,
-        "previous_month": {
-            "total_revenue": prev_data["total_revenue"],
-            "total_orders": prev_data["total_orders"]
-        }
-    }
+    try:
+        start_date = date(year, month, 1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Geçersiz ay")
+    return await get_report(db, "monthly", start_date)
 
 @router.get("/reports/history-list")
 async def get_reports_history(
@@ -1297,16 +622,14 @@ async def get_reports_history(
     """Geçmiş günlerin listesi - rapor arşivi için"""
     # Son 30 günün verilerini getir
     today = date.today()
+    days = get_daily_sales(db, today - timedelta(days=29), today)
     history = []
     
     for i in range(30):
         d = today - timedelta(days=i)
-        s = datetime.combine(d, datetime.min.time())
-        e = datetime.combine(d, datetime.max.time())
-        
-        orders = db.query(Order).filter(Order.created_at >= s, Order.created_at <= e).all()
-        revenue = sum(float(o.total_amount or 0.0) for o in orders if (o.status and o.status.value.lower() not in ["cancelled", "iptal"]))
-        order_count = len([o for o in orders if (o.status and o.status.value.lower() not in ["cancelled", "iptal"])])
+        v = days.get(d)
+        revenue = v["total_revenue"] if v else 0.0
+        order_count = (v["total_orders"] - v["cancelled_orders"]) if v else 0
         
         if order_count > 0 or i < 7:  # Son 7 gün her zaman göster
             history.append({
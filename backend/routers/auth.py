@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from models import User, get_session
-from auth import verify_password, get_password_hash, create_access_token, get_current_active_user, require_role
+from auth import authenticate_password, hash_password, create_access_token, get_current_active_user, require_role, token_claims, find_user_by_pin, backfill_pin_fingerprint, pin_fingerprint
 from models import UserRole
+from typing import Optional
 from datetime import timedelta
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -32,7 +34,7 @@ class RegisterResponse(BaseModel):
 async def login(request: LoginRequest, db: Session = Depends(get_session)):
     user = db.query(User).filter(User.username == request.username).first()
     
-    if not user or not verify_password(request.password, user.password_hash):
+    if not user or not await authenticate_password(user, request.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -44,10 +46,13 @@ async def login(request: LoginRequest, db: Session = Depends(get_session)):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Inactive user"
         )
+    # Hash eski tur sayısıyla kaydedilmişse yenisi yazılır
+    if db.dirty:
+        db.commit()
     
     access_token_expires = timedelta(minutes=30)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data=token_claims(user), expires_delta=access_token_expires
     )
     
     return LoginResponse(
@@ -77,7 +82,7 @@ async def register(
         )
     
     # Create new user
-    hashed_password = get_password_hash(request.password)
+    hashed_password = await hash_password(request.password)
     new_user = User(
         username=request.username,
         email=request.email,
@@ -120,7 +125,7 @@ async def get_users(
     return [{"id": u.id, "username": u.username, "email": u.email, "role": u.role, "is_active": u.is_active} for u in users]
 
 class PinLoginRequest(BaseModel):
-    username: str
+    username: Optional[str] = None  # Verilmezse kullanıcı PIN'den bulunur
     pin: str
 
 class PinLoginResponse(BaseModel):
@@ -130,14 +135,27 @@ class PinLoginResponse(BaseModel):
 
 @router.post("/pin-login", response_model=PinLoginResponse)
 async def pin_login(request: PinLoginRequest, db: Session = Depends(get_session)):
-    user = db.query(User).filter(User.username == request.username).first()
-    if not user:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect username or pin")
     if len(request.pin) != 4:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="PIN must be 4 digits")
-    if not verify_password(request.pin, user.password_hash):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect username or pin")
-    access_token = create_access_token(data={"sub": user.username}, expires_delta=timedelta(minutes=30))
+    if request.username:
+        user = db.query(User).filter(User.username == request.username).first()
+        if not user or not await authenticate_password(user, request.pin):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect username or pin")
+        # Eski kayıt ya da PIN_HMAC_KEY değiştikten sonra kalan eski parmak izi yenilenir
+        if user.role == UserRole.WAITER and user.pin_fingerprint != pin_fingerprint(request.pin):
+            backfill_pin_fingerprint(db, user, request.pin)
+    else:
+        user = await find_user_by_pin(db, request.pin)
+        if not user:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect username or pin")
+    # Girişte yazılan parmak izi / yeniden hesaplanan hash
+    if db.dirty:
+        try:
+            db.commit()
+        except IntegrityError:
+            # Aynı PIN'in parmak izi eşzamanlı olarak başka kayda yazıldı; giriş yine geçerli
+            db.rollback()
+    access_token = create_access_token(data=token_claims(user), expires_delta=timedelta(minutes=30))
     return PinLoginResponse(
         access_token=access_token,
         token_type="bearer",
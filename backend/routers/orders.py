@@ -1,37 +1,83 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import List, Optional, Dict, Any
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from models import Order, OrderItem, OrderStatus, Table, Product, TableState, get_session
+from sqlalchemy import case, func, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from models import Order, OrderItem, OrderStatus, Table, Product, TableState, DailyOrderCounter, get_session
 from auth import require_role, get_current_active_user, optional_current_user
 from models import UserRole
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 from websocket_utils import broadcast_order_update, broadcast_to_admin
 from models import StockMovement, MovementType
-from pydantic import BaseModel
+from db_writer import run_write
+from services.kitchen_service import get_kitchen_tickets
+from services.dashboard_service import invalidate_dashboard_cache
+from services.catalog_service import invalidate_menu
+from services.rollup_service import record_order_created, record_order_change
+from services.order_events import status_delta
+from pydantic import BaseModel, Field
 import logging
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 logger = logging.getLogger("printer")
 
+# Günlük sipariş numaralarının sıfırlandığı saat (0-23)
+BUSINESS_DAY_START_HOUR = int(os.getenv("BUSINESS_DAY_START_HOUR", "0"))
+
+def current_business_date(now: Optional[datetime] = None) -> date:
+    """İş gününü döndürür; gün BUSINESS_DAY_START_HOUR saatinde (varsayılan 00:00) başlar"""
+    now = now or datetime.now()
+    return (now - timedelta(hours=BUSINESS_DAY_START_HOUR)).date()
+
+def business_day_bounds(business_date: date):
+    start = datetime.combine(business_date, datetime.min.time()) + timedelta(hours=BUSINESS_DAY_START_HOUR)
+    return start, start + timedelta(days=1)
+
 def get_next_daily_order_number(db: Session) -> int:
-    """Bugün için bir sonraki sipariş numarasını döndürür (her gün 1'den başlar)"""
-    today = date.today()
-    today_start = datetime.combine(today, datetime.min.time())
-    today_end = datetime.combine(today, datetime.max.time())
+    """Bugün için bir sonraki sipariş numarasını döndürür (her iş günü 1'den başlar).
+
+    Numara daily_order_counters tablosunda tek atomik artırımla alınır; sipariş ile
+    aynı transaction içinde çalıştığı için birden fazla worker'da da tekil ve boşluksuzdur.
+    """
+    business_date = current_business_date()
+    dialect = db.get_bind().dialect
     
-    # Bugünkü en yüksek daily_order_number'ı bul
-    max_num = db.query(func.max(Order.daily_order_number)).filter(
-        Order.created_at >= today_start,
-        Order.created_at <= today_end
-    ).scalar()
+    bump = update(DailyOrderCounter).where(DailyOrderCounter.business_date == business_date).values(last_number=DailyOrderCounter.last_number + 1)
+    if dialect.update_returning:
+        number = db.execute(bump.returning(DailyOrderCounter.last_number)).scalar()
+    elif db.execute(bump).rowcount:
+        number = db.execute(select(DailyOrderCounter.last_number).where(DailyOrderCounter.business_date == business_date)).scalar()
+    else:
+        number = None
+    if number is not None:
+        return number
     
-    return (max_num or 0) + 1
+    # Günün ilk siparişi: sayaç satırını oluştur. Sayaç tablosu sonradan eklendiği için
+    # o gün daha önce verilmiş numaralar varsa onların devamından başlanır.
+    start, end = business_day_bounds(business_date)
+    seed = select(func.coalesce(func.max(Order.daily_order_number), 0) + 1).where(
+        Order.created_at >= start,
+        Order.created_at < end
+    ).scalar_subquery()
+    if dialect.name in ("sqlite", "postgresql"):
+        dialect_insert = sqlite_insert if dialect.name == "sqlite" else pg_insert
+        stmt = dialect_insert(DailyOrderCounter).values(business_date=business_date, last_number=seed).on_conflict_do_update(
+            index_elements=[DailyOrderCounter.business_date],
+            set_={"last_number": DailyOrderCounter.last_number + 1}
+        ).returning(DailyOrderCounter.last_number)
+        return db.execute(stmt).scalar_one()
+    db.execute(insert(DailyOrderCounter).values(business_date=business_date, last_number=seed))
+    return db.execute(select(DailyOrderCounter.last_number).where(DailyOrderCounter.business_date == business_date)).scalar_one()
 
 # Pydantic models (Diğer fonksiyonlardan eksik kalanlar)
 class OrderItemCreate(BaseModel):
     product_id: int
-    quantity: int = 1
+    quantity: int = Field(1, gt=0)  # sıfır/eksi miktar koşullu UPDATE ile stok eklerdi
     extras: Dict[str, Any] = {}
 
 class OrderCreate(BaseModel):
@@ -59,6 +105,8 @@ class OrderResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
     items: List[OrderItemResponse]
+    payment_method: Optional[str] = None
+    version: Optional[int] = None
 
 # DÜZELTME: Status artık metin (str) olarak geliyor
 class OrderStatusUpdate(BaseModel):
@@ -67,60 +115,12 @@ class OrderStatusUpdate(BaseModel):
 # --- ENDPOINTLER ---
 
 @router.get("/kitchen/pending")
-async def get_pending_orders_for_kitchen(db: Session = Depends(get_session)):
-    orders = db.query(Order).filter(
-        Order.status.in_([OrderStatus.BEKLIYOR, OrderStatus.HAZIRLANIYOR])
-    ).order_by(Order.created_at.asc()).all()
-    
-    result = []
-    for order in orders:
-        items = []
-        for item in order.items:
-            p_name = item.product.name if item.product else "Silinmiş Ürün"
-            items.append({
-                "id": item.id, "product_id": item.product_id, "product_name": p_name,
-                "quantity": item.quantity, "extras": item.extras, "subtotal": item.subtotal
-            })
-        table_name = order.table.name if order.table else "Masa Bilinmiyor"
-        result.append({
-            "id": order.id, "table_name": table_name, "status": order.status,
-            "customer_notes": order.customer_notes, "created_at": order.created_at.isoformat(),
-            "items": items, "total_amount": order.total_amount
-        })
-    return result
+async def get_pending_orders_for_kitchen(updated_since: Optional[datetime] = Query(None), db: Session = Depends(get_session)):
+    return get_kitchen_tickets(db, updated_since)
 
 @router.get("/kitchen-tickets")
-async def get_kitchen_tickets(db: Session = Depends(get_session)):
-    orders = db.query(Order).filter(
-        Order.status.in_([OrderStatus.BEKLIYOR, OrderStatus.HAZIRLANIYOR])
-    ).order_by(Order.created_at.asc()).all()
-    result = []
-    for order in orders:
-        items = []
-        for item in order.items:
-            p_name = item.product.name if item.product else "Silinmiş Ürün"
-            items.append({
-                "id": item.id,
-                "product_id": item.product_id,
-                "product_name": p_name,
-                "quantity": item.quantity,
-                "extras": item.extras,
-                "subtotal": item.subtotal
-            })
-        table_name = order.table.name if order.table else "Masa Bilinmiyor"
-        table_number = order.table.number if order.table else 0
-        result.append({
-            "id": order.id,
-            "table_name": table_name,
-            "table_number": table_number,
-            "daily_order_number": order.daily_order_number,
-            "status": order.status,
-            "customer_notes": order.customer_notes,
-            "created_at": order.created_at.isoformat(),
-            "items": items,
-            "total_amount": order.total_amount
-        })
-    return result
+async def get_kitchen_tickets_endpoint(updated_since: Optional[datetime] = Query(None), db: Session = Depends(get_session)):
+    return get_kitchen_tickets(db, updated_since)
 
 @router.post("/printer/print-order/{order_id}")
 async def print_order_stub(order_id: int):
@@ -131,88 +131,163 @@ async def print_order_stub(order_id: int):
 async def get_order_stats(db: Session = Depends(get_session)):
     return {"total_orders": db.query(Order).count()}
 
-@router.post("", response_model=OrderResponse)
-async def create_order(order: OrderCreate, db: Session = Depends(get_session), current_user = Depends(optional_current_user)):
+LOW_STOCK_THRESHOLD = 15
+
+def _reserve_stock(db: Session, products: Dict[int, Product], requested: Dict[int, int]) -> List[Dict[str, Any]]:
+    """Stok takibi açık ürünlerin stoğunu tek koşullu UPDATE ile düşer.
+
+    UPDATE yalnızca stoğu yeterli satırları günceller; etkilenen satır sayısı eksikse
+    sipariş 400 ile reddedilir (çağıran transaction geri alınır). Eşzamanlı siparişler
+    stoğu eksiye düşüremez. Eşik altına düşen ürünleri döndürür.
+    """
+    tracked = {pid: qty for pid, qty in requested.items() if bool(products[pid].track_stock or False)}
+    if not tracked:
+        return []
+    tracked_ids = list(tracked.keys())
+    qty_for = case(tracked, value=Product.id)
+    current = func.coalesce(Product.stock, 0)
+    stmt = update(Product).where(
+        Product.id.in_(tracked_ids),
+        current >= qty_for
+    ).values(stock=current - qty_for).execution_options(synchronize_session=False)
+    if db.get_bind().dialect.update_returning:
+        remaining = dict(db.execute(stmt.returning(Product.id, Product.stock)).all())
+        reserved = len(remaining) == len(tracked)
+    else:
+        reserved = db.execute(stmt).rowcount == len(tracked)
+        remaining = None
+    if not reserved or remaining is None:
+        stocks = dict(db.execute(select(Product.id, Product.stock).where(Product.id.in_(tracked_ids))).all())
+        if not reserved:
+            # UPDATE'in atladığı (stoğu yetmeyen) ilk ürün hata mesajında gösterilir
+            if remaining is not None:
+                short_ids = [pid for pid in tracked_ids if pid not in remaining]
+            else:
+                short_ids = [pid for pid in tracked_ids if int(stocks.get(pid) or 0) < tracked[pid]]
+            short = short_ids[0] if short_ids else tracked_ids[0]
+            raise HTTPException(status_code=400, detail=f"Yetersiz stok: {products[short].name} (Kalan: {int(stocks.get(short) or 0)})")
+        remaining = stocks
+    return [
+        {"product_id": pid, "name": products[pid].name, "stock": int(left or 0)}
+        for pid, left in remaining.items() if int(left or 0) <= LOW_STOCK_THRESHOLD
+    ]
+
+def _create_order_tx(db: Session, order: OrderCreate, waiter_id: Optional[int]) -> Dict[str, Any]:
+    """Siparişi tek transaction içinde oluşturur; yayınlanacak olayları da döndürür.
+
+    Ürünler tek IN sorgusuyla alınır, kalemler ve stok hareketleri toplu eklenir.
+    Kalem sayısından bağımsız olarak sabit sayıda SQL ifadesi çalışır.
+    """
     # FIX: Masayı table_number ile bul
     table = db.query(Table).filter(Table.number == order.table_number).first()
     if not table: raise HTTPException(status_code=404, detail=f"Table with number {order.table_number} not found")
     
-    # Günlük sipariş numarası al
-    daily_num = get_next_daily_order_number(db)
+    product_ids = {item.product_id for item in order.items}
+    products = {p.id: p for p in db.query(Product).filter(Product.id.in_(product_ids)).all()} if product_ids else {}
+    # Bulunamayan ürünler (eskiden olduğu gibi) sessizce atlanır
+    lines = [item for item in order.items if item.product_id in products]
     
-    # Garson ID'sini al (eğer giriş yapmışsa)
-    waiter_id = current_user.id if current_user else None
+    # Stok rezervasyonu: aynı ürün birden fazla satırda olabilir, toplam miktar düşülür
+    requested: Dict[int, int] = {}
+    for item in lines:
+        requested[item.product_id] = requested.get(item.product_id, 0) + int(item.quantity or 0)
+    low_stock = _reserve_stock(db, products, requested)
+    
+    total_amount = sum(products[item.product_id].price * item.quantity for item in lines)
     
-    new_order = Order(table_id=table.id, waiter_id=waiter_id, customer_notes=order.customer_notes, status=OrderStatus.BEKLIYOR, daily_order_number=daily_num)
+    # Günlük sipariş numarası al
+    daily_num = get_next_daily_order_number(db)
+    new_order = Order(table_id=table.id, waiter_id=waiter_id, customer_notes=order.customer_notes, status=OrderStatus.BEKLIYOR, daily_order_number=daily_num, total_amount=total_amount, version=1)
     db.add(new_order)
-    db.commit()
-    db.refresh(new_order)
+    db.flush()
     
+    # Kalemler ve stok hareketleri tek executemany ile eklenir
+    if lines:
+        db.execute(insert(OrderItem), [
+            {"order_id": new_order.id, "product_id": item.product_id, "quantity": item.quantity, "unit_price": products[item.product_id].price, "extras": item.extras, "subtotal": products[item.product_id].price * item.quantity}
+            for item in lines
+        ])
+    movements = [
+        {"product_id": item.product_id, "quantity": -int(item.quantity or 0), "movement_type": MovementType.SATIS, "description": f"Sipariş #{new_order.id} - Masa {table.number}"}
+        for item in lines if bool(products[item.product_id].track_stock or False)
+    ]
+    if movements:
+        db.execute(insert(StockMovement), movements)
+    # Günlük satış / ürün özetleri aynı transaction içinde güncellenir
+    record_order_created(db, new_order, [(item.product_id, item.quantity, products[item.product_id].price * item.quantity) for item in lines])
     # Garson puanı ekle (sipariş başına 1 puan)
     if waiter_id:
-        try:
-            from models import UserStats
-            stats = db.query(UserStats).filter(UserStats.user_id == waiter_id).first()
-            if not stats:
-                stats = UserStats(user_id=waiter_id, total_orders=0, total_sales_score=0.0)
-                db.add(stats)
-            stats.total_orders = (stats.total_orders or 0) + 1
-            db.commit()
-        except Exception:
-            pass
-    
-    total_amount = 0.0
-    order_items = []
-    for item_data in order.items:
-        product = db.query(Product).filter(Product.id == item_data.product_id).first()
-        if not product: continue
-        if bool(product.track_stock or False):
-            if int(product.stock or 0) < int(item_data.quantity or 0):
-                raise HTTPException(status_code=400, detail=f"Yetersiz stok: {product.name} (Kalan: {int(product.stock or 0)})")
-            product.stock = int(product.stock or 0) - int(item_data.quantity or 0)
-            db.add(StockMovement(product_id=product.id, quantity=-int(item_data.quantity or 0), movement_type=MovementType.SATIS, description=f"Sipariş #{new_order.id} - Masa {table.number}"))
-            if int(product.stock or 0) <= 15:
-                await broadcast_to_admin({"type": "stock_warning", "message": f"Dikkat: {product.name} stoğu azaldı! Kalan: {int(product.stock or 0)}"})
-        subtotal = product.price * item_data.quantity
-        total_amount += subtotal
-        order_item = OrderItem(order_id=new_order.id, product_id=item_data.product_id, quantity=item_data.quantity, unit_price=product.price, extras=item_data.extras, subtotal=subtotal)
-        db.add(order_item)
-        db.commit()
-        db.refresh(order_item)
-        order_items.append({
-            "id": order_item.id, "product_id": order_item.product_id, "quantity": order_item.quantity,
-            "unit_price": order_item.unit_price, "extras": order_item.extras, "subtotal": order_item.subtotal,
-            "product": {"id": product.id, "name": product.name, "description": product.description, "price": product.price, "image_url": product.image_url}
-        })
+        from models import UserStats
+        stats = db.query(UserStats).filter(UserStats.user_id == waiter_id).first()
+        if not stats:
+            stats = UserStats(user_id=waiter_id, total_orders=0, total_sales_score=0.0)
+            db.add(stats)
+        stats.total_orders = (stats.total_orders or 0) + 1
     
-    new_order.total_amount = total_amount
-    db.commit()
     # Masa occupancy set
-    try:
-        ts = db.query(TableState).filter(TableState.table_id == table.id).first()
-        if not ts:
-            ts = TableState(table_id=table.id, is_occupied=True)
-            db.add(ts)
-        else:
-            ts.is_occupied = True
-        db.commit()
-    except Exception:
-        db.rollback()
+    ts = db.query(TableState).filter(TableState.table_id == table.id).first()
+    if not ts:
+        db.add(TableState(table_id=table.id, is_occupied=True))
+    else:
+        ts.is_occupied = True
+    db.flush()
     
-    await broadcast_order_update({
-        "id": new_order.id, "table_id": new_order.table_id, "table_name": table.name, "status": new_order.status,
-        "customer_notes": new_order.customer_notes, "total_amount": new_order.total_amount,
-        "created_at": new_order.created_at.isoformat(),
-        "items": [{"product_name": i['product']['name'], "quantity": i['quantity']} for i in order_items]
-    }, "order_created")
-    await broadcast_to_admin({"type": "table_status", "table_number": table.number, "table_name": table.name, "is_occupied": True, "total_amount": new_order.total_amount})
+    order_items = db.query(OrderItem).filter(OrderItem.order_id == new_order.id).order_by(OrderItem.id.asc()).all()
+    items_payload = []
+    for oi in order_items:
+        product = products[oi.product_id]
+        items_payload.append({
+            "id": oi.id, "product_id": oi.product_id, "quantity": oi.quantity,
+            "unit_price": oi.unit_price, "extras": oi.extras, "subtotal": oi.subtotal,
+            "product": {"id": product.id, "name": product.name, "description": product.description, "price": product.price, "image_url": product.image_url}
+        })
     
     return {
-        "id": new_order.id, "table_id": new_order.table_id, "table_name": table.name, "status": new_order.status,
-        "customer_notes": new_order.customer_notes, "total_amount": new_order.total_amount,
-        "created_at": new_order.created_at, "updated_at": new_order.updated_at, "items": order_items
+        "order": {
+            "id": new_order.id, "table_id": new_order.table_id, "table_name": table.name, "status": new_order.status,
+            "customer_notes": new_order.customer_notes, "total_amount": new_order.total_amount,
+            "created_at": new_order.created_at, "updated_at": new_order.updated_at, "items": items_payload,
+            "version": new_order.version
+        },
+        # WebSocket order_created olayı: mutfak fişiyle aynı alanlar (kitchen_service.ticket_payload)
+        "ticket": {
+            "id": new_order.id, "version": new_order.version, "table_id": table.id, "table_name": table.name,
+            "table_number": table.number, "daily_order_number": new_order.daily_order_number, "status": new_order.status,
+            "customer_notes": new_order.customer_notes, "created_at": new_order.created_at.isoformat(),
+            "updated_at": new_order.updated_at.isoformat() if new_order.updated_at else None,
+            "items": [
+                {"id": i["id"], "product_id": i["product_id"], "product_name": i["product"]["name"], "quantity": i["quantity"], "extras": i["extras"], "subtotal": i["subtotal"]}
+                for i in items_payload
+            ],
+            "total_amount": new_order.total_amount
+        },
+        "table_number": table.number,
+        "low_stock": low_stock,
     }
 
+@router.post("", response_model=OrderResponse)
+async def create_order(order: OrderCreate, current_user = Depends(optional_current_user)):
+    # Garson ID'sini al (eğer giriş yapmışsa)
+    waiter_id = current_user.id if current_user else None
+    result = await run_write(_create_order_tx, order, waiter_id)
+    created = result["order"]
+    invalidate_dashboard_cache()
+    if any(x["stock"] <= 0 for x in result["low_stock"]):
+        # Menü stoğu biten ürünleri göstermez: görüntü yeniden kurulsun
+        invalidate_menu()
+    
+    # Yayınlar yalnızca commit başarılı olduktan sonra yapılır    
+    if result["low_stock"]:
+        # Azalan stoklar tek bir toplu uyarı olarak gönderilir
+        await broadcast_to_admin({
+            "type": "stock_warning",
+            "message": "Dikkat: " + ", ".join(f"{x['name']} stoğu azaldı! Kalan: {x['stock']}" for x in result["low_stock"]),
+            "items": result["low_stock"]
+        })
+    await broadcast_order_update(result["ticket"], "order_created", table_number=result["table_number"], waiter_id=waiter_id)
+    
+    return created
+
 @router.get("", response_model=List[OrderResponse])
 async def get_orders(skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000), status_filter: Optional[OrderStatus] = Query(None), table_id: Optional[int] = Query(None), db: Session = Depends(get_session)):
     query = db.query(Order).join(Table)
@@ -230,7 +305,7 @@ async def get_orders(skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, l
             items.append({"id": item.id, "product_id": item.product_id, "quantity": item.quantity, "unit_price": item.unit_price, "extras": item.extras, "subtotal": item.subtotal, "product": {"id": item.product_id, "name": p_name, "description": p_desc, "price": item.unit_price, "image_url": p_img}})
         table_name = order.table.name if order.table else "Masa Bilinmiyor"
         payment_method = getattr(order, 'payment_method', None)
-        result.append({"id": order.id, "table_id": order.table_id, "table_name": table_name, "status": order.status, "customer_notes": order.customer_notes, "total_amount": order.total_amount, "payment_method": payment_method, "created_at": order.created_at, "updated_at": order.updated_at, "items": items})
+        result.append({"id": order.id, "table_id": order.table_id, "table_name": table_name, "status": order.status, "customer_notes": order.customer_notes, "total_amount": order.total_amount, "payment_method": payment_method, "created_at": order.created_at, "updated_at": order.updated_at, "items": items, "version": order.version})
     return result
 
 @router.get("/{order_id}", response_model=OrderResponse)
@@ -244,11 +319,41 @@ async def get_order(order_id: int, db: Session = Depends(get_session)):
     table_name = order.table.name if order.table else "Masa Bilinmiyor"
     return {"id": order.id, "table_id": order.table_id, "table_name": table_name, "status": order.status, "customer_notes": order.customer_notes, "total_amount": order.total_amount, "created_at": order.created_at, "updated_at": order.updated_at, "items": items}
 
+def _update_order_status_tx(db: Session, order_id: int, new_status: OrderStatus) -> Dict[str, Any]:
+    """Durum değişikliği, özet güncellemesi ve garson puanı düşümü tek transaction'da"""
+    order = db.query(Order).filter(Order.id == order_id).first()
+    if not order: raise HTTPException(status_code=404, detail="Order not found")
+    
+    old_status = order.status
+    order.status = new_status
+    order.version = (order.version or 0) + 1
+    record_order_change(db, order, old_status, order.payment_method)
+    
+    # İptal edildiğinde garson puanını düşür
+    if new_status == OrderStatus.IPTAL and order.waiter_id:
+        from models import UserStats
+        stats = db.query(UserStats).filter(UserStats.user_id == order.waiter_id).first()
+        if stats and (stats.total_orders or 0) > 0:
+            stats.total_orders = (stats.total_orders or 0) - 1
+    db.flush()
+    
+    table = order.table
+    return {
+        "order": {
+            "id": order.id, "table_id": order.table_id, "table_name": table.name if table else "Masa Bilinmiyor",
+            "status": order.status, "customer_notes": order.customer_notes,
+            "total_amount": order.total_amount, "created_at": order.created_at,
+            "updated_at": order.updated_at, "items": [], "version": order.version
+        },
+        "delta": status_delta(order, old_status, table),
+        "table_number": table.number if table else None,
+        "waiter_id": order.waiter_id,
+    }
+
 @router.put("/{order_id}/status", response_model=OrderResponse)
 async def update_order_status(
     order_id: int,
     status_update: OrderStatusUpdate,
-    db: Session = Depends(get_session),
     current_user = Depends(optional_current_user)
 ):
     # ÇEVİRİ SÖZLÜĞÜ: Türkçe/İngilizce ne gelirse gelsin doğruya çevirir
@@ -265,35 +370,11 @@ async def update_order_status(
     if not new_status_enum:
         raise HTTPException(status_code=422, detail=f"Geçersiz durum: {status_update.status}")
 
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if not order: raise HTTPException(status_code=404, detail="Order not found")
+    result = await run_write(_update_order_status_tx, order_id, new_status_enum)
+    invalidate_dashboard_cache()
     
-    old_status = order.status
-    order.status = new_status_enum
-    db.commit()
+    # Yalnızca durum farkı yayınlanır; iptal için ayrı olay tipi (mutfaktan silinmesi için)
+    update_type = "order_cancelled" if new_status_enum == OrderStatus.IPTAL else "order_updated"
+    await broadcast_order_update(result["delta"], update_type, table_number=result["table_number"], waiter_id=result["waiter_id"])
     
-    # İptal edildiğinde garson puanını düşür
-    try:
-        from models import UserStats
-        if new_status_enum == OrderStatus.IPTAL and order.waiter_id:
-            stats = db.query(UserStats).filter(UserStats.user_id == order.waiter_id).first()
-            if stats and (stats.total_orders or 0) > 0:
-                stats.total_orders = (stats.total_orders or 0) - 1
-                db.commit()
-    except Exception:
-        pass
-    
-    table_name = order.table.name if order.table else "Masa Bilinmiyor"
-    
-    # İptal edilen siparişler için özel event gönder (mutfaktan silinmesi için)
-    if new_status_enum == OrderStatus.IPTAL:
-        await broadcast_order_update({"id": order.id, "status": "cancelled", "table_name": table_name}, "order_cancelled")
-    else:
-        await broadcast_order_update({"id": order.id, "status": order.status, "table_name": table_name}, "order_updated")
-    
-    return {
-        "id": order.id, "table_id": order.table_id, "table_name": table_name,
-        "status": order.status, "customer_notes": order.customer_notes,
-        "total_amount": order.total_amount, "created_at": order.created_at,
-        "updated_at": order.updated_at, "items": []
-    }
+    return result["order"]
@@ -1,10 +1,12 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, UploadFile, File
+from fastapi import APIRouter, HTTPException, Depends, Query, UploadFile, File, Request, Response
 from typing import List, Optional, Dict, Any
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from pydantic import BaseModel
 from models import Product, Category, ExtraGroup, ExtraItem, ProductExtraGroup, get_session
 from auth import require_role, get_current_active_user
 from models import UserRole, StockMovement, MovementType
+from db_writer import run_write
+from services.catalog_service import MENU_CACHE_CONTROL, etag_matches, extra_group_dict, get_menu_snapshot, get_product_detail, invalidate_menu, product_dict, product_query
 import os
 import sys
 from pathlib import Path
@@ -99,6 +101,7 @@ async def create_category(category: CategoryCreate, current_user = Depends(requi
     new_category = Category(**category.dict())
     db.add(new_category)
     db.commit()
+    invalidate_menu()
     db.refresh(new_category)
     return new_category
 
@@ -120,6 +123,7 @@ async def update_category(category_id: int, category_update: CategoryCreate, cur
     if not category: raise HTTPException(status_code=404, detail="Kategori bulunamadı")
     for key, value in category_update.dict().items(): setattr(category, key, value)
     db.commit()
+    invalidate_menu()
     db.refresh(category)
     return category
 
@@ -129,6 +133,7 @@ async def delete_category(category_id: int, current_user = Depends(require_role(
     if not category: raise HTTPException(status_code=404, detail="Kategori bulunamadı")
     category.is_active = False
     db.commit()
+    invalidate_menu()
     return {"message": "Kategori silindi"}
 
 # Ekstra Grupları
@@ -141,20 +146,22 @@ async def create_extra_group(extra_group: ExtraGroupCreate, current_user = Depen
     for item in extra_group.items:
         db.add(ExtraItem(name=item.name, price=item.price, group_id=new_group.id))
     db.commit()
-    return db.query(ExtraGroup).filter(ExtraGroup.id == new_group.id).first()
+    invalidate_menu()
+    db.refresh(new_group)
+    return extra_group_dict(new_group)
 
 @router.get("/extra-groups", response_model=List[ExtraGroupResponse])
 async def get_extra_groups(active_only: bool = Query(True), db: Session = Depends(get_session)):
     query = db.query(ExtraGroup)
     if active_only: query = query.filter(ExtraGroup.items.any(ExtraItem.is_active == True))
-    return query.all()
+    return [extra_group_dict(g) for g in query.options(selectinload(ExtraGroup.items)).all()]
 
 # --- GERİ EKLENEN FONKSİYON ---
 @router.get("/extra-groups/{group_id}", response_model=ExtraGroupResponse)
 async def get_extra_group(group_id: int, db: Session = Depends(get_session)):
     group = db.query(ExtraGroup).filter(ExtraGroup.id == group_id).first()
     if not group: raise HTTPException(status_code=404, detail="Ekstra grubu bulunamadı")
-    return group
+    return extra_group_dict(group)
 
 # Ürünler
 @router.post("", response_model=ProductResponse)
@@ -163,69 +170,59 @@ async def create_product(product: ProductCreate, current_user = Depends(require_
     new_product = Product(**product.dict())
     db.add(new_product)
     db.commit()
+    invalidate_menu()
     db.refresh(new_product)
     return new_product
 
 @router.get("", response_model=List[ProductResponse])
 async def get_products(skip: int = 0, limit: int = 100, category_id: Optional[int] = None, featured_only: bool = False, active_only: bool = True, db: Session = Depends(get_session)):
-    query = db.query(Product)
+    query = product_query(db)
     if category_id: query = query.filter(Product.category_id == category_id)
     if featured_only: query = query.filter(Product.is_featured == True)
     if active_only: query = query.filter(Product.is_active == True)
-    products = query.offset(skip).limit(limit).all()
-    result = []
-    for p in products:
-        category_data = {"id": p.category.id, "name": p.category.name, "icon": p.category.icon} if p.category else None
-        result.append({
-            "id": p.id,
-            "name": p.name,
-            "description": p.description,
-            "price": p.price,
-            "image_url": p.image_url,
-            "category": category_data,
-            "is_featured": p.is_featured,
-            "is_active": p.is_active,
-            "created_at": p.created_at,
-            "stock": int(p.stock or 0),
-            "track_stock": bool(p.track_stock or False)
-        })
-    return result
+    return [product_dict(p) for p in query.offset(skip).limit(limit).all()]
+
+@router.get("/menu")
+def get_menu_tree(request: Request):
+    """Müşteri/garson menüsü: kategoriler → ürünler → ekstra grupları tek yanıtta.
+
+    Bellekteki hazır görüntüden döner; ETag eşleşirse gövdesiz 304. Görüntü yeniden
+    kurulurken veritabanı okunduğu için uç nokta thread havuzunda (def) çalışır.
+    """
+    snapshot = get_menu_snapshot()
+    headers = {"ETag": snapshot.etag, "Cache-Control": MENU_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), snapshot.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
 
 @router.get("/{product_id}", response_model=ProductDetailResponse)
 async def get_product(product_id: int, db: Session = Depends(get_session)):
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = get_product_detail(db, product_id)
     if not product: raise HTTPException(status_code=404, detail="Ürün bulunamadı")
-    
-    extra_groups = []
-    for peg in product.extra_groups:
-        group_data = {
-            "id": peg.extra_group.id, "name": peg.extra_group.name, "is_required": peg.extra_group.is_required, "max_selections": peg.extra_group.max_selections,
-            "items": [{"id": i.id, "name": i.name, "price": i.price, "is_active": i.is_active} for i in peg.extra_group.items if i.is_active]
-        }
-        extra_groups.append(group_data)
-    
-    category_data = {"id": product.category.id, "name": product.category.name, "icon": product.category.icon} if product.category else None
-    from sqlalchemy.orm import Session as _Session
-    return {
-        "id": product.id, "name": product.name, "description": product.description, "price": product.price, "image_url": product.image_url,
-        "category": category_data, "is_featured": product.is_featured, "is_active": product.is_active, "created_at": product.created_at, "stock": int(product.stock or 0), "track_stock": bool(product.track_stock or False), "extra_groups": extra_groups
-    }
+    return product
 
-@router.put("/{product_id}", response_model=ProductResponse)
-async def update_product(product_id: int, product_update: ProductUpdate, current_user = Depends(require_role([UserRole.ADMIN])), db: Session = Depends(get_session)):
+def _update_product_tx(db: Session, product_id: int, updates: Dict[str, Any]):
     product = db.query(Product).filter(Product.id == product_id).first()
     if not product: raise HTTPException(status_code=404, detail="Ürün bulunamadı")
     old_stock = int(product.stock or 0)
-    # Kısmi update: sadece gönderilen alanlar güncellensin
-    updates = product_update.dict(exclude_unset=True)
     for key, value in updates.items(): setattr(product, key, value)
     new_stock_val = int(product.stock or 0)
     if bool(product.track_stock or False) and new_stock_val != old_stock:
         diff = new_stock_val - old_stock
         movement_type = MovementType.GIRIS if diff > 0 else MovementType.DUZELTME
         db.add(StockMovement(product_id=product.id, quantity=diff, movement_type=movement_type, description="Admin Manuel Güncelleme"))
-    db.commit()
+    db.flush()
     db.refresh(product)
+    # Yanıt modeli için kategori oturum kapanmadan yüklenir
+    product.category
+    return product
+
+@router.put("/{product_id}", response_model=ProductResponse)
+async def update_product(product_id: int, product_update: ProductUpdate, current_user = Depends(require_role([UserRole.ADMIN]))):
+    # Kısmi update: sadece gönderilen alanlar güncellensin
+    updates = product_update.dict(exclude_unset=True)
+    product = await run_write(_update_product_tx, product_id, updates)
+    invalidate_menu()
     return product
 
 @router.delete("/{product_id}")
@@ -234,6 +231,7 @@ async def delete_product(product_id: int, current_user = Depends(require_role([U
     if not product: raise HTTPException(status_code=404, detail="Ürün bulunamadı")
     product.is_active = False
     db.commit()
+    invalidate_menu()
     return {"message": "Ürün silindi"}
 
 @router.post("/{product_id}/extra-groups/{group_id}")
@@ -242,6 +240,7 @@ async def assign_extra_group_to_product(product_id: int, group_id: int, current_
     if existing: raise HTTPException(status_code=400, detail="Zaten atanmış")
     db.add(ProductExtraGroup(product_id=product_id, extra_group_id=group_id))
     db.commit()
+    invalidate_menu()
     return {"message": "Atandı"}
 
 # --- GERİ EKLENEN FONKSİYON ---
@@ -251,6 +250,7 @@ async def remove_extra_group_from_product(product_id: int, group_id: int, curren
     if not assignment: raise HTTPException(status_code=404, detail="Atama bulunamadı")
     db.delete(assignment)
     db.commit()
+    invalidate_menu()
     return {"message": "Silindi"}
 
 @router.post("/{product_id}/image")
@@ -277,4 +277,5 @@ async def upload_product_image(product_id: int, file: UploadFile = File(...), cu
     image_url = f"/static/uploads/{filename}"
     product.image_url = image_url
     db.commit()
+    invalidate_menu()
     return {"image_url": image_url}
@@ -5,7 +5,12 @@ from pydantic import BaseModel
 from models import Table, get_session, Order, OrderStatus, TableState
 from auth import require_role, get_current_active_user
 from models import UserRole
-from websocket_utils import broadcast_to_admin 
+from websocket_utils import broadcast_to_admin, broadcast_table_update
+from db_writer import run_write
+from services.table_service import get_open_tables
+from services.dashboard_service import invalidate_dashboard_cache
+from services.rollup_service import record_order_change
+from services.order_events import status_delta, table_ref
 import qrcode
 import io
 import base64
@@ -75,21 +80,8 @@ async def generate_table_qr(table_number: int) -> str:
 
 # --- ENDPOINTLER ---
 @router.get("/open")
-async def get_open_tables(db: Session = Depends(get_session)):
-    tables = db.query(Table).filter(Table.is_active == True).all()
-    result = []
-    for t in tables:
-        orders = db.query(Order).filter(Order.table_id == t.id).all()
-        active_items = []
-        total = 0.0
-        for o in orders:
-            if o.status not in [OrderStatus.TESLIM_EDILDI, OrderStatus.IPTAL]:
-                total += float(o.total_amount or 0.0)
-                for it in o.items:
-                    active_items.append({"order_id": o.id, "product_id": it.product_id, "quantity": it.quantity, "subtotal": float(it.subtotal or 0.0)})
-        if active_items:
-            result.append({"table_id": t.id, "table_number": t.number, "table_name": t.name, "total_amount": total, "items": active_items})
-    return result
+async def get_open_tables_endpoint(db: Session = Depends(get_session)):
+    return get_open_tables(db, include_occupied=False)
 
 @router.post("", response_model=TableResponse)
 async def create_table(table: TableCreate, current_user = Depends(require_role([UserRole.ADMIN])), db: Session = Depends(get_session)):
@@ -284,6 +276,7 @@ async def transfer_table_orders(source_id: int, target_id: int, db: Session = De
     ).all()
     for o in active_orders:
         o.table_id = target_id
+        o.version = (o.version or 0) + 1
     db.commit()
     s = db.query(TableState).filter(TableState.table_id == source_id).first()
     if not s:
@@ -298,6 +291,12 @@ async def transfer_table_orders(source_id: int, target_id: int, db: Session = De
     else:
         t.is_occupied = True
     db.commit()
+    # Taşınan siparişler yalnızca kimlik + yeni sürüm olarak yayınlanır; istemci fişleri kendisi taşır
+    await broadcast_table_update({
+        "source": table_ref(source, is_occupied=False),
+        "target": table_ref(target, is_occupied=True),
+        "orders": [{"id": o.id, "version": o.version} for o in active_orders],
+    }, "orders_moved", [source.number, target.number])
     return {"moved_orders": len(active_orders), "source_is_occupied": False, "target_is_occupied": True}
 
 @router.post("/merge/{source_id}/{target_id}")
@@ -319,6 +318,10 @@ async def merge_tables(source_id: int, target_id: int, db: Session = Depends(get
     else:
         t.is_occupied = True
     db.commit()
+    await broadcast_table_update({
+        "source": dict(table_ref(source), merged_with_table_id=target_id),
+        "target": table_ref(target, is_occupied=True),
+    }, "tables_merged", [source.number, target.number], kitchen=False)
     return {"message": "Birleştirildi", "source_merged_with": target_id}
 
 @router.get("/details/{table_id}")
@@ -380,25 +383,23 @@ async def print_bill(table_id: int, db: Session = Depends(get_session)):
 class CloseTableRequest(BaseModel):
     payment_method: Optional[str] = None  # "cash" veya "card"
 
-@router.post("/close/{table_id}")
-async def close_table(table_id: int, request: CloseTableRequest = None, db: Session = Depends(get_session)):
+def _close_table_tx(db: Session, table_id: int, payment_method: Optional[str]):
     table = db.query(Table).filter(Table.id == table_id).first()
     if not table:
         raise HTTPException(status_code=404, detail="Masa bulunamadı")
     
-    # Ödeme yöntemini al (request body veya None)
-    payment_method = None
-    if request and request.payment_method:
-        if request.payment_method in ["cash", "card"]:
-            payment_method = request.payment_method
-    
     orders = db.query(Order).filter(Order.table_id == table_id).all()
+    closed = []
     for o in orders:
         if o.status not in [OrderStatus.TESLIM_EDILDI, OrderStatus.IPTAL]:
+            old_status, old_payment_method = o.status, o.payment_method
             o.status = OrderStatus.TESLIM_EDILDI
+            o.version = (o.version or 0) + 1
             # Ödeme yöntemini kaydet
             if payment_method:
                 o.payment_method = payment_method
+            record_order_change(db, o, old_status, old_payment_method)
+            closed.append((o, old_status))
     
     s = db.query(TableState).filter(TableState.table_id == table_id).first()
     if not s:
@@ -406,5 +407,19 @@ async def close_table(table_id: int, request: CloseTableRequest = None, db: Sess
         db.add(s)
     else:
         s.is_occupied = False
-    db.commit()
+    db.flush()
+    # table_closed olayı: masa ve kapatılan siparişlerin durum farkları
+    return dict(table_ref(table, is_occupied=False), payment_method=payment_method, orders=[status_delta(o, old, table) for o, old in closed])
+
+@router.post("/close/{table_id}")
+async def close_table(table_id: int, request: CloseTableRequest = None):
+    # Ödeme yöntemini al (request body veya None)
+    payment_method = None
+    if request and request.payment_method:
+        if request.payment_method in ["cash", "card"]:
+            payment_method = request.payment_method
+    
+    event = await run_write(_close_table_tx, table_id, payment_method)
+    invalidate_dashboard_cache()
+    await broadcast_table_update(event, "table_closed", [event["table_number"]])
     return {"message": "Masa kapatıldı", "table_id": table_id, "payment_method": payment_method}
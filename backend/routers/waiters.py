@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from models import User, UserRole, get_session, Table, TableState, WaiterTableAssignment
-from auth import require_role, get_password_hash, verify_password
+from auth import require_role, hash_password, invalidate_principal, pin_in_use, pin_fingerprint
+from typing import Optional
 import random
 
 router = APIRouter(prefix="/waiters", tags=["Waiters"])
@@ -20,6 +22,25 @@ class WaiterResponse(BaseModel):
 class WaiterAssignTables(BaseModel):
     table_ids: list[int]
 
+PIN_COMMIT_ATTEMPTS = 3
+PIN_GENERATE_ATTEMPTS = 50
+
+async def _new_unique_pin(db: Session) -> Optional[str]:
+    """Başka bir garsonda olmayan 4 haneli PIN; bulunamazsa None"""
+    for _ in range(PIN_GENERATE_ATTEMPTS):
+        pin = "".join([str(random.randint(0,9)) for _ in range(4)])
+        if not await pin_in_use(db, pin):
+            return pin
+    return None
+
+def _free_username(db: Session, base: str) -> str:
+    uname = base
+    i = 1
+    while db.query(User).filter(User.username == uname).first() is not None:
+        i += 1
+        uname = f"{base}-{i}"
+    return uname
+
 @router.get("")
 async def list_waiters(current_user = Depends(require_role([UserRole.ADMIN])), db: Session = Depends(get_session)):
     users = db.query(User).filter(User.role == UserRole.WAITER).all()
@@ -28,24 +49,21 @@ async def list_waiters(current_user = Depends(require_role([UserRole.ADMIN])), d
 @router.post("")
 async def create_waiter(data: WaiterCreate, current_user = Depends(require_role([UserRole.ADMIN])), db: Session = Depends(get_session)):
     base = data.full_name.strip().lower().replace(" ", "-")
-    uname = base
-    i = 1
-    while db.query(User).filter(User.username == uname).first() is not None:
-        i += 1
-        uname = f"{base}-{i}"
-    pin = "".join([str(random.randint(0,9)) for _ in range(4)])
-    while True:
-        exists = False
-        for w in db.query(User).filter(User.role == UserRole.WAITER).all():
-            if verify_password(pin, w.password_hash):
-                exists = True
-                break
-        if not exists:
+    for _ in range(PIN_COMMIT_ATTEMPTS):
+        # Eşzamanlı bir istek aynı kullanıcı adını ya da PIN'i almış olabilir: her denemede yeniden seçilir
+        uname = _free_username(db, base)
+        pin = await _new_unique_pin(db)
+        if pin is None:
+            raise HTTPException(status_code=409, detail="Boş PIN bulunamadı")
+        u = User(username=uname, full_name=data.full_name, password_hash=await hash_password(pin), pin_fingerprint=pin_fingerprint(pin), role=UserRole.WAITER, is_active=True)
+        db.add(u)
+        try:
+            db.commit()
             break
-        pin = "".join([str(random.randint(0,9)) for _ in range(4)])
-    u = User(username=uname, full_name=data.full_name, password_hash=get_password_hash(pin), role=UserRole.WAITER, is_active=True)
-    db.add(u)
-    db.commit()
+        except IntegrityError:
+            db.rollback()
+    else:
+        raise HTTPException(status_code=409, detail="PIN atanamadı, tekrar deneyin")
     db.refresh(u)
     return {"id": u.id, "username": u.username, "full_name": u.full_name, "pin": pin}
 
@@ -54,9 +72,11 @@ async def delete_waiter(waiter_id: int, current_user = Depends(require_role([Use
     u = db.query(User).filter(User.id == waiter_id, User.role == UserRole.WAITER).first()
     if not u:
         raise HTTPException(status_code=404, detail="Waiter not found")
+    username = u.username
     db.query(WaiterTableAssignment).filter(WaiterTableAssignment.user_id == waiter_id).delete()
     db.delete(u)
     db.commit()
+    invalidate_principal(username)
     return {"message": "deleted"}
 
 @router.get("/{waiter_id}/tables")
@@ -89,20 +109,20 @@ async def reset_pin(waiter_id: int, current_user = Depends(require_role([UserRol
     u = db.query(User).filter(User.id == waiter_id, User.role == UserRole.WAITER).first()
     if not u:
         raise HTTPException(status_code=404, detail="Waiter not found")
-    import random
-    new_pin = "".join([str(random.randint(0,9)) for _ in range(4)])
-    # ensure uniqueness among current waiter hashes
-    while True:
-        exists = False
-        for w in db.query(User).filter(User.role == UserRole.WAITER).all():
-            if verify_password(new_pin, w.password_hash):
-                exists = True
-                break
-        if not exists:
+    for _ in range(PIN_COMMIT_ATTEMPTS):
+        new_pin = await _new_unique_pin(db)
+        if new_pin is None:
+            raise HTTPException(status_code=409, detail="Boş PIN bulunamadı")
+        u.password_hash = await hash_password(new_pin)
+        u.pin_fingerprint = pin_fingerprint(new_pin)
+        try:
+            db.commit()
             break
-        new_pin = "".join([str(random.randint(0,9)) for _ in range(4)])
-    u.password_hash = get_password_hash(new_pin)
-    db.commit()
+        except IntegrityError:
+            db.rollback()
+    else:
+        raise HTTPException(status_code=409, detail="PIN atanamadı, tekrar deneyin")
+    invalidate_principal(u.username)
     return {"pin": new_pin}
 
 @router.get("/assigned-tables")
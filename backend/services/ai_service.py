@@ -1,8 +1,21 @@
+"""
+AI analiz servisi (Gemini).
+
+İstemci süreç başına bir kez yapılandırılır; çağrılar async ve model başına zaman
+aşımlıdır. Art arda hata veren model bir süre atlanır (devre kesici), aynı istem
+(prompt) için sonuç AI_CACHE_TTL boyunca önbellekten döner ve eşzamanlı aynı
+istekler tek çağrıyı paylaşır. AI_BACKEND=fake ağ kullanmayan yerel yanıt üretir.
+"""
+import asyncio
+import concurrent.futures
+import hashlib
 import os
 import importlib
 import logging
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
+from cache_utils import TTLCache
 
 # .env dosyasını yükle
 load_dotenv()
@@ -10,41 +23,87 @@ load_dotenv()
 # Logger ayarla
 logger = logging.getLogger("ai_service")
 
-def _get_gemini_response(prompt: str) -> str:
-    """Gemini API'den yanıt al"""
-    # Her çağrıda .env'den tekrar oku (güvenlik için)
-    load_dotenv(override=True)
-    key = os.getenv("GOOGLE_API_KEY", "")
-    
-    logger.info(f"GOOGLE_API_KEY durumu: {'Tanımlı' if key else 'Tanımlı değil'}")
-    
-    if not key:
-        logger.warning("GOOGLE_API_KEY bulunamadı - varsayılan analiz kullanılacak")
-        raise RuntimeError("GOOGLE_API_KEY bulunamadı")
-    
-    try:
-        genai = importlib.import_module("google.generativeai")
+AI_BACKEND = os.getenv("AI_BACKEND", "gemini").strip().lower()
+# Denenecek modeller ve model başına zaman aşımı (sn): "model:timeout,model:timeout"
+AI_MODELS = os.getenv("AI_MODELS", "gemini-2.0-flash:15,gemini-2.5-flash:20,gemini-pro-latest:30")
+AI_CIRCUIT_FAILURES = int(os.getenv("AI_CIRCUIT_FAILURES", "2"))
+AI_CIRCUIT_COOLDOWN = float(os.getenv("AI_CIRCUIT_COOLDOWN", "300"))
+AI_CACHE_TTL = float(os.getenv("AI_CACHE_TTL", "21600"))
+AI_FAKE_LATENCY = float(os.getenv("AI_FAKE_LATENCY", "0"))
+# Test için: fake arka uçta hata verecek modeller
+AI_FAKE_FAIL_MODELS = {m.strip() for m in os.getenv("AI_FAKE_FAIL_MODELS", "").split(",") if m.strip()}
+
+def _parse_models(spec: str) -> List[tuple]:
+    models = []
+    for part in spec.split(","):
+        name, _, timeout = part.strip().partition(":")
+        if name:
+            models.append((name, float(timeout or 20)))
+    return models
+
+MODELS = _parse_models(AI_MODELS)
+# run_sync'in en uzun bekleme süresi: tüm modeller sırayla zaman aşımına uğrasa bile biter
+RUN_SYNC_TIMEOUT = sum(timeout for _, timeout in MODELS) + 5
+
+_result_cache = TTLCache(AI_CACHE_TTL, max_entries=256)
+_inflight: Dict[str, asyncio.Future] = {}
+_main_loop: Optional[asyncio.AbstractEventLoop] = None
+
+class CircuitBreaker:
+    """Art arda `threshold` hatadan sonra modeli `cooldown` saniye devre dışı bırakır"""
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = 0.0
+
+    def allow(self) -> bool:
+        return time.monotonic() >= self.open_until
+
+    def success(self):
+        self.failures = 0
+        self.open_until = 0.0
+
+    def failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.open_until = time.monotonic() + self.cooldown
+            # Süre dolunca tek deneme hakkı: yeniden hata verirse devre tekrar açılır
+            self.failures = self.threshold - 1
+
+_breakers: Dict[str, CircuitBreaker] = {name: CircuitBreaker(AI_CIRCUIT_FAILURES, AI_CIRCUIT_COOLDOWN) for name, _ in MODELS}
+
+class _GeminiBackend:
+    """google-generativeai istemcisi; anahtar ve modeller ilk kullanımda bir kez hazırlanır"""
+    def __init__(self):
+        self._models: Optional[Dict[str, Any]] = None
+        self._error: Optional[str] = None
+
+    def _setup(self):
+        key = os.getenv("GOOGLE_API_KEY", "")
+        logger.info(f"GOOGLE_API_KEY durumu: {'Tanımlı' if key else 'Tanımlı değil'}")
+        if not key:
+            self._error = "GOOGLE_API_KEY bulunamadı"
+            logger.warning("GOOGLE_API_KEY bulunamadı - varsayılan analiz kullanılacak")
+            return
+        try:
+            genai = importlib.import_module("google.generativeai")
+        except ImportError:
+            self._error = "AI modülü yüklü değil"
+            logger.error("google-generativeai modülü yüklü değil")
+            return
         genai.configure(api_key=key)
-        
-        # Farklı model isimlerini dene (güncel modeller)
-        model_names = ["gemini-2.0-flash", "gemini-2.5-flash", "gemini-pro-latest"]
-        resp = None
-        last_error = None
-        
-        for model_name in model_names:
-            try:
-                model = genai.GenerativeModel(model_name)
-                resp = model.generate_content(prompt)
-                logger.info(f"Model {model_name} başarılı")
-                break
-            except Exception as e:
-                last_error = e
-                logger.warning(f"Model {model_name} başarısız: {str(e)[:100]}")
-                continue
-        
-        if resp is None:
-            raise last_error or RuntimeError("Hiçbir model çalışmadı")
-        
+        self._models = {name: genai.GenerativeModel(name) for name, _ in MODELS}
+
+    def ensure_ready(self):
+        """Anahtar ya da modül yoksa modelleri denemeden hata verir (devre kesiciyi etkilemez)"""
+        if self._models is None and self._error is None:
+            self._setup()
+        if self._models is None:
+            raise RuntimeError(self._error)
+
+    async def generate(self, model_name: str, prompt: str, timeout: float) -> str:
+        resp = await self._models[model_name].generate_content_async(prompt, request_options={"timeout": timeout})
         text = getattr(resp, "text", None)
         if not text:
             try:
@@ -53,21 +112,111 @@ def _get_gemini_response(prompt: str) -> str:
                 text = None
         if not text:
             raise RuntimeError("Boş yanıt")
-        return text.strip()
-    except ImportError:
-        logger.error("google-generativeai modülü yüklü değil")
-        raise RuntimeError("AI modülü yüklü değil")
+        return text
+
+class _FakeBackend:
+    """Ağsız yerel yanıt: aynı istem için hep aynı metin (test ve çevrimdışı kullanım)"""
+    def ensure_ready(self):
+        pass
+
+    async def generate(self, model_name: str, prompt: str, timeout: float) -> str:
+        if AI_FAKE_LATENCY:
+            await asyncio.sleep(AI_FAKE_LATENCY)
+        if model_name in AI_FAKE_FAIL_MODELS:
+            raise RuntimeError(f"fake: {model_name} devre dışı")
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+        return (
+            f"[{model_name} #{digest}]\n"
+            "1) En çok satan ürünlerin stok ve hazırlık süresini takip edin.\n"
+            "2) Düşük satan ürünler için kampanya deneyin.\n"
+            "3) Yoğun saatlerde personel planını gözden geçirin."
+        )
+
+_backend = _FakeBackend() if AI_BACKEND == "fake" else _GeminiBackend()
+
+def start(loop: Optional[asyncio.AbstractEventLoop] = None):
+    """Uygulama döngüsünü kaydeder; thread'lerden yapılan senkron çağrılar bu döngüde çalışır"""
+    global _main_loop
+    _main_loop = loop or asyncio.get_running_loop()
+
+def run_sync(coro):
+    """Async AI çağrısını senkron koddan (ör. rapor iş havuzu) çalıştırır"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        raise RuntimeError("run_sync event loop içinden çağrılamaz; await kullanın")
+    loop = _main_loop
+    if loop is not None and loop.is_running():
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        try:
+            return future.result(timeout=RUN_SYNC_TIMEOUT)
+        except concurrent.futures.TimeoutError:
+            # Döngü takılsa bile çağıran thread (rapor iş havuzu) sonsuza dek beklemez
+            future.cancel()
+            raise RuntimeError(f"AI çağrısı {RUN_SYNC_TIMEOUT:g}s içinde tamamlanmadı")
+    return asyncio.run(coro)
+
+async def _call_models(prompt: str) -> str:
+    _backend.ensure_ready()
+    last_error: Optional[Exception] = None
+    for model_name, timeout in MODELS:
+        breaker = _breakers[model_name]
+        if not breaker.allow():
+            logger.info(f"Model {model_name} atlandı (devre açık)")
+            continue
+        try:
+            text = await asyncio.wait_for(_backend.generate(model_name, prompt, timeout), timeout=timeout)
+            breaker.success()
+            logger.info(f"Model {model_name} başarılı")
+            return text.strip()
+        except asyncio.TimeoutError:
+            last_error = RuntimeError(f"{model_name} zaman aşımı ({timeout:g}s)")
+        except Exception as e:
+            last_error = e
+        logger.warning(f"Model {model_name} başarısız: {str(last_error)[:100]}")
+        breaker.failure()
+    raise last_error or RuntimeError("Hiçbir model çalışmadı")
+
+async def _get_gemini_response(prompt: str) -> str:
+    """İstem için yanıt: önbellek, süren aynı istek ya da model zinciri"""
+    key = hashlib.sha256(f"{AI_BACKEND}|{AI_MODELS}|{prompt}".encode("utf-8")).hexdigest()
+    cached = _result_cache.get(key)
+    if cached is not None:
+        return cached
+    pending = _inflight.get(key)
+    if pending is not None:
+        try:
+            return await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            if pending.cancelled():
+                raise RuntimeError("AI isteği iptal edildi")
+            raise
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        text = await _call_models(prompt)
+        _result_cache.set(key, text)
+        future.set_result(text)
+        return text
     except Exception as e:
-        logger.error(f"Gemini API hatası: {str(e)}")
+        future.set_exception(e)
+        # Bekleyen yoksa "exception never retrieved" uyarısını önle
+        future.exception()
         raise
+    finally:
+        if not future.done():
+            future.cancel()
+        _inflight.pop(key, None)
 
-def generate_analysis_text(matrix_data: List[dict]) -> str:
+async def generate_analysis_text(matrix_data: List[dict]) -> str:
     try:
         prompt = (
             "Bu restoran menü performans verisini analiz et ve işletme sahibine "
             "Türkçe, kısa ve uygulanabilir 3 öneri ver. Veri: " + str(matrix_data)
         )
-        return _get_gemini_response(prompt)
+        return await _get_gemini_response(prompt)
     except Exception:
         return (
             "1) En çok satan ürünlerin porsiyon ve sunum hızını artırın.\n"
@@ -75,18 +224,18 @@ def generate_analysis_text(matrix_data: List[dict]) -> str:
             "3) Kârlı ürünleri menüde öne çıkarıp stok takibini sıklaştırın."
         )
 
-def generate_ai_answer(prompt: str, context: dict) -> str:
+async def generate_ai_answer(prompt: str, context: dict) -> str:
     try:
         txt = (
             "Aşağıdaki restoran verilerine göre yönetici sorusunu yanıtla. "
             "Türkçe ve kısa, uygulanabilir cevap ver.\n\n" +
             "Veri: " + str(context) + "\n\nSoru: " + prompt
         )
-        return _get_gemini_response(txt)
+        return await _get_gemini_response(txt)
     except Exception:
         return "Veriler temelinde: Ciroyu artırmak için kampanya, stok optimizasyonu ve menüde kârlı ürün odak önerilir."
 
-def generate_daily_report_analysis(data: Dict[str, Any]) -> str:
+async def generate_daily_report_analysis(data: Dict[str, Any], fallback: bool = True) -> str:
     """Günlük kapanış raporu için AI analizi"""
     try:
         prompt = f"""Sen profesyonel bir restoran danışmanısın. Bugünkü işletme verilerini analiz et.
@@ -122,16 +271,21 @@ Lütfen Türkçe olarak:
 3. Dikkat edilmesi gereken konuları belirt
 4. Yarın için 2-3 uygulanabilir öneri ver
 """
-        return _get_gemini_response(prompt)
+        return await _get_gemini_response(prompt)
     except Exception as e:
         logger.warning(f"Günlük AI analizi başarısız: {str(e)}")
-        # Fallback: Basit analiz oluştur
-        revenue = data.get('total_revenue', 0)
-        orders = data.get('total_orders', 0)
-        avg = data.get('avg_order', 0)
-        cancelled = data.get('cancelled_orders', 0)
-        
-        analysis = f"""📊 GÜNLÜK ÖZET ANALİZİ
+        if not fallback:
+            raise
+        return daily_report_fallback(data)
+
+def daily_report_fallback(data: Dict[str, Any]) -> str:
+    """AI yanıt vermediğinde günlük rapor için basit analiz"""
+    revenue = data.get('total_revenue', 0)
+    orders = data.get('total_orders', 0)
+    avg = data.get('avg_order', 0)
+    cancelled = data.get('cancelled_orders', 0)
+    
+    analysis = f"""📊 GÜNLÜK ÖZET ANALİZİ
 
 💰 Bugünkü Performans:
 • Toplam ciro: {revenue:.2f} ₺
@@ -141,23 +295,23 @@ Lütfen Türkçe olarak:
 
 📈 Değerlendirme:
 """
-        if revenue > 0:
-            if avg > 100:
-                analysis += "• Ortalama sepet tutarı iyi seviyede.\n"
-            else:
-                analysis += "• Ortalama sepet tutarını artırmak için çapraz satış önerilir.\n"
-            
-            if cancelled > orders * 0.1:
-                analysis += "• İptal oranı yüksek, sebepleri araştırılmalı.\n"
-            else:
-                analysis += "• İptal oranı kabul edilebilir seviyede.\n"
+    if revenue > 0:
+        if avg > 100:
+            analysis += "• Ortalama sepet tutarı iyi seviyede.\n"
         else:
-            analysis += "• Bugün için yeterli veri bulunmuyor.\n"
+            analysis += "• Ortalama sepet tutarını artırmak için çapraz satış önerilir.\n"
         
-        analysis += "\n💡 AI analizi için GOOGLE_API_KEY tanımlanmalıdır."
-        return analysis
+        if cancelled > orders * 0.1:
+            analysis += "• İptal oranı yüksek, sebepleri araştırılmalı.\n"
+        else:
+            analysis += "• İptal oranı kabul edilebilir seviyede.\n"
+    else:
+        analysis += "• Bugün için yeterli veri bulunmuyor.\n"
+    
+    analysis += "\n💡 AI analizi için GOOGLE_API_KEY tanımlanmalıdır."
+    return analysis
 
-def generate_weekly_report_analysis(data: Dict[str, Any]) -> str:
+async def generate_weekly_report_analysis(data: Dict[str, Any], fallback: bool = True) -> str:
     """Haftalık rapor için AI analizi"""
     try:
         prompt = f"""Sen profesyonel bir restoran danışmanısın. Bu haftanın işletme verilerini analiz et.
@@ -194,15 +348,21 @@ Lütfen Türkçe olarak:
 4. Garson performansını değerlendir
 5. Gelecek hafta için 3-5 stratejik öneri ver
 """
-        return _get_gemini_response(prompt)
+        return await _get_gemini_response(prompt)
     except Exception as e:
         logger.warning(f"Haftalık AI analizi başarısız: {str(e)}")
-        revenue = data.get('total_revenue', 0)
-        orders = data.get('total_orders', 0)
-        avg_daily = data.get('avg_daily_revenue', 0)
-        change = data.get('revenue_change', 0)
-        
-        analysis = f"""📊 HAFTALIK ÖZET ANALİZİ
+        if not fallback:
+            raise
+        return weekly_report_fallback(data)
+
+def weekly_report_fallback(data: Dict[str, Any]) -> str:
+    """AI yanıt vermediğinde haftalık rapor için basit analiz"""
+    revenue = data.get('total_revenue', 0)
+    orders = data.get('total_orders', 0)
+    avg_daily = data.get('avg_daily_revenue', 0)
+    change = data.get('revenue_change', 0)
+    
+    analysis = f"""📊 HAFTALIK ÖZET ANALİZİ
 
 💰 Bu Haftanın Performansı:
 • Toplam ciro: {revenue:.2f} ₺
@@ -212,17 +372,17 @@ Lütfen Türkçe olarak:
 
 📈 Değerlendirme:
 """
-        if change >= 10:
-            analysis += "• Ciro önceki haftaya göre önemli ölçüde arttı. Başarılı bir hafta!\n"
-        elif change >= 0:
-            analysis += "• Ciro stabil seyrediyor.\n"
-        else:
-            analysis += "• Ciro düşüşü var, kampanya veya promosyon düşünülebilir.\n"
-        
-        analysis += "\n💡 Detaylı AI analizi için GOOGLE_API_KEY tanımlanmalıdır."
-        return analysis
+    if change >= 10:
+        analysis += "• Ciro önceki haftaya göre önemli ölçüde arttı. Başarılı bir hafta!\n"
+    elif change >= 0:
+        analysis += "• Ciro stabil seyrediyor.\n"
+    else:
+        analysis += "• Ciro düşüşü var, kampanya veya promosyon düşünülebilir.\n"
+    
+    analysis += "\n💡 Detaylı AI analizi için GOOGLE_API_KEY tanımlanmalıdır."
+    return analysis
 
-def generate_monthly_report_analysis(data: Dict[str, Any]) -> str:
+async def generate_monthly_report_analysis(data: Dict[str, Any], fallback: bool = True) -> str:
     """Aylık rapor için AI analizi"""
     try:
         prompt = f"""Sen profesyonel bir restoran danışmanısın. Bu ayın işletme verilerini kapsamlı analiz et.
@@ -263,15 +423,21 @@ Lütfen Türkçe olarak:
 5. Personel ve operasyon önerileri
 6. Gelecek ay için 5 stratejik hedef ve aksiyon planı
 """
-        return _get_gemini_response(prompt)
+        return await _get_gemini_response(prompt)
     except Exception as e:
         logger.warning(f"Aylık AI analizi başarısız: {str(e)}")
-        revenue = data.get('total_revenue', 0)
-        orders = data.get('total_orders', 0)
-        avg_daily = data.get('avg_daily_revenue', 0)
-        change = data.get('revenue_change', 0)
-        
-        analysis = f"""📊 AYLIK ÖZET ANALİZİ
+        if not fallback:
+            raise
+        return monthly_report_fallback(data)
+
+def monthly_report_fallback(data: Dict[str, Any]) -> str:
+    """AI yanıt vermediğinde aylık rapor için basit analiz"""
+    revenue = data.get('total_revenue', 0)
+    orders = data.get('total_orders', 0)
+    avg_daily = data.get('avg_daily_revenue', 0)
+    change = data.get('revenue_change', 0)
+    
+    analysis = f"""📊 AYLIK ÖZET ANALİZİ
 
 💰 Bu Ayın Performansı:
 • Toplam ciro: {revenue:.2f} ₺
@@ -281,16 +447,16 @@ Lütfen Türkçe olarak:
 
 📈 Değerlendirme:
 """
-        if change >= 15:
-            analysis += "• Ciro önceki aya göre önemli ölçüde arttı. Harika bir ay!\n"
-        elif change >= 0:
-            analysis += "• Ciro stabil seyrediyor, büyüme fırsatları değerlendirilebilir.\n"
-        elif change >= -10:
-            analysis += "• Hafif ciro düşüşü var, kampanya stratejileri gözden geçirilmeli.\n"
-        else:
-            analysis += "• Önemli ciro düşüşü var, acil aksiyon planı gerekli.\n"
-        
-        analysis += """
+    if change >= 15:
+        analysis += "• Ciro önceki aya göre önemli ölçüde arttı. Harika bir ay!\n"
+    elif change >= 0:
+        analysis += "• Ciro stabil seyrediyor, büyüme fırsatları değerlendirilebilir.\n"
+    elif change >= -10:
+        analysis += "• Hafif ciro düşüşü var, kampanya stratejileri gözden geçirilmeli.\n"
+    else:
+        analysis += "• Önemli ciro düşüşü var, acil aksiyon planı gerekli.\n"
+    
+    analysis += """
 💡 Öneriler:
 • En çok satan ürünleri öne çıkarın
 • Düşük performanslı ürünleri değerlendirin
@@ -298,4 +464,4 @@ Lütfen Türkçe olarak:
 • Müşteri geri bildirimlerini toplayın
 
 ⚠️ Detaylı AI analizi için GOOGLE_API_KEY tanımlanmalıdır."""
-        return analysis
+    return analysis
@@ -0,0 +1,177 @@
+"""
+Ürün kataloğu sorguları.
+
+Menü ağacı (kategoriler → ürünler → ekstra grupları → aktif ekstralar) selectinload
+zinciriyle yüklenir: ürün ve kategori sayısından bağımsız olarak sabit sayıda sorgu
+çalışır, serileştirme sırasında tembel yükleme yapılmaz. /products, /products/{id} ve
+/products/menu aynı serileştiricileri kullanır.
+
+Menü ayrıca JSON'a çevrilmiş hazır bir anlık görüntü olarak bellekte tutulur. Katalog
+yazma uçları invalidate_menu() çağırır; görüntü bir sonraki okumada yeniden kurulur.
+ETag gövdenin özetidir, bu yüzden süreçler arasında da aynıdır. Görüntü stok miktarı
+taşımaz (her siparişte bayatlardı); stoğu biten takipli ürünler menüye hiç girmez ve
+stoğu sıfırlayan sipariş görüntüyü geçersiz kılar.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import or_
+from sqlalchemy.orm import Query, Session, selectinload
+from models import Category, ExtraGroup, ExtraItem, Product, ProductExtraGroup, get_sessionmaker
+
+load_dotenv()
+
+# Anlık görüntünün en uzun ömrü (sn); başka süreçteki yazmalar en geç bu sürede görünür
+MENU_SNAPSHOT_TTL = float(os.getenv("MENU_SNAPSHOT_TTL", "300"))
+# Tarayıcının menüyü yeniden doğrulamadan kullanabileceği süre (sn); 0 ise her açılışta ETag sorulur
+MENU_MAX_AGE = int(os.getenv("MENU_MAX_AGE", "0"))
+MENU_CACHE_CONTROL = f"public, max-age={MENU_MAX_AGE}" if MENU_MAX_AGE > 0 else "no-cache"
+
+def _extra_group_options(path=None):
+    # ürün → ürün-grup ataması → grup → aktif ekstralar
+    groups = path.selectinload(Product.extra_groups) if path is not None else selectinload(Product.extra_groups)
+    return groups.selectinload(ProductExtraGroup.extra_group).selectinload(ExtraGroup.items.and_(ExtraItem.is_active == True))
+
+def category_summary(category: Optional[Category]) -> Optional[Dict[str, Any]]:
+    return {"id": category.id, "name": category.name, "icon": category.icon} if category else None
+
+def extra_group_dict(group: ExtraGroup) -> Dict[str, Any]:
+    return {
+        "id": group.id, "name": group.name, "is_required": group.is_required, "max_selections": group.max_selections,
+        "items": [{"id": i.id, "name": i.name, "price": i.price, "is_active": i.is_active} for i in group.items if i.is_active]
+    }
+
+def product_dict(product: Product, category: Optional[Category] = None, with_extras: bool = False, with_stock: bool = True) -> Dict[str, Any]:
+    """Ürün yanıtı; category verilmezse product.category kullanılır (önceden yüklenmiş olmalı)"""
+    data = {
+        "id": product.id,
+        "name": product.name,
+        "description": product.description,
+        "price": product.price,
+        "image_url": product.image_url,
+        "category_id": product.category_id,
+        "category": category_summary(category if category is not None else product.category),
+        "is_featured": product.is_featured,
+        "is_active": product.is_active,
+        "created_at": product.created_at,
+    }
+    if with_stock:
+        data["stock"] = int(product.stock or 0)
+        data["track_stock"] = bool(product.track_stock or False)
+    if with_extras:
+        data["extra_groups"] = [extra_group_dict(peg.extra_group) for peg in product.extra_groups if peg.extra_group]
+    return data
+
+def product_query(db: Session, with_extras: bool = False) -> Query:
+    """Kategorisi (ve istenirse ekstraları) önceden yüklenen ürün sorgusu"""
+    query = db.query(Product).options(selectinload(Product.category))
+    if with_extras:
+        query = query.options(_extra_group_options())
+    return query
+
+def is_sold_out(product: Product) -> bool:
+    return bool(product.track_stock or False) and int(product.stock or 0) <= 0
+
+def get_product_detail(db: Session, product_id: int) -> Optional[Dict[str, Any]]:
+    product = product_query(db, with_extras=True).filter(Product.id == product_id).first()
+    return product_dict(product, with_extras=True) if product else None
+
+UNCATEGORIZED_NAME = "Diğer"
+
+def get_menu(db: Session) -> Dict[str, Any]:
+    """Aktif kategoriler ve içlerindeki aktif ürünler, ekstralarıyla birlikte (sabit sayıda sorgu).
+
+    Kategorisi olmayan ya da kategorisi pasif olan aktif ürünler listeden düşmez; sonda
+    id'si null olan "Diğer" grubunda döner (/products listesinde de görünüyorlardı).
+    Stoğu biten ürünler atlanır; ürünlerde stok alanı yoktur.
+    """
+    categories = db.query(Category).filter(Category.is_active == True).options(
+        _extra_group_options(selectinload(Category.products.and_(Product.is_active == True)))
+    ).order_by(Category.order, Category.name).all()
+    result: List[Dict[str, Any]] = []
+    for category in categories:
+        products = sorted((p for p in category.products if not is_sold_out(p)), key=lambda p: p.id)
+        result.append({
+            **category_summary(category),
+            "order": category.order,
+            "products": [product_dict(p, category=category, with_extras=True, with_stock=False) for p in products]
+        })
+    orphans = product_query(db, with_extras=True).outerjoin(Category, Product.category_id == Category.id).filter(
+        Product.is_active == True,
+        or_(Category.id.is_(None), Category.is_active.is_not(True))
+    ).order_by(Product.id).all()
+    orphans = [p for p in orphans if not is_sold_out(p)]
+    if orphans:
+        result.append({
+            "id": None, "name": UNCATEGORIZED_NAME, "icon": None,
+            "order": max((c.order or 0 for c in categories), default=0) + 1,
+            "products": [product_dict(p, with_extras=True, with_stock=False) for p in orphans]
+        })
+    return {"categories": result}
+
+class MenuSnapshot:
+    """JSON gövdesi ve güçlü ETag'i hazır menü"""
+    def __init__(self, body: bytes, built_at: float):
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.built_at = built_at
+
+_menu_lock = threading.Lock()
+# Yeniden kurulum tek seferde yapılır; aynı anda ıskalayan istekler onu bekler
+_menu_build_lock = threading.Lock()
+_menu_snapshot: Optional[MenuSnapshot] = None
+_menu_generation = 0
+
+def invalidate_menu():
+    """Katalog değişti: bellekteki menü bir sonraki okumada yeniden kurulur"""
+    global _menu_snapshot, _menu_generation
+    with _menu_lock:
+        _menu_generation += 1
+        _menu_snapshot = None
+
+def _current_snapshot() -> Optional[MenuSnapshot]:
+    with _menu_lock:
+        snapshot = _menu_snapshot
+    if snapshot is not None and time.monotonic() - snapshot.built_at < MENU_SNAPSHOT_TTL:
+        return snapshot
+    return None
+
+def get_menu_snapshot() -> MenuSnapshot:
+    """Bellekteki menü; yoksa ya da süresi dolduysa (veritabanından, bloklayarak) kurar"""
+    global _menu_snapshot
+    snapshot = _current_snapshot()
+    if snapshot is not None:
+        return snapshot
+    with _menu_build_lock:
+        # Beklerken başka bir istek kurmuş olabilir
+        snapshot = _current_snapshot()
+        if snapshot is not None:
+            return snapshot
+        with _menu_lock:
+            generation = _menu_generation
+        db = get_sessionmaker()()
+        try:
+            body = json.dumps(jsonable_encoder(get_menu(db)), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        finally:
+            db.close()
+        snapshot = MenuSnapshot(body, time.monotonic())
+        with _menu_lock:
+            # Kurulum sırasında invalidate edildiyse eski veri saklanmaz
+            if generation == _menu_generation:
+                _menu_snapshot = snapshot
+        return snapshot
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match başlığı (virgüllü liste, W/ öneki veya *) verilen ETag'i içeriyor mu"""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or (tag[2:] if tag.startswith("W/") else tag) == etag:
+            return True
+    return False
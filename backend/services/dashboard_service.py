@@ -0,0 +1,67 @@
+"""
+Admin dashboard istatistikleri.
+
+Bugünkü sipariş/ciro ve 7 günlük trend, yalnızca 7 günlük pencereyle sınırlı
+GROUP BY date(created_at) sorgusuyla hesaplanır; sipariş geçmişi büyüdükçe
+yanıt süresi sabit kalır. Sonuç kısa süreli önbellekte tutulur, sipariş
+oluşturma / durum değişikliği / masa kapatma önbelleği temizler.
+"""
+import os
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict
+from dotenv import load_dotenv
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+from cache_utils import TTLCache
+from models import Order, OrderStatus, Product, Table
+
+load_dotenv()
+
+TREND_DAYS = 7
+ACTIVE_ORDER_STATUSES = [OrderStatus.BEKLIYOR, OrderStatus.HAZIRLANIYOR]
+
+_dashboard_cache = TTLCache(float(os.getenv("DASHBOARD_CACHE_TTL", "10")), max_entries=4)
+
+def invalidate_dashboard_cache() -> None:
+    """Sipariş verisini değiştiren yazma yollarından sonra çağrılır"""
+    _dashboard_cache.invalidate()
+
+def _compute_dashboard(db: Session, today: date) -> Dict[str, Any]:
+    window_start = datetime.combine(today - timedelta(days=TREND_DAYS - 1), time.min)
+    window_end = datetime.combine(today + timedelta(days=1), time.min)
+
+    total_products = db.query(func.count(Product.id)).filter(Product.is_active == True).scalar() or 0
+    total_tables = db.query(func.count(Table.id)).filter(Table.is_active == True).scalar() or 0
+    active_orders = db.query(func.count(Order.id)).filter(Order.status.in_(ACTIVE_ORDER_STATUSES)).scalar() or 0
+
+    order_day = func.date(Order.created_at)
+    revenue = func.sum(case((Order.status != OrderStatus.IPTAL, func.coalesce(Order.total_amount, 0.0)), else_=0.0))
+    rows = db.query(order_day, func.count(Order.id), revenue).filter(
+        Order.created_at >= window_start, Order.created_at < window_end
+    ).group_by(order_day).all()
+    by_day = {str(d)[:10]: (count, float(total or 0.0)) for d, count, total in rows}
+
+    daily_trend = []
+    for i in range(TREND_DAYS - 1, -1, -1):
+        d = (today - timedelta(days=i)).isoformat()
+        daily_trend.append({"date": d, "revenue": by_day.get(d, (0, 0.0))[1]})
+    today_count, today_revenue = by_day.get(today.isoformat(), (0, 0.0))
+
+    return {
+        "overview": {
+            "total_products": total_products,
+            "total_tables": total_tables,
+        },
+        "sales": {
+            "today_orders": today_count,
+            "today_revenue": today_revenue,
+            "active_orders": active_orders,
+            "daily_trend": daily_trend
+        }
+    }
+
+def get_dashboard_stats(db: Session) -> Dict[str, Any]:
+    """Dashboard özetini önbellekten ya da SQL toplamlarından döndürür"""
+    today = date.today()
+    # Anahtar güne bağlı: gece yarısı geçince eski gün önbellekten okunmaz
+    return _dashboard_cache.get_or_set(today, lambda: _compute_dashboard(db, today))
@@ -0,0 +1,59 @@
+"""
+Mutfak fişi sorgu servisi.
+
+/orders/kitchen-tickets, /orders/kitchen/pending ve /api/kitchen-tickets aynı
+sorguyu kullanır. Siparişler masa ile birlikte, kalemler ürünleriyle birlikte
+önceden yüklenir; fiş sayısından bağımsız olarak iki sorgu çalışır.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from sqlalchemy.orm import Session, joinedload, selectinload
+from models import Order, OrderItem, OrderStatus
+
+KITCHEN_STATUSES = [OrderStatus.BEKLIYOR, OrderStatus.HAZIRLANIYOR]
+
+def ticket_payload(order: Order) -> Dict[str, Any]:
+    """Tek bir siparişin mutfak fişi görünümü"""
+    items = []
+    for item in order.items:
+        p_name = item.product.name if item.product else "Silinmiş Ürün"
+        items.append({
+            "id": item.id,
+            "product_id": item.product_id,
+            "product_name": p_name,
+            "quantity": item.quantity,
+            "extras": item.extras,
+            "subtotal": item.subtotal
+        })
+    return {
+        "id": order.id,
+        "version": order.version,
+        "table_id": order.table_id,
+        "table_name": order.table.name if order.table else "Masa Bilinmiyor",
+        "table_number": order.table.number if order.table else 0,
+        "daily_order_number": order.daily_order_number,
+        "status": order.status,
+        "customer_notes": order.customer_notes,
+        "created_at": order.created_at.isoformat(),
+        "updated_at": order.updated_at.isoformat() if order.updated_at else None,
+        "items": items,
+        "total_amount": order.total_amount
+    }
+
+def get_kitchen_tickets(db: Session, updated_since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Mutfaktaki (bekleyen / hazırlanan) siparişlerin fişlerini döndürür.
+
+    updated_since verilirse yalnızca o andan sonra değişen siparişler döner; mutfaktan
+    çıkanlar (hazır, teslim, iptal) da güncel durumlarıyla gelir ki ekran onları kaldırabilsin.
+    """
+    query = db.query(Order).options(
+        joinedload(Order.table),
+        selectinload(Order.items).joinedload(OrderItem.product)
+    )
+    if updated_since is not None:
+        # Sıralama Python'da yapılır: ORDER BY created_at, SQLite'ı updated_at indeksi yerine
+        # created_at indeksini baştan sona taramaya yöneltiyordu
+        orders = sorted(query.filter(Order.updated_at > updated_since).all(), key=lambda o: (o.created_at, o.id))
+    else:
+        orders = query.filter(Order.status.in_(KITCHEN_STATUSES)).order_by(Order.created_at.asc()).all()
+    return [ticket_payload(order) for order in orders]
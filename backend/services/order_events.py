@@ -0,0 +1,44 @@
+"""
+Sipariş / masa WebSocket olaylarının (delta) içerikleri.
+
+Mutfak ve admin ekranları olayları kendi listelerine uygular, her olayda listeyi
+yeniden çekmez:
+- order_created: tam mutfak fişi (bkz. kitchen_service.ticket_payload ile aynı alanlar)
+- order_updated / order_cancelled: yalnızca durum farkı
+- orders_moved: taşınan siparişler ve kaynak/hedef masa
+- tables_merged: birleştirilen masalar
+- table_closed: masa ve kapatılan siparişlerin durum farkları
+
+Her sipariş olayı siparişin "version" değerini taşır; istemci elindeki sürümden
+eski olayları atlar.
+"""
+from typing import Any, Dict, Optional
+from models import Order, OrderStatus, Table
+
+def _status_value(status) -> Optional[str]:
+    return status.value if isinstance(status, OrderStatus) else status
+
+def table_ref(table: Optional[Table], is_occupied: Optional[bool] = None) -> Dict[str, Any]:
+    """Olaylarda kullanılan kısa masa bilgisi"""
+    ref = {
+        "table_id": table.id if table else None,
+        "table_number": table.number if table else None,
+        "table_name": table.name if table else "Masa Bilinmiyor",
+    }
+    if is_occupied is not None:
+        ref["is_occupied"] = is_occupied
+    return ref
+
+def status_delta(order: Order, previous_status, table: Optional[Table] = None) -> Dict[str, Any]:
+    """Durum değişikliği olayı: fişin tamamı yerine yalnızca değişen alanlar"""
+    table = table if table is not None else order.table
+    return {
+        "id": order.id,
+        "version": order.version,
+        "status": _status_value(order.status),
+        "previous_status": _status_value(previous_status),
+        "payment_method": order.payment_method,
+        "total_amount": order.total_amount,
+        "updated_at": order.updated_at.isoformat() if order.updated_at else None,
+        **table_ref(table),
+    }
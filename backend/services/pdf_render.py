@@ -0,0 +1,178 @@
+"""
+PDF çizim altyapısı.
+
+reportlab ve fontlar süreç başına bir kez yüklenir / kaydedilir (font dosyası araması
+her raporda tekrarlanmaz). Sayfa şablonu (başlık bandı, logo, alt bilgi) her belgede bir
+kez form olarak çizilir ve sayfalarda yeniden kullanılır. PageWriter satır kaydırma ve
+sayfa geçişlerini üstlenir; çıktı doğrudan verilen dosyaya yazılır.
+"""
+import logging
+import os
+import threading
+from functools import lru_cache
+from typing import Optional
+
+logger = logging.getLogger("pdf_render")
+
+_WINDIR = os.environ.get("WINDIR", "C:\\Windows")
+# (normal, kalın) font çiftleri; ilk bulunan kullanılır
+FONT_CANDIDATES = [
+    (os.path.join(_WINDIR, "Fonts", "arial.ttf"), os.path.join(_WINDIR, "Fonts", "arialbd.ttf")),
+    (os.path.join(_WINDIR, "Fonts", "segoeui.ttf"), os.path.join(_WINDIR, "Fonts", "segoeuib.ttf")),
+    ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"),
+    ("/Library/Fonts/Arial Unicode.ttf", None),
+]
+
+PAGE_BOTTOM = 100
+
+_TR_ASCII = str.maketrans({**dict(zip("ıİğĞüÜşŞöÖçÇ", "iIgGuUsSoOcC")), "₺": "TL"})
+
+_font_lock = threading.Lock()
+
+class Fonts:
+    """Kayıtlı font adları; unicode False ise Türkçe karakterler ASCII'ye çevrilir"""
+    def __init__(self, regular: str, bold: str, unicode: bool):
+        self.regular = regular
+        self.bold = bold
+        self.unicode = unicode
+
+@lru_cache(maxsize=1)
+def _reportlab():
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.utils import ImageReader, simpleSplit
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen.canvas import Canvas
+    return {"A4": A4, "Canvas": Canvas, "ImageReader": ImageReader, "simpleSplit": simpleSplit,
+            "pdfmetrics": pdfmetrics, "TTFont": TTFont}
+
+_fonts: Optional[Fonts] = None
+
+def get_fonts() -> Fonts:
+    """Fontları ilk çağrıda kaydeder; sonraki çağrılar kayıtlı adları döndürür"""
+    global _fonts
+    if _fonts is not None:
+        return _fonts
+    with _font_lock:
+        if _fonts is None:
+            rl = _reportlab()
+            fonts = Fonts("Helvetica", "Helvetica-Bold", False)
+            for regular, bold in FONT_CANDIDATES:
+                if not os.path.exists(regular):
+                    continue
+                try:
+                    rl["pdfmetrics"].registerFont(rl["TTFont"]("UIFont", regular))
+                    bold_name = "UIFont"
+                    if bold and os.path.exists(bold):
+                        rl["pdfmetrics"].registerFont(rl["TTFont"]("UIFont-Bold", bold))
+                        bold_name = "UIFont-Bold"
+                    fonts = Fonts("UIFont", bold_name, True)
+                    break
+                except Exception as e:
+                    logger.warning(f"Font kaydedilemedi ({regular}): {e}")
+            logger.info(f"PDF fontu: {fonts.regular}")
+            _fonts = fonts
+    return _fonts
+
+@lru_cache(maxsize=4)
+def _logo_image(path: str, mtime: float):
+    # mtime anahtarın parçası: logo değişince yeniden okunur
+    try:
+        return _reportlab()["ImageReader"](path)
+    except Exception as e:
+        logger.warning(f"Logo okunamadı ({path}): {e}")
+        return None
+
+def load_logo(static_dir: str, logo_url: Optional[str]):
+    """/static/... biçimindeki logo adresinden önbellekli ImageReader döndürür"""
+    if not logo_url or not logo_url.startswith("/static/"):
+        return None
+    path = os.path.join(static_dir, *logo_url[len("/static/"):].split("/"))
+    if not os.path.isfile(path):
+        return None
+    return _logo_image(path, os.path.getmtime(path))
+
+class ReportTemplate:
+    """Rapor sayfa düzeni: başlık bandı, logo ve alt bilgi"""
+    def __init__(self, title: str, subtitle: str = "", restaurant_name: str = "", logo=None):
+        self.title = title
+        self.subtitle = subtitle
+        self.restaurant_name = restaurant_name
+        self.logo = logo
+
+    def draw_furniture(self, c, fonts: Fonts, fold):
+        width = _reportlab()["A4"][0]
+        x = 50
+        if self.logo is not None:
+            c.drawImage(self.logo, 50, 790, width=40, height=40, preserveAspectRatio=True, mask="auto")
+            x = 100
+        c.setFont(fonts.bold, 16)
+        c.drawString(x, 812, fold(self.title))
+        c.setFont(fonts.regular, 10)
+        c.drawString(x, 796, fold(" | ".join(p for p in (self.restaurant_name, self.subtitle) if p)))
+        c.setLineWidth(0.5)
+        c.line(50, 782, width - 50, 782)
+        c.line(50, 60, width - 50, 60)
+
+class PageWriter:
+    """Tek bir PDF belgesi: imleç, satır kaydırma ve otomatik sayfa geçişi"""
+    def __init__(self, out, template: ReportTemplate):
+        rl = _reportlab()
+        self.fonts = get_fonts()
+        self.template = template
+        self.c = rl["Canvas"](out, pagesize=rl["A4"])
+        self.width = rl["A4"][0]
+        self._split = rl["simpleSplit"]
+        self.page = 0
+        self.y = 0
+        # Şablon belgeye bir kez form olarak yazılır, her sayfada referansla çizilir
+        self.c.beginForm("page")
+        template.draw_furniture(self.c, self.fonts, self.fold)
+        self.c.endForm()
+        self._start_page()
+
+    def fold(self, text: str) -> str:
+        text = "" if text is None else str(text)
+        return text if self.fonts.unicode else text.translate(_TR_ASCII)
+
+    def _start_page(self):
+        self.page += 1
+        self.c.doForm("page")
+        self.c.setFont(self.fonts.regular, 8)
+        self.c.drawRightString(self.width - 50, 48, f"{self.page}")
+        self.y = 760
+
+    def new_page(self):
+        self.c.showPage()
+        self._start_page()
+
+    def _ensure(self, height: float):
+        if self.y - height < PAGE_BOTTOM:
+            self.new_page()
+
+    def heading(self, text: str, size: int = 13):
+        self._ensure(40)
+        self.y -= 6
+        self.c.setFont(self.fonts.bold, size)
+        self.c.drawString(50, self.y, self.fold(text))
+        self.y -= size + 8
+
+    def line(self, text: str, size: int = 10, indent: int = 60, step: Optional[int] = None):
+        """Metni sayfa genişliğine göre kaydırarak yazar"""
+        step = step or size + 5
+        font = self.fonts.regular
+        for part in self._split(self.fold(text), font, size, self.width - indent - 50) or [""]:
+            self._ensure(step)
+            self.c.setFont(font, size)
+            self.c.drawString(indent, self.y, part)
+            self.y -= step
+
+    def rule(self):
+        self._ensure(16)
+        self.c.setLineWidth(0.3)
+        self.c.line(50, self.y + 4, self.width - 50, self.y + 4)
+        self.y -= 12
+
+    def save(self):
+        self.c.showPage()
+        self.c.save()
@@ -0,0 +1,356 @@
+"""
+Kapsamlı raporların (günlük / haftalık / aylık) önceden hesaplanması.
+
+Rapor verisi ve AI yorumu ReportArtifact tablosunda saklanır. Her kayıt, raporun
+dayandığı günlerin (karşılaştırılan önceki dönem dahil) günlük özet sürümlerinden
+türetilen data_version ile işaretlenir: sürüm değişmedikçe rapor tablodan döner,
+değiştiyse yeniden hesaplanıp kaydedilir. AI yanıt vermediğinde yedek yorumla
+kaydedilen rapor işaretlenir; REPORT_AI_RETRY_MINUTES sonra görüntülemede ve bir
+sonraki ön hesaplamada AI yeniden denenir. Zamanlayıcı her gün kapanıştan sonra
+(REPORT_PRECOMPUTE_HOUR) biten günün, haftanın ve ayın raporlarını hazırlar; her
+worker'da çalışır ama bir günün ön hesaplamasını tabloya yazılan tekil kayıtla
+yalnızca ilk ayıran worker yapar.
+"""
+import asyncio
+import logging
+import os
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+from dotenv import load_dotenv
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from db_writer import run_write
+from models import Product, ReportArtifact, Table, User, UserRole, UserStats, get_sessionmaker
+from services.ai_service import (
+    daily_report_fallback, generate_daily_report_analysis, generate_monthly_report_analysis,
+    generate_weekly_report_analysis, monthly_report_fallback, weekly_report_fallback,
+)
+from services.rollup_service import get_daily_sales, get_data_version, get_product_sales
+
+load_dotenv()
+
+logger = logging.getLogger("report_artifacts")
+
+REPORT_PRECOMPUTE = os.getenv("REPORT_PRECOMPUTE", "true").lower() == "true"
+REPORT_PRECOMPUTE_HOUR = int(os.getenv("REPORT_PRECOMPUTE_HOUR", "4"))
+REPORT_AI_RETRY_MINUTES = float(os.getenv("REPORT_AI_RETRY_MINUTES", "15"))
+
+# Yedek AI yorumuyla kaydedilen raporun data_version eki: sürüm eşleşmez, rapor yeniden denenir
+AI_FALLBACK_SUFFIX = "+ai-fallback"
+# Ön hesaplama sahipliği aynı tabloda (kind, period_start) tekil indeksiyle ayrılır
+PRECOMPUTE_CLAIM_KIND = "precompute"
+
+_inflight: Dict[Tuple[str, date, str], asyncio.Future] = {}
+
+# --- RAPOR VERİSİ ---
+
+def _sum_days(days: Dict[date, Dict[str, float]], start_date: date, end_date: date) -> Dict[str, float]:
+    values = [v for d, v in days.items() if start_date <= d <= end_date]
+    return {
+        "total_revenue": sum(v["total_revenue"] for v in values),
+        "total_orders": sum(v["total_orders"] for v in values),
+    }
+
+def get_report_data(db: Session, start_date: date, end_date: date, days: Optional[Dict[date, Dict[str, float]]] = None) -> Dict[str, Any]:
+    """Belirli tarih aralığı için tüm rapor verilerini toplar"""
+    # Satışlar: geçmiş günler günlük özetlerden, bugün ham siparişlerden
+    if days is None:
+        days = get_daily_sales(db, start_date, end_date)
+
+    total_revenue = sum(v["total_revenue"] for v in days.values())
+    cash_total = sum(v["cash_total"] for v in days.values())
+    card_total = sum(v["card_total"] for v in days.values())
+    total_orders = sum(v["total_orders"] for v in days.values())
+    cancelled_orders = sum(v["cancelled_orders"] for v in days.values())
+
+    avg_order = total_revenue / max(1, (total_orders - cancelled_orders))
+
+    # Ürün satışları
+    product_stats = [{"name": p["name"], "qty": p["qty"], "total": p["total"]} for p in get_product_sales(db, start_date, end_date)]
+
+    sorted_products = sorted(product_stats, key=lambda x: x["qty"], reverse=True)
+    top_products = sorted_products[:10]
+    low_products = [p for p in sorted_products if p["qty"] > 0][-5:] if sorted_products else []
+
+    # Garson performansı
+    waiters = db.query(User, UserStats).outerjoin(UserStats, UserStats.user_id == User.id).filter(
+        User.role == UserRole.WAITER, User.is_active == True
+    ).all()
+    waiter_stats = [{
+        "name": w.full_name or w.username,
+        "total_orders": int(stats.total_orders or 0) if stats else 0
+    } for w, stats in waiters]
+    waiter_stats.sort(key=lambda x: x["total_orders"], reverse=True)
+
+    # Stok durumu
+    products = db.query(Product).filter(Product.is_active == True, Product.track_stock == True).all()
+    stock_status = []
+    critical_stock = []
+    for p in products:
+        stock = int(p.stock or 0)
+        stock_status.append({"name": p.name, "stock": stock})
+        if stock <= 10:
+            critical_stock.append({"name": p.name, "stock": stock})
+
+    # Masa sayısı
+    total_tables = db.query(Table).filter(Table.is_active == True).count()
+    total_products = db.query(Product).filter(Product.is_active == True).count()
+
+    # Günlük dağılım
+    daily_breakdown = {}
+    delta = (end_date - start_date).days + 1
+    for i in range(delta):
+        d = (start_date + timedelta(days=i)).isoformat()
+        daily_breakdown[d] = {"revenue": 0.0, "orders": 0}
+
+    for d, v in days.items():
+        ds = d.isoformat()
+        if ds in daily_breakdown:
+            daily_breakdown[ds]["revenue"] += v["total_revenue"]
+            daily_breakdown[ds]["orders"] += v["total_orders"] - v["cancelled_orders"]
+
+    return {
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "total_revenue": total_revenue,
+        "cash_total": cash_total,
+        "card_total": card_total,
+        "total_orders": total_orders,
+        "cancelled_orders": cancelled_orders,
+        "avg_order": avg_order,
+        "top_products": top_products,
+        "low_products": low_products,
+        "waiter_stats": waiter_stats,
+        "stock_status": stock_status,
+        "critical_stock": critical_stock,
+        "total_tables": total_tables,
+        "total_products": total_products,
+        "daily_breakdown": daily_breakdown
+    }
+
+def format_for_ai(data: Dict[str, Any]) -> Dict[str, Any]:
+    """AI için veriyi formatla"""
+    top_text = "\n".join([f"- {p['name']}: {p['qty']} adet, {p['total']:.2f} ₺" for p in data.get("top_products", [])[:5]])
+    low_text = "\n".join([f"- {p['name']}: {p['qty']} adet" for p in data.get("low_products", [])[:5]])
+    waiter_text = "\n".join([f"- {w['name']}: {w['total_orders']} sipariş" for w in data.get("waiter_stats", [])[:5]])
+    stock_text = "\n".join([f"- {s['name']}: {s['stock']} adet (KRİTİK!)" for s in data.get("critical_stock", [])[:5]])
+    daily_text = "\n".join([f"- {d}: {v['revenue']:.2f} ₺, {v['orders']} sipariş" for d, v in sorted(data.get("daily_breakdown", {}).items())])
+
+    return {
+        **data,
+        "top_products_text": top_text or "Veri yok",
+        "low_products_text": low_text or "Veri yok",
+        "waiter_stats_text": waiter_text or "Veri yok",
+        "stock_status_text": stock_text or "Kritik stok yok",
+        "daily_breakdown_text": daily_text or "Veri yok"
+    }
+
+# --- DÖNEMLER ---
+
+def report_period(kind: str, day: date) -> Tuple[date, date, date]:
+    """(dönem başı, dönem sonu, sürüme dahil edilen ilk gün); karşılaştırılan önceki dönem sürüme dahildir"""
+    if kind == "daily":
+        return day, day, day
+    if kind == "weekly":
+        return day, day + timedelta(days=6), day - timedelta(days=7)
+    if kind == "monthly":
+        start = day.replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        prev_start = (start - timedelta(days=1)).replace(day=1)
+        return start, end, prev_start
+    raise ValueError(f"Bilinmeyen rapor türü: {kind}")
+
+async def _analyze(generate, fallback, ai_data: Dict[str, Any]) -> Tuple[str, bool]:
+    """AI yorumu ve AI'ın gerçekten yanıt verip vermediği; vermediyse yedek metin döner"""
+    try:
+        return await generate(ai_data, fallback=False), True
+    except Exception:
+        return fallback(ai_data), False
+
+async def _build_daily(db: Session, report_date: date) -> Tuple[Dict[str, Any], bool]:
+    data = get_report_data(db, report_date, report_date)
+    data["date"] = report_date.isoformat()
+
+    # AI analizi
+    ai_analysis, ai_ok = await _analyze(generate_daily_report_analysis, daily_report_fallback, format_for_ai(data))
+    return {**data, "ai_analysis": ai_analysis}, ai_ok
+
+async def _build_weekly(db: Session, start_date: date) -> Tuple[Dict[str, Any], bool]:
+    end_date = start_date + timedelta(days=6)
+    data = get_report_data(db, start_date, end_date)
+
+    # Önceki hafta karşılaştırması (yalnızca toplamlar gerekir)
+    prev_start = start_date - timedelta(days=7)
+    prev_end = end_date - timedelta(days=7)
+    prev_data = _sum_days(get_daily_sales(db, prev_start, prev_end), prev_start, prev_end)
+
+    revenue_change = ((data["total_revenue"] - prev_data["total_revenue"]) / max(1, prev_data["total_revenue"])) * 100
+    order_change = ((data["total_orders"] - prev_data["total_orders"]) / max(1, prev_data["total_orders"])) * 100
+
+    data["revenue_change"] = revenue_change
+    data["order_change"] = order_change
+    data["avg_daily_revenue"] = data["total_revenue"] / 7
+
+    # AI analizi
+    ai_analysis, ai_ok = await _analyze(generate_weekly_report_analysis, weekly_report_fallback, format_for_ai(data))
+
+    return {
+        **data,
+        "ai_analysis": ai_analysis,
+        "previous_week": {
+            "total_revenue": prev_data["total_revenue"],
+            "total_orders": prev_data["total_orders"]
+        }
+    }, ai_ok
+
+async def _build_monthly(db: Session, start_date: date) -> Tuple[Dict[str, Any], bool]:
+    _, end_date, prev_start = report_period("monthly", start_date)
+    prev_end = start_date - timedelta(days=1)
+
+    # Önceki ay ve bu ay tek sorguda; haftalık dağılım ve karşılaştırma bu günlerden hesaplanır
+    all_days = get_daily_sales(db, prev_start, end_date)
+    month_days = {d: v for d, v in all_days.items() if d >= start_date}
+    data = get_report_data(db, start_date, end_date, days=month_days)
+    prev_data = _sum_days(all_days, prev_start, prev_end)
+
+    revenue_change = ((data["total_revenue"] - prev_data["total_revenue"]) / max(1, prev_data["total_revenue"])) * 100
+    order_change = ((data["total_orders"] - prev_data["total_orders"]) / max(1, prev_data["total_orders"])) * 100
+
+    days_in_month = (end_date - start_date).days + 1
+    data["revenue_change"] = revenue_change
+    data["order_change"] = order_change
+    data["avg_daily_revenue"] = data["total_revenue"] / days_in_month
+
+    # Haftalık dağılım
+    weekly_breakdown = {}
+    current = start_date
+    week_num = 1
+    while current <= end_date:
+        week_end = min(current + timedelta(days=6), end_date)
+        week_data = _sum_days(month_days, current, week_end)
+        weekly_breakdown[f"Hafta {week_num}"] = {
+            "revenue": week_data["total_revenue"],
+            "orders": week_data["total_orders"]
+        }
+        current = week_end + timedelta(days=1)
+        week_num += 1
+
+    data["weekly_breakdown"] = weekly_breakdown
+    weekly_text = "\n".join([f"- {w}: {v['revenue']:.2f} ₺, {v['orders']} sipariş" for w, v in weekly_breakdown.items()])
+
+    # AI analizi
+    ai_data = format_for_ai(data)
+    ai_data["weekly_breakdown_text"] = weekly_text
+    ai_analysis, ai_ok = await _analyze(generate_monthly_report_analysis, monthly_report_fallback, ai_data)
+
+    return {
+        **data,
+        "ai_analysis": ai_analysis,
+        "previous_month": {
+            "total_revenue": prev_data["total_revenue"],
+            "total_orders": prev_data["total_orders"]
+        }
+    }, ai_ok
+
+_BUILDERS = {"daily": _build_daily, "weekly": _build_weekly, "monthly": _build_monthly}
+
+# --- SAKLAMA ---
+
+def _store_artifact(db: Session, kind: str, start: date, end: date, version: str, payload: Dict[str, Any], generated_at: datetime):
+    row = db.query(ReportArtifact).filter(ReportArtifact.kind == kind, ReportArtifact.period_start == start).first()
+    if row is None:
+        row = ReportArtifact(kind=kind, period_start=start)
+        db.add(row)
+    row.period_end = end
+    row.data_version = version
+    row.payload = payload
+    row.created_at = generated_at
+
+async def get_report(db: Session, kind: str, day: date) -> Dict[str, Any]:
+    """Dönem raporunu saklanan kayıttan döndürür; veri sürümü değiştiyse yeniden hesaplar"""
+    start, end, version_start = report_period(kind, day)
+    version = get_data_version(db, version_start, end)
+    row = db.query(ReportArtifact).filter(ReportArtifact.kind == kind, ReportArtifact.period_start == start).first()
+    if row is not None and (row.data_version == version or (
+        row.data_version == version + AI_FALLBACK_SUFFIX
+        and row.created_at > datetime.now() - timedelta(minutes=REPORT_AI_RETRY_MINUTES)
+    )):
+        return {**row.payload, "generated_at": row.created_at.isoformat()}
+
+    # Aynı dönem için eşzamanlı istekler tek hesaplamayı bekler
+    key = (kind, start, version)
+    pending = _inflight.get(key)
+    if pending is not None:
+        return await asyncio.shield(pending)
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        payload, ai_ok = await _BUILDERS[kind](db, start)
+        generated_at = datetime.now()
+        stored_version = version if ai_ok else version + AI_FALLBACK_SUFFIX
+        await run_write(_store_artifact, kind, start, end, stored_version, payload, generated_at)
+        result = {**payload, "generated_at": generated_at.isoformat()}
+        future.set_result(result)
+        return result
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()
+        raise
+    finally:
+        if not future.done():
+            future.cancel()
+        _inflight.pop(key, None)
+
+# --- ZAMANLAYICI ---
+
+async def precompute_reports(day: date) -> int:
+    """`day` gününü içeren günlük, haftalık ve aylık raporları hazırlar; yeniden hesaplanan rapor sayısını döndürür"""
+    periods = [("daily", day), ("weekly", day - timedelta(days=day.weekday())), ("monthly", day.replace(day=1))]
+    db = get_sessionmaker()()
+    computed = 0
+    try:
+        for kind, start in periods:
+            _, end, version_start = report_period(kind, start)
+            row = db.query(ReportArtifact.data_version).filter(ReportArtifact.kind == kind, ReportArtifact.period_start == start).first()
+            if row is not None and row[0] == get_data_version(db, version_start, end):
+                continue
+            try:
+                await get_report(db, kind, start)
+                computed += 1
+            except Exception as e:
+                logger.error(f"Rapor hazırlanamadı ({kind} {start}): {e}")
+    finally:
+        db.close()
+    return computed
+
+def _seconds_until_next_run(now: datetime) -> float:
+    run_at = now.replace(hour=REPORT_PRECOMPUTE_HOUR, minute=0, second=0, microsecond=0)
+    if run_at <= now:
+        run_at += timedelta(days=1)
+    return (run_at - now).total_seconds()
+
+def _claim_precompute(db: Session, day: date) -> bool:
+    """Günün ön hesaplamasını bu süreç için ayırır; başka bir worker önce ayırdıysa False"""
+    db.add(ReportArtifact(kind=PRECOMPUTE_CLAIM_KIND, period_start=day, period_end=day,
+                          data_version=f"pid:{os.getpid()}", payload={}, created_at=datetime.now()))
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        return False
+    return True
+
+async def run_precompute_loop() -> None:
+    """Açılışta ve her gün REPORT_PRECOMPUTE_HOUR'da biten günün raporlarını hazırlar"""
+    if not REPORT_PRECOMPUTE:
+        return
+    while True:
+        try:
+            day = date.today() - timedelta(days=1)
+            if await run_write(_claim_precompute, day):
+                computed = await precompute_reports(day)
+                if computed:
+                    logger.info(f"{computed} rapor önceden hesaplandı")
+        except Exception as e:
+            logger.error(f"Rapor ön hesaplama hatası: {e}")
+        await asyncio.sleep(_seconds_until_next_run(datetime.now()))
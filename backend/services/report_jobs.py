@@ -0,0 +1,196 @@
+"""
+PDF rapor işleri.
+
+Rapor üretimi (veri toplama, AI yorumu, reportlab çizimi) event loop dışında,
+sınırlı bir thread havuzunda çalışır. İş kimliği rapor türü, tarih aralığı ve veri
+sürümünden türetilir: aynı rapor için eşzamanlı istekler tek üretimi paylaşır.
+Sonuç uploads/ altında bu kimlikle saklanır; veri değişmedikçe yeniden üretilmez,
+yeni sürüm yazılınca aynı aralığın eski dosyaları silinir.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+from models import Inventory, Product, RestaurantConfig, Table, User, get_sessionmaker
+from services.report_pdf import build_closing_report, build_full_report
+from services.rollup_service import get_data_version
+
+load_dotenv()
+
+logger = logging.getLogger("report_jobs")
+
+# Aynı anda en fazla kaç rapor üretilir; biten işler bellekte ne kadar tutulur (sn)
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+REPORT_JOB_TTL = int(os.getenv("REPORT_JOB_TTL", "3600"))
+
+UPLOADS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "frontend", "static", "uploads")
+
+REPORT_KINDS = ("closing", "full")
+_JOB_ID = re.compile(r"^[A-Za-z0-9_\-]+_[0-9a-f]{12}$")
+
+_executor = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix="report")
+_jobs: Dict[str, "ReportJob"] = {}
+
+class ReportJob:
+    """Tek bir PDF üretimi: durum (queued, running, done, failed) ve çıktı dosyası"""
+    def __init__(self, job_id: str, kind: str, params: Dict[str, Any], download_name: str):
+        self.id = job_id
+        self.kind = kind
+        self.params = params
+        self.download_name = download_name
+        self.path = os.path.join(UPLOADS_DIR, f"{job_id}.pdf")
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+        self.future: Optional[asyncio.Future] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "download_url": f"/api/admin/reports/jobs/{self.id}/download" if self.status == "done" else None,
+            "filename": self.download_name,
+        }
+
+def _catalog_version(db: Session) -> str:
+    """Raporlarda görünen ürün / envanter / personel / masa / işletme alanlarının içerik özeti.
+
+    Sayı ve en büyük id yerine satırların kendisi özetlenir: ad ya da fiyat değişikliği
+    de yeni sürüm üretir.
+    """
+    digest = hashlib.sha1()
+    for query in (
+        db.query(Product.id, Product.name, Product.price, Product.category_id, Product.is_active).order_by(Product.id),
+        db.query(Inventory.product_id, Inventory.quantity).order_by(Inventory.product_id),
+        db.query(User.id, User.username, User.role, User.is_active).order_by(User.id),
+        db.query(Table.id, Table.number, Table.name, Table.is_active).order_by(Table.id),
+        db.query(RestaurantConfig.restaurant_name, RestaurantConfig.logo_url).order_by(RestaurantConfig.id),
+    ):
+        for row in query:
+            digest.update(repr(tuple(row)).encode("utf-8"))
+        digest.update(b"|")
+    return digest.hexdigest()
+
+def report_spec(db: Session, kind: str, report_date: Optional[date] = None, start_date: Optional[date] = None,
+                end_date: Optional[date] = None, include_ai: bool = True) -> ReportJob:
+    """İstek parametrelerinden (henüz başlatılmamış) iş tanımını oluşturur"""
+    if kind == "closing":
+        report_date = report_date or date.today()
+        # Ürün adları ve işletme başlığı da rapora girer
+        version = get_data_version(db, report_date, report_date) + _catalog_version(db)
+        prefix = f"kapanis_raporu_{report_date.strftime('%Y%m%d')}"
+        params = {"report_date": report_date}
+        download_name = f"{prefix}.pdf"
+    elif kind == "full":
+        start_date = start_date or date.today() - timedelta(days=7)
+        end_date = end_date or date.today()
+        # Rapor önceki aralıkla karşılaştırma da içerir
+        prev_start = start_date - timedelta(days=1) - (end_date - start_date)
+        version = get_data_version(db, prev_start, end_date) + _catalog_version(db)
+        prefix = f"full_report_{start_date.isoformat()}_{end_date.isoformat()}" + ("" if include_ai else "_noai")
+        params = {"start_date": start_date, "end_date": end_date, "include_ai": include_ai}
+        download_name = f"{prefix}.pdf"
+    else:
+        raise ValueError(f"Bilinmeyen rapor türü: {kind}")
+    digest = hashlib.sha1(f"{prefix}|{version}".encode("utf-8")).hexdigest()[:12]
+    return ReportJob(f"{prefix}_{digest}", kind, params, download_name)
+
+def _render(job: ReportJob):
+    """Havuz thread'inde çalışır: kendi oturumuyla veriyi okur, PDF'i atomik olarak yazar"""
+    job.status = "running"
+    os.makedirs(UPLOADS_DIR, exist_ok=True)
+    # PDF bellekte biriktirilmeden geçici dosyaya yazılır, tamamlanınca yerine taşınır
+    tmp_path = f"{job.path}.{os.getpid()}.tmp"
+    db = get_sessionmaker()()
+    try:
+        with open(tmp_path, "wb") as f:
+            if job.kind == "closing":
+                build_closing_report(db, out=f, **job.params)
+            else:
+                build_full_report(db, out=f, **job.params)
+        os.replace(tmp_path, job.path)
+    finally:
+        db.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    # Aynı raporun eski sürümlerini temizle
+    prefix = job.id.rsplit("_", 1)[0]
+    for name in os.listdir(UPLOADS_DIR):
+        if name.startswith(prefix + "_") and name.endswith(".pdf") and name != os.path.basename(job.path) and _JOB_ID.match(name[:-4]) and name[:-4].rsplit("_", 1)[0] == prefix:
+            try:
+                os.remove(os.path.join(UPLOADS_DIR, name))
+            except OSError:
+                pass
+
+async def _run(job: ReportJob):
+    loop = asyncio.get_running_loop()
+    started = time.monotonic()
+    try:
+        await loop.run_in_executor(_executor, _render, job)
+        job.status = "done"
+        logger.info(f"Rapor üretildi: {job.id} ({time.monotonic() - started:.1f}s)")
+    except Exception as e:
+        job.status = "failed"
+        job.error = str(e)
+        logger.error(f"Rapor üretilemedi ({job.id}): {e}")
+    finally:
+        job.finished_at = datetime.now()
+
+def _prune_jobs():
+    cutoff = datetime.now() - timedelta(seconds=REPORT_JOB_TTL)
+    for job_id, job in list(_jobs.items()):
+        if job.finished_at is not None and job.finished_at < cutoff:
+            del _jobs[job_id]
+
+def submit_report(db: Session, kind: str, **params) -> ReportJob:
+    """Rapor işini başlatır; aynı rapor için süren ya da hazır iş varsa onu döndürür"""
+    _prune_jobs()
+    spec = report_spec(db, kind, **params)
+    job = _jobs.get(spec.id)
+    if job is not None and (job.status in ("queued", "running") or (job.status == "done" and os.path.exists(job.path))):
+        return job
+    if os.path.exists(spec.path):
+        # Önbellekte (bu ya da başka bir worker tarafından üretilmiş) aynı sürüm var
+        spec.status = "done"
+        spec.finished_at = datetime.now()
+    else:
+        spec.future = asyncio.ensure_future(_run(spec))
+    _jobs[spec.id] = spec
+    return spec
+
+def get_job(job_id: str) -> Optional[ReportJob]:
+    """İşi bellekten, yoksa (başka worker'ın ürettiği) önbellek dosyasından bulur"""
+    job = _jobs.get(job_id)
+    if job is not None:
+        return job
+    if not _JOB_ID.match(job_id):
+        return None
+    path = os.path.join(UPLOADS_DIR, f"{job_id}.pdf")
+    if not os.path.exists(path):
+        return None
+    kind = "closing" if job_id.startswith("kapanis_raporu_") else "full"
+    job = ReportJob(job_id, kind, {}, f"{job_id.rsplit('_', 1)[0]}.pdf")
+    job.status = "done"
+    job.finished_at = datetime.fromtimestamp(os.path.getmtime(path))
+    return job
+
+async def wait_for_job(job: ReportJob) -> ReportJob:
+    """İş bitene kadar bekler (isteği iptal eden istemci üretimi iptal etmez)"""
+    if job.future is not None:
+        await asyncio.shield(job.future)
+    return job
+
+def shutdown_report_pool():
+    _executor.shutdown(wait=False, cancel_futures=True)
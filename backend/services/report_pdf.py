@@ -0,0 +1,172 @@
+"""
+PDF rapor içerikleri (günlük kapanış, kapsamlı yönetim raporu).
+
+Fonksiyonlar senkron çalışır ve PDF'i verilen dosyaya (yol ya da dosya nesnesi)
+yazar; event loop dışında, report_jobs iş havuzunda çağrılır. Sayfa düzeni ve
+fontlar pdf_render'dadır.
+"""
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from sqlalchemy.orm import Session
+from models import Inventory, Order, OrderItem, Product, RestaurantConfig, Table, User
+from services.ai_service import generate_analysis_text, run_sync
+from services.pdf_render import PageWriter, ReportTemplate, load_logo
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "frontend", "static")
+
+def _template(db: Session, title: str, subtitle: str) -> ReportTemplate:
+    config = db.query(RestaurantConfig).first()
+    name = config.restaurant_name if config and config.restaurant_name else ""
+    return ReportTemplate(title, subtitle, name, load_logo(STATIC_DIR, config.logo_url if config else None))
+
+def build_closing_report(db: Session, report_date: date, out):
+    """Günlük kapanış raporunu out'a yazar"""
+    # Bugünün verilerini al
+    start = datetime.combine(report_date, datetime.min.time())
+    end = datetime.combine(report_date, datetime.max.time())
+    
+    orders = db.query(Order).filter(Order.created_at >= start, Order.created_at <= end).all()
+    
+    total_revenue = 0.0
+    cash_total = 0.0
+    card_total = 0.0
+    total_orders = 0
+    cancelled_orders = 0
+    
+    for o in orders:
+        total_orders += 1
+        status = (o.status.value if o.status else "").lower()
+        if status in ["cancelled", "iptal"]:
+            cancelled_orders += 1
+        else:
+            amount = float(o.total_amount or 0.0)
+            total_revenue += amount
+            pm = getattr(o, 'payment_method', None)
+            if pm == "cash":
+                cash_total += amount
+            elif pm == "card":
+                card_total += amount
+    
+    # Ürün satışları
+    items = db.query(OrderItem).join(Order).filter(Order.created_at >= start, Order.created_at <= end).all()
+    counts = defaultdict(int)
+    totals = defaultdict(float)
+    for item in items:
+        if item.product_id:
+            counts[item.product_id] += item.quantity or 0
+            totals[item.product_id] += float(item.subtotal or 0.0)
+    
+    product_map = dict(db.query(Product.id, Product.name).filter(Product.id.in_(list(counts))).all()) if counts else {}
+    
+    top = sorted([
+        {"name": product_map.get(pid, str(pid)), "qty": qty, "total": totals.get(pid, 0.0)} 
+        for pid, qty in counts.items()
+    ], key=lambda x: x["qty"], reverse=True)[:10]
+    
+    # AI analizi
+    matrix_data = [{"name": x["name"], "volume": x["qty"], "profit_proxy": x["total"]} for x in top]
+    analysis = run_sync(generate_analysis_text(matrix_data))
+    
+    w = PageWriter(out, _template(db, "GÜNLÜK KAPANIŞ RAPORU", f"Tarih: {report_date.strftime('%d.%m.%Y')}"))
+
+    # Finansal özet
+    w.heading("FİNANSAL ÖZET", 14)
+    w.line(f"Toplam Ciro: {total_revenue:.2f} TL", 12, step=18)
+    w.line(f"Nakit: {cash_total:.2f} TL", 12, step=18)
+    w.line(f"Kredi Kartı: {card_total:.2f} TL", 12, step=18)
+    w.line(f"Toplam Sipariş: {total_orders}", 12, step=18)
+    w.line(f"İptal Edilen: {cancelled_orders}", 12, step=18)
+
+    avg_order = total_revenue / max(1, (total_orders - cancelled_orders))
+    w.line(f"Ortalama Sepet: {avg_order:.2f} TL", 12, step=18)
+    w.rule()
+
+    # En çok satanlar
+    w.heading("EN ÇOK SATANLAR", 14)
+    for i, row in enumerate(top[:10], 1):
+        w.line(f"{i}. {row['name']} - {row['qty']} adet - {row['total']:.2f} TL", 11, step=18)
+
+    # AI Analizi
+    w.new_page()
+    w.heading("AI ANALİZİ VE ÖNERİLER", 14)
+    for line in analysis.split("\n"):
+        w.line(line, step=14)
+
+    w.save()
+
+def build_full_report(db: Session, start_date: date, end_date: date, out, include_ai: bool = True):
+    """Tarih aralığı için kapsamlı yönetim raporunu out'a yazar"""
+    s = datetime.combine(start_date, datetime.min.time())
+    e = datetime.combine(end_date, datetime.max.time())
+    orders = db.query(Order).filter(Order.created_at >= s, Order.created_at <= e).all()
+    total_revenue = 0.0
+    total_orders = 0
+    cancelled_orders = 0
+    for o in orders:
+        st = (o.status.value if o.status else "").lower()
+        total_orders += 1
+        if st in ["cancelled", "iptal"]:
+            cancelled_orders += 1
+        else:
+            total_revenue += float(o.total_amount or 0.0)
+    products = db.query(Product).all()
+    inv_map = {i.product_id: i.quantity for i in db.query(Inventory).all()}
+    users = db.query(User).all()
+    tables_total = db.query(Table).filter(Table.is_active == True).count()
+    table_rows = db.query(Table).filter(Table.is_active == True).order_by(Table.number.asc()).all()
+    items = db.query(OrderItem).join(Order, OrderItem.order_id == Order.id).filter(Order.created_at >= s, Order.created_at <= e).all()
+    prod_counts = {}
+    for it in items:
+        pid = it.product_id
+        if pid not in prod_counts:
+            prod_counts[pid] = {"name": it.product.name if it.product else str(pid), "qty": 0, "total": 0.0}
+        prod_counts[pid]["qty"] += int(it.quantity or 0)
+        prod_counts[pid]["total"] += float(it.subtotal or 0.0)
+    prev_end = start_date - timedelta(days=1)
+    prev_start = prev_end - (end_date - start_date)
+    ps = datetime.combine(prev_start, datetime.min.time())
+    pe = datetime.combine(prev_end, datetime.max.time())
+    prev_orders = db.query(Order).filter(Order.created_at >= ps, Order.created_at <= pe).all()
+    prev_rev = sum(float(o.total_amount or 0.0) for o in prev_orders if (o.status and o.status.value.lower() not in ["cancelled","iptal"]))
+    w = PageWriter(out, _template(db, "Kapsamlı Yönetim Raporu", f"{start_date.strftime('%d.%m.%Y')} - {end_date.strftime('%d.%m.%Y')}"))
+    # İçindekiler
+    toc = [
+        "1. Genel Bakış",
+        "2. Ürün Satışları",
+        "3. Envanter",
+        "4. Personel",
+        "5. Masalar",
+        "6. AI İçgörü (opsiyonel)"
+    ]
+    w.heading("İçindekiler", 12)
+    for line in toc:
+        w.line(line, step=16)
+    w.new_page()
+    w.heading("Genel Bakış", 12)
+    w.line(f"Aralık: {start_date.isoformat()} - {end_date.isoformat()}")
+    w.line(f"Toplam Ciro: {total_revenue:.2f} TL | Toplam Sipariş: {total_orders} | İptaller: {cancelled_orders}")
+    w.line(f"Önceki Aralık Cirosu: {prev_rev:.2f} TL | Fark: {(total_revenue - prev_rev):.2f} TL")
+    w.rule()
+
+    w.heading("Ürün Satışları (Top 15)", 12)
+    top = sorted([{**v} for v in prod_counts.values()], key=lambda x: x["total"], reverse=True)[:15]
+    for row in top:
+        w.line(f"{row['name']} - {row['qty']} adet - {row['total']:.2f} TL", step=16)
+    w.heading("Envanter Durumu", 12)
+    for p in products[:20]:
+        w.line(f"{p.name} - Stok: {int(inv_map.get(p.id, 0))}", step=16)
+    w.heading("Personel", 12)
+    for u in users[:25]:
+        w.line(f"{u.username} ({u.role.value if u.role else ''})", step=16)
+    w.heading("Masalar", 12)
+    w.line(f"Aktif Masa Sayısı: {tables_total}", step=20)
+    for t in table_rows[:40]:
+        w.line(f"masa - {t.number} - {t.name}", step=16)
+    if include_ai:
+        w.heading("AI İçgörü ve Tahmin", 12)
+        matrix = [{"name": x["name"], "volume": x["qty"], "profit_proxy": x["total"]} for x in top]
+        insight = run_sync(generate_analysis_text(matrix))
+        for line in insight.split("\n"):
+            w.line(line, step=16)
+    w.save()
@@ -0,0 +1,288 @@
+"""
+Günlük satış ve ürün özetleri (DailySalesSummary / DailyProductSummary).
+
+Özetler sipariş oluşturma, durum değişikliği ve masa kapatma ile aynı
+transaction içinde artımlı güncellenir. Periyodik uzlaştırma son günleri ham
+siparişlerden yeniden hesaplar; açılışta özeti olmayan geçmiş günler doldurulur.
+Raporlar geçmiş günleri özetlerden, bugünü ham siparişlerden okur.
+İptal edilen siparişler ciroya ve ürün satışlarına dahil edilmez.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import and_, case, delete, func, insert, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from db_writer import run_write
+from models import DailyProductSummary, DailySalesSummary, Order, OrderItem, OrderStatus, Product
+
+load_dotenv()
+
+logger = logging.getLogger("rollups")
+
+RECONCILE_INTERVAL_SECONDS = int(os.getenv("ROLLUP_RECONCILE_INTERVAL", "3600"))
+RECONCILE_DAYS = int(os.getenv("ROLLUP_RECONCILE_DAYS", "2"))
+
+SALES_FIELDS = ("total_orders", "cancelled_orders", "total_revenue", "cash_total", "card_total")
+
+# --- YARDIMCI FONKSİYONLAR ---
+
+def _as_date(value) -> date:
+    # SQLite date() metin, PostgreSQL date nesnesi döndürür
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+def _dialect_insert(db: Session):
+    name = db.get_bind().dialect.name
+    if name == "sqlite":
+        return sqlite_insert
+    if name == "postgresql":
+        return pg_insert
+    return None
+
+def _avg(values: Dict[str, float]) -> float:
+    live = values["total_orders"] - values["cancelled_orders"]
+    return values["total_revenue"] / live if live > 0 else 0.0
+
+def _sales_values(status, amount, payment_method) -> Dict[str, float]:
+    """Tek bir siparişin gün özetine katkısı"""
+    if status == OrderStatus.IPTAL:
+        return {"total_orders": 1, "cancelled_orders": 1, "total_revenue": 0.0, "cash_total": 0.0, "card_total": 0.0}
+    amount = float(amount or 0.0)
+    return {
+        "total_orders": 1,
+        "cancelled_orders": 0,
+        "total_revenue": amount,
+        "cash_total": amount if payment_method == "cash" else 0.0,
+        "card_total": amount if payment_method == "card" else 0.0,
+    }
+
+def _add_sales(db: Session, day: date, delta: Dict[str, float]) -> None:
+    """Gün satırına farkları ekler (satır yoksa oluşturur) ve sürümü artırır"""
+    S = DailySalesSummary
+    totals = {k: func.coalesce(getattr(S, k), 0) + delta[k] for k in SALES_FIELDS}
+    live = totals["total_orders"] - totals["cancelled_orders"]
+    values = dict(totals, avg_order=case((live > 0, totals["total_revenue"] / live), else_=0.0), version=func.coalesce(S.version, 0) + 1)
+
+    dialect_insert = _dialect_insert(db)
+    if dialect_insert is not None:
+        stmt = dialect_insert(S).values(date=day, avg_order=_avg(delta), version=1, **delta).on_conflict_do_update(
+            index_elements=[S.date], set_=values
+        )
+        db.execute(stmt)
+    elif not db.execute(update(S).where(S.date == day).values(**values)).rowcount:
+        db.execute(insert(S).values(date=day, avg_order=_avg(delta), version=1, **delta))
+
+def _add_products(db: Session, day: date, deltas: Dict[int, Tuple[int, float]]) -> None:
+    """Ürün satırlarına miktar/ciro farklarını tek executemany ile ekler"""
+    rows = [{"date": day, "product_id": pid, "qty": qty, "revenue": revenue} for pid, (qty, revenue) in deltas.items() if qty or revenue]
+    if not rows:
+        return
+    P = DailyProductSummary
+    dialect_insert = _dialect_insert(db)
+    if dialect_insert is not None:
+        stmt = dialect_insert(P)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[P.date, P.product_id],
+            set_={"qty": func.coalesce(P.qty, 0) + stmt.excluded.qty, "revenue": func.coalesce(P.revenue, 0) + stmt.excluded.revenue}
+        )
+        db.execute(stmt, rows)
+        return
+    for row in rows:
+        bump = update(P).where(P.date == day, P.product_id == row["product_id"]).values(
+            qty=func.coalesce(P.qty, 0) + row["qty"], revenue=func.coalesce(P.revenue, 0) + row["revenue"]
+        )
+        if not db.execute(bump).rowcount:
+            db.execute(insert(P).values(**row))
+
+# --- ARTIMLI GÜNCELLEME ---
+
+def record_order_created(db: Session, order: Order, lines: Iterable[Tuple[int, int, float]]) -> None:
+    """Yeni siparişi özetlere ekler; lines: (product_id, quantity, subtotal)"""
+    day = (order.created_at or datetime.now()).date()
+    _add_sales(db, day, _sales_values(order.status, order.total_amount, order.payment_method))
+    if order.status == OrderStatus.IPTAL:
+        return
+    deltas: Dict[int, Tuple[int, float]] = {}
+    for product_id, quantity, subtotal in lines:
+        qty, revenue = deltas.get(product_id, (0, 0.0))
+        deltas[product_id] = (qty + int(quantity or 0), revenue + float(subtotal or 0.0))
+    _add_products(db, day, deltas)
+
+def record_order_change(db: Session, order: Order, old_status: OrderStatus, old_payment_method: Optional[str]) -> None:
+    """Durum / ödeme yöntemi değişikliğini özetlere yansıtır"""
+    before = _sales_values(old_status, order.total_amount, old_payment_method)
+    after = _sales_values(order.status, order.total_amount, order.payment_method)
+    delta = {k: after[k] - before[k] for k in SALES_FIELDS}
+    if not any(delta.values()):
+        return
+    day = (order.created_at or datetime.now()).date()
+    _add_sales(db, day, delta)
+
+    was_cancelled = old_status == OrderStatus.IPTAL
+    is_cancelled = order.status == OrderStatus.IPTAL
+    if was_cancelled != is_cancelled:
+        sign = -1 if is_cancelled else 1
+        rows = db.query(OrderItem.product_id, func.sum(OrderItem.quantity), func.sum(OrderItem.subtotal)).filter(
+            OrderItem.order_id == order.id
+        ).group_by(OrderItem.product_id).all()
+        _add_products(db, day, {pid: (sign * int(qty or 0), sign * float(revenue or 0.0)) for pid, qty, revenue in rows})
+
+# --- HAM VERİDEN HESAPLAMA ---
+
+def _raw_sales(db: Session, start_day: date, end_day: date) -> Dict[date, Dict[str, float]]:
+    start = datetime.combine(start_day, time.min)
+    end = datetime.combine(end_day + timedelta(days=1), time.min)
+    order_day = func.date(Order.created_at)
+    live = Order.status != OrderStatus.IPTAL
+    amount = func.coalesce(Order.total_amount, 0.0)
+    rows = db.query(
+        order_day,
+        func.count(Order.id),
+        func.sum(case((Order.status == OrderStatus.IPTAL, 1), else_=0)),
+        func.sum(case((live, amount), else_=0.0)),
+        func.sum(case((and_(live, Order.payment_method == "cash"), amount), else_=0.0)),
+        func.sum(case((and_(live, Order.payment_method == "card"), amount), else_=0.0)),
+    ).filter(Order.created_at >= start, Order.created_at < end).group_by(order_day).all()
+    return {
+        _as_date(d): {"total_orders": int(count or 0), "cancelled_orders": int(cancelled or 0), "total_revenue": float(revenue or 0.0), "cash_total": float(cash or 0.0), "card_total": float(card or 0.0)}
+        for d, count, cancelled, revenue, cash, card in rows
+    }
+
+def _raw_products(db: Session, start_day: date, end_day: date) -> Dict[date, Dict[int, Tuple[int, float]]]:
+    start = datetime.combine(start_day, time.min)
+    end = datetime.combine(end_day + timedelta(days=1), time.min)
+    order_day = func.date(Order.created_at)
+    rows = db.query(order_day, OrderItem.product_id, func.sum(OrderItem.quantity), func.sum(OrderItem.subtotal)).join(
+        Order, OrderItem.order_id == Order.id
+    ).filter(
+        Order.created_at >= start, Order.created_at < end, Order.status != OrderStatus.IPTAL
+    ).group_by(order_day, OrderItem.product_id).all()
+    result: Dict[date, Dict[int, Tuple[int, float]]] = {}
+    for d, pid, qty, revenue in rows:
+        result.setdefault(_as_date(d), {})[pid] = (int(qty or 0), float(revenue or 0.0))
+    return result
+
+def _same_sales(row: DailySalesSummary, values: Dict[str, float]) -> bool:
+    return all(abs(float(getattr(row, k) or 0) - values[k]) < 0.005 for k in SALES_FIELDS)
+
+def rebuild_days(db: Session, start_day: date, end_day: date) -> int:
+    """Verilen günlerin özetlerini ham siparişlerden yeniden yazar.
+
+    Yalnızca sapma olan günler yazılır ve sürümü artırılır; değişen gün sayısını döndürür.
+    """
+    sales = _raw_sales(db, start_day, end_day)
+    products = _raw_products(db, start_day, end_day)
+    existing = {r.date: r for r in db.query(DailySalesSummary).filter(DailySalesSummary.date >= start_day, DailySalesSummary.date <= end_day).all()}
+    existing_products: Dict[date, Dict[int, Tuple[int, float]]] = {}
+    for r in db.query(DailyProductSummary).filter(DailyProductSummary.date >= start_day, DailyProductSummary.date <= end_day).all():
+        existing_products.setdefault(r.date, {})[r.product_id] = (int(r.qty or 0), float(r.revenue or 0.0))
+
+    changed = 0
+    for i in range((end_day - start_day).days + 1):
+        day = start_day + timedelta(days=i)
+        row = existing.get(day)
+        if day not in sales and row is None and day not in existing_products:
+            continue
+        values = sales.get(day) or {k: 0 for k in SALES_FIELDS}
+        day_products = products.get(day, {})
+        current_products = existing_products.get(day, {})
+        same_products = current_products.keys() == day_products.keys() and all(
+            current_products[pid][0] == qty and abs(current_products[pid][1] - revenue) < 0.005 for pid, (qty, revenue) in day_products.items()
+        )
+        if row is not None and _same_sales(row, values) and same_products:
+            continue
+
+        if row is None:
+            row = DailySalesSummary(date=day, version=0)
+            db.add(row)
+        for k in SALES_FIELDS:
+            setattr(row, k, values[k])
+        row.avg_order = _avg(values)
+        row.version = (row.version or 0) + 1
+        db.execute(delete(DailyProductSummary).where(DailyProductSummary.date == day))
+        if day_products:
+            db.execute(insert(DailyProductSummary), [
+                {"date": day, "product_id": pid, "qty": qty, "revenue": revenue} for pid, (qty, revenue) in day_products.items()
+            ])
+        changed += 1
+    db.flush()
+    return changed
+
+def backfill_missing_days(db: Session) -> int:
+    """Siparişi olup özeti hiç oluşturulmamış geçmiş günleri doldurur"""
+    order_day = func.date(Order.created_at)
+    today_start = datetime.combine(date.today(), time.min)
+    order_days = {_as_date(d) for (d,) in db.query(order_day).filter(Order.created_at < today_start).group_by(order_day).all()}
+    known = {d for (d,) in db.query(DailySalesSummary.date).all()}
+    missing = sorted(order_days - known)
+    for day in missing:
+        rebuild_days(db, day, day)
+    return len(missing)
+
+def reconcile_recent_days(db: Session) -> int:
+    """Son RECONCILE_DAYS günün özetlerini ham veriyle uzlaştırır"""
+    today = date.today()
+    return rebuild_days(db, today - timedelta(days=max(RECONCILE_DAYS, 1) - 1), today)
+
+async def run_reconcile_loop() -> None:
+    """Uygulama açıkken periyodik uzlaştırmayı yazma kuyruğu üzerinden çalıştırır"""
+    while True:
+        await asyncio.sleep(RECONCILE_INTERVAL_SECONDS)
+        try:
+            changed = await run_write(reconcile_recent_days)
+            if changed:
+                logger.warning(f"Günlük özet uzlaştırması {changed} günü düzeltti")
+        except Exception as e:
+            logger.error(f"Günlük özet uzlaştırma hatası: {e}")
+
+# --- OKUMA ---
+
+def get_daily_sales(db: Session, start_day: date, end_day: date) -> Dict[date, Dict[str, float]]:
+    """[start_day, end_day] için günlük satış değerleri: geçmiş günler özetlerden, bugün ham veriden"""
+    today = date.today()
+    result: Dict[date, Dict[str, float]] = {}
+    last_rollup_day = min(end_day, today - timedelta(days=1))
+    if start_day <= last_rollup_day:
+        rows = db.query(DailySalesSummary).filter(DailySalesSummary.date >= start_day, DailySalesSummary.date <= last_rollup_day).all()
+        for r in rows:
+            result[r.date] = {
+                "total_orders": int(r.total_orders or 0), "cancelled_orders": int(r.cancelled_orders or 0),
+                "total_revenue": float(r.total_revenue or 0.0), "cash_total": float(r.cash_total or 0.0), "card_total": float(r.card_total or 0.0)
+            }
+    if end_day >= today:
+        result.update(_raw_sales(db, max(start_day, today), end_day))
+    return result
+
+def get_product_sales(db: Session, start_day: date, end_day: date) -> List[Dict[str, Any]]:
+    """Aralıktaki ürün satışları: [{product_id, name, qty, total}] (sıralanmamış)"""
+    today = date.today()
+    totals: Dict[int, List[float]] = {}
+    last_rollup_day = min(end_day, today - timedelta(days=1))
+    if start_day <= last_rollup_day:
+        rows = db.query(DailyProductSummary.product_id, func.sum(DailyProductSummary.qty), func.sum(DailyProductSummary.revenue)).filter(
+            DailyProductSummary.date >= start_day, DailyProductSummary.date <= last_rollup_day
+        ).group_by(DailyProductSummary.product_id).all()
+        for pid, qty, revenue in rows:
+            totals[pid] = [int(qty or 0), float(revenue or 0.0)]
+    if end_day >= today:
+        for day_products in _raw_products(db, max(start_day, today), end_day).values():
+            for pid, (qty, revenue) in day_products.items():
+                acc = totals.setdefault(pid, [0, 0.0])
+                acc[0] += qty
+                acc[1] += revenue
+    if not totals:
+        return []
+    names = dict(db.query(Product.id, Product.name).filter(Product.id.in_(list(totals.keys()))).all())
+    return [{"product_id": pid, "name": names.get(pid, str(pid)), "qty": qty, "total": revenue} for pid, (qty, revenue) in totals.items()]
+
+def get_data_version(db: Session, start_day: date, end_day: date) -> str:
+    """Aralıktaki günlük özet sürümlerinden türetilen anahtar; güne ait her sipariş değişikliğinde değişir"""
+    rows = db.query(DailySalesSummary.date, DailySalesSummary.version).filter(
+        DailySalesSummary.date >= start_day, DailySalesSummary.date <= end_day
+    ).order_by(DailySalesSummary.date.asc()).all()
+    return hashlib.sha1(";".join(f"{d}:{v or 0}" for d, v in rows).encode("utf-8")).hexdigest()
@@ -0,0 +1,49 @@
+"""
+Açık masalar görünümü.
+
+/tables/open, /api/tables/open ve /api/tables/open-list aynı sorguları kullanır:
+masa sayısından ve geçmiş sipariş hacminden bağımsız olarak sabit sayıda sorgu
+çalışır; yalnızca aktif (teslim edilmemiş / iptal edilmemiş) siparişler okunur.
+"""
+from typing import Any, Dict, List
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from models import Order, OrderItem, OrderStatus, Table, TableState
+
+OPEN_ORDER_STATUSES = [OrderStatus.BEKLIYOR, OrderStatus.HAZIRLANIYOR, OrderStatus.HAZIR]
+
+def get_open_tables(db: Session, include_occupied: bool = True) -> List[Dict[str, Any]]:
+    """Aktif siparişi olan (include_occupied ise dolu işaretli olan) masaları döndürür"""
+    tables = db.query(Table.id, Table.number, Table.name, TableState.is_occupied, TableState.merged_with_table_id).outerjoin(
+        TableState, TableState.table_id == Table.id
+    ).filter(Table.is_active == True).order_by(Table.id.asc()).all()
+    
+    totals = dict(db.query(Order.table_id, func.sum(Order.total_amount)).filter(
+        Order.status.in_(OPEN_ORDER_STATUSES)
+    ).group_by(Order.table_id).all())
+    
+    items_by_table: Dict[int, List[Dict[str, Any]]] = {}
+    rows = db.query(Order.table_id, OrderItem.order_id, Order.version, OrderItem.product_id, OrderItem.quantity, OrderItem.subtotal).join(
+        Order, OrderItem.order_id == Order.id
+    ).filter(Order.status.in_(OPEN_ORDER_STATUSES)).order_by(OrderItem.order_id.asc(), OrderItem.id.asc()).all()
+    for table_id, order_id, version, product_id, quantity, subtotal in rows:
+        items_by_table.setdefault(table_id, []).append({"order_id": order_id, "order_version": version, "product_id": product_id, "quantity": quantity, "subtotal": float(subtotal or 0.0)})
+    
+    result = []
+    for table_id, number, name, is_occupied, merged_with in tables:
+        active_items = items_by_table.get(table_id, [])
+        occupied = bool(is_occupied)
+        if not active_items and not (include_occupied and occupied):
+            continue
+        row = {
+            "table_id": table_id,
+            "table_number": number,
+            "table_name": name,
+            "total_amount": float(totals.get(table_id) or 0.0),
+            "items": active_items,
+            "merged_with_table_id": merged_with
+        }
+        if include_occupied:
+            row["is_occupied"] = occupied
+        result.append(row)
+    return result
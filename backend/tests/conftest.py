@@ -0,0 +1,86 @@
+"""
+Testler geçici bir SQLite veritabanıyla uygulamayı süreç içinde başlatır.
+
+Ortam değişkenleri uygulama modülleri yüklenmeden ayarlanır; bu yüzden bu dosya
+models/main içe aktarılmadan önce çalışmalıdır. Testler backend/ klasöründen:
+    python -m pytest -q
+"""
+import contextlib
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+from collections import namedtuple
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_TMP_DIR = tempfile.mkdtemp(prefix="adisyon-test-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP_DIR, 'test.db')}"
+os.environ["AI_BACKEND"] = "fake"
+os.environ["GOOGLE_API_KEY"] = ""
+os.environ["REPORT_PRECOMPUTE"] = "false"
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+_numbers = itertools.count(1)
+Statement = namedtuple("Statement", "sql parameters executemany")
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_TMP_DIR, ignore_errors=True)
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    import main
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+@pytest.fixture(scope="session")
+def admin_headers(client):
+    token = client.post("/api/auth/login", json={"username": "admin", "password": "admin123"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture
+def make_table(client, admin_headers):
+    """Her çağrıda benzersiz numaralı yeni bir masa oluşturur"""
+    def _make(**fields):
+        number = next(_numbers) + 1000
+        body = {"name": f"masa - {number}", "number": number, **fields}
+        response = client.post("/api/tables", json=body, headers=admin_headers)
+        assert response.status_code == 200, response.text
+        return response.json()
+    return _make
+
+@pytest.fixture
+def make_product(client, admin_headers):
+    """Yeni bir kategori içinde ürün oluşturur; category_id verilirse ona eklenir"""
+    def _make(**fields):
+        if "category_id" not in fields:
+            category = client.post("/api/products/categories", json={"name": f"Kategori {next(_numbers)}"}, headers=admin_headers)
+            assert category.status_code == 200, category.text
+            fields["category_id"] = category.json()["id"]
+        body = {"name": f"Ürün {next(_numbers)}", "price": 10, **fields}
+        response = client.post("/api/products", json=body, headers=admin_headers)
+        assert response.status_code == 200, response.text
+        return response.json()
+    return _make
+
+@contextlib.contextmanager
+def _capture_statements():
+    """Blok içinde motorda çalışan SQL ifadelerini Statement olarak toplar"""
+    from sqlalchemy import event
+    from models import get_engine
+    engine = get_engine()
+    statements = []
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(Statement(statement, parameters, executemany))
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+
+@pytest.fixture
+def capture_statements():
+    return _capture_statements
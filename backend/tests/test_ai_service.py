@@ -0,0 +1,94 @@
+"""AI servisi: model zinciri, devre kesici, sonuç önbelleği ve süren isteklerin paylaşımı (user-019)."""
+import asyncio
+import threading
+import pytest
+
+@pytest.fixture
+def ai(monkeypatch):
+    """İki modelli fake arka uç; her test temiz devre kesici, önbellek ve çağrı kaydıyla başlar"""
+    from cache_utils import TTLCache
+    from services import ai_service
+
+    class RecordingBackend(ai_service._FakeBackend):
+        def __init__(self):
+            self.calls = []
+
+        async def generate(self, model_name, prompt, timeout):
+            self.calls.append(model_name)
+            return await super().generate(model_name, prompt, timeout)
+
+    monkeypatch.setattr(ai_service, "_backend", RecordingBackend())
+    monkeypatch.setattr(ai_service, "MODELS", [("m1", 0.5), ("m2", 0.5)])
+    monkeypatch.setattr(ai_service, "_breakers", {name: ai_service.CircuitBreaker(2, 60) for name in ("m1", "m2")})
+    monkeypatch.setattr(ai_service, "_result_cache", TTLCache(60))
+    monkeypatch.setattr(ai_service, "_inflight", {})
+    monkeypatch.setattr(ai_service, "AI_FAKE_FAIL_MODELS", set())
+    monkeypatch.setattr(ai_service, "AI_FAKE_LATENCY", 0.0)
+    return ai_service
+
+def test_failing_model_falls_through_and_opens_circuit(ai, monkeypatch):
+    monkeypatch.setattr(ai, "AI_FAKE_FAIL_MODELS", {"m1"})
+    for prompt in ("a", "b"):
+        assert asyncio.run(ai._get_gemini_response(prompt)).startswith("[m2")
+    assert ai._backend.calls == ["m1", "m2", "m1", "m2"]
+    # İki hatadan sonra devre açık: m1 hiç denenmez
+    ai._backend.calls.clear()
+    assert asyncio.run(ai._get_gemini_response("c")).startswith("[m2")
+    assert ai._backend.calls == ["m2"]
+
+def test_all_models_failing_raises_and_report_helper_falls_back(ai, monkeypatch):
+    monkeypatch.setattr(ai, "AI_FAKE_FAIL_MODELS", {"m1", "m2"})
+    with pytest.raises(RuntimeError):
+        asyncio.run(ai._get_gemini_response("x"))
+    text = asyncio.run(ai.generate_analysis_text([{"name": "Çay", "volume": 3}]))
+    assert not text.startswith("[")
+
+def test_slow_model_times_out_and_next_model_answers(ai, monkeypatch):
+    monkeypatch.setattr(ai, "MODELS", [("m1", 0.05), ("m2", 1.0)])
+    monkeypatch.setattr(ai, "AI_FAKE_LATENCY", 0.2)
+    assert asyncio.run(ai._get_gemini_response("yavaş")).startswith("[m2")
+    assert ai._backend.calls == ["m1", "m2"]
+    assert ai._breakers["m1"].failures == 1
+
+def test_result_cache_skips_backend(ai):
+    first = asyncio.run(ai._get_gemini_response("aynı"))
+    second = asyncio.run(ai._get_gemini_response("aynı"))
+    assert first == second
+    assert ai._backend.calls == ["m1"]
+
+def test_concurrent_identical_prompts_share_one_call(ai, monkeypatch):
+    monkeypatch.setattr(ai, "AI_FAKE_LATENCY", 0.05)
+
+    async def scenario():
+        return await asyncio.gather(*[ai._get_gemini_response("eşzamanlı") for _ in range(5)])
+
+    results = asyncio.run(scenario())
+    assert len(set(results)) == 1
+    assert ai._backend.calls == ["m1"]
+    assert ai._inflight == {}
+
+def test_run_sync_gives_up_after_timeout(ai, monkeypatch):
+    monkeypatch.setattr(ai, "RUN_SYNC_TIMEOUT", 0.1)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(ai, "_main_loop", loop)
+    cancelled = threading.Event()
+
+    async def stuck():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    try:
+        with pytest.raises(RuntimeError):
+            ai.run_sync(stuck())
+        assert cancelled.wait(1)
+        # Döngü çalışırken normal çağrı sonucu döner
+        assert ai.run_sync(ai._get_gemini_response("senkron")).startswith("[m1")
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(1)
+        loop.close()
@@ -0,0 +1,28 @@
+"""Günlük sipariş numaraları: iş günü sınırı ve eşzamanlı tahsis (user-004)."""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+def test_business_day_starts_at_configured_hour(monkeypatch):
+    from routers import orders
+    monkeypatch.setattr(orders, "BUSINESS_DAY_START_HOUR", 6)
+    assert orders.current_business_date(datetime(2030, 1, 2, 5, 59)) == date(2030, 1, 1)
+    assert orders.current_business_date(datetime(2030, 1, 2, 6, 0)) == date(2030, 1, 2)
+    start, end = orders.business_day_bounds(date(2030, 1, 2))
+    assert (start, end) == (datetime(2030, 1, 2, 6, 0), datetime(2030, 1, 3, 6, 0))
+
+def test_concurrent_orders_get_unique_gap_free_numbers(client, make_table, make_product, monkeypatch):
+    import db_writer
+    from routers import orders
+    table, product = make_table(), make_product()
+    # Yeni bir iş günü: sayaç 1'den başlamalı
+    monkeypatch.setattr(orders, "current_business_date", lambda now=None: date(2031, 3, 4))
+    payload = orders.OrderCreate(table_number=table["number"], items=[orders.OrderItemCreate(product_id=product["id"])])
+
+    # Yazma kuyruğu atlanır: her iş parçacığı ayrı bir worker gibi kendi bağlantısıyla yazar
+    def place(_):
+        result = db_writer._run_in_session(orders._create_order_tx, (payload, None), {})
+        return result["ticket"]["daily_order_number"]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        numbers = list(pool.map(place, range(40)))
+    assert sorted(numbers) == list(range(1, 41))
@@ -0,0 +1,73 @@
+"""Menü ağacı ve anlık görüntüsü (user-024, user-025)."""
+
+def _menu(client):
+    response = client.get("/api/products/menu")
+    assert response.status_code == 200
+    return response.json()["categories"]
+
+def _bucket_of(categories, product_id):
+    for category in categories:
+        if any(p["id"] == product_id for p in category["products"]):
+            return category
+    return None
+
+def test_products_without_active_category_stay_on_menu(client, admin_headers, make_product):
+    from models import Product, get_sessionmaker
+    from services.catalog_service import UNCATEGORIZED_NAME, invalidate_menu
+    kept = make_product()
+    orphaned = make_product()
+    uncategorized = make_product()
+    assert client.delete(f"/api/products/categories/{orphaned['category']['id']}", headers=admin_headers).status_code == 200
+    db = get_sessionmaker()()
+    try:
+        db.query(Product).filter(Product.id == uncategorized["id"]).update({Product.category_id: None})
+        db.commit()
+    finally:
+        db.close()
+    invalidate_menu()
+
+    categories = _menu(client)
+    assert _bucket_of(categories, kept["id"])["id"] == kept["category"]["id"]
+    for product in (orphaned, uncategorized):
+        bucket = _bucket_of(categories, product["id"])
+        assert bucket is not None and bucket["id"] is None and bucket["name"] == UNCATEGORIZED_NAME
+    assert categories[-1]["id"] is None
+    assert all(c["id"] is not None for c in categories[:-1])
+
+def test_concurrent_misses_build_the_snapshot_once(client, monkeypatch):
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from services import catalog_service
+    builds = []
+    real_get_menu = catalog_service.get_menu
+    def slow_get_menu(db):
+        builds.append(threading.get_ident())
+        time.sleep(0.05)
+        return real_get_menu(db)
+    monkeypatch.setattr(catalog_service, "get_menu", slow_get_menu)
+    catalog_service.invalidate_menu()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        snapshots = list(pool.map(lambda _: catalog_service.get_menu_snapshot(), range(8)))
+    assert len(builds) == 1
+    assert len({s.etag for s in snapshots}) == 1
+
+def test_sold_out_products_leave_the_menu(client, admin_headers, make_table, make_product):
+    table = make_table()
+    product = make_product(track_stock=True, stock=2)
+    categories = _menu(client)
+    assert _bucket_of(categories, product["id"]) is not None
+    assert all("stock" not in p for c in categories for p in c["products"])
+
+    order = client.post("/api/orders", json={"table_number": table["number"], "items": [{"product_id": product["id"], "quantity": 2}]})
+    assert order.status_code == 200
+    assert _bucket_of(_menu(client), product["id"]) is None
+
+    assert client.put(f"/api/products/{product['id']}", json={"stock": 5}, headers=admin_headers).status_code == 200
+    assert _bucket_of(_menu(client), product["id"]) is not None
+
+def test_menu_revalidates_with_etag(client):
+    first = client.get("/api/products/menu")
+    etag = first.headers["etag"]
+    again = client.get("/api/products/menu", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.headers["etag"] == etag
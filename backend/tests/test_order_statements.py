@@ -0,0 +1,29 @@
+"""Sipariş oluşturma kalem sayısından bağımsız, sabit sayıda SQL ifadesi çalıştırır (user-003)."""
+
+def _order_statements(client, capture_statements, table, product_ids):
+    items = [{"product_id": pid, "quantity": 1} for pid in product_ids]
+    with capture_statements() as statements:
+        response = client.post("/api/orders", json={"table_number": table["number"], "items": items})
+    assert response.status_code == 200, response.text
+    assert len(response.json()["items"]) == len(product_ids)
+    return statements
+
+def test_statement_count_independent_of_item_count(client, make_table, make_product, capture_statements):
+    table = make_table()
+    first = make_product(track_stock=True, stock=1000)
+    product_ids = [first["id"]] + [make_product(category_id=first["category"]["id"], track_stock=True, stock=1000)["id"] for _ in range(19)]
+    # Günün sayaç satırı ve masa durumu ilk siparişte oluşur; ölçüm ondan sonra yapılır
+    _order_statements(client, capture_statements, table, product_ids[:1])
+
+    single = _order_statements(client, capture_statements, table, product_ids[:1])
+    many = _order_statements(client, capture_statements, table, product_ids)
+    assert len(many) == len(single), [s.sql for s in many]
+
+    product_selects = [s.sql for s in many if s.sql.lstrip().upper().startswith("SELECT") and "FROM products" in s.sql]
+    assert len(product_selects) == 1
+    assert " IN (" in product_selects[0]
+
+    for table_name in ("order_items", "stock_movements"):
+        inserts = [s for s in many if s.sql.lstrip().upper().startswith(f"INSERT INTO {table_name.upper()}")]
+        assert len(inserts) == 1, inserts
+        assert inserts[0].executemany, f"{table_name} tek executemany ile eklenmeli"
@@ -0,0 +1,34 @@
+"""Stok rezervasyonu: geçersiz miktarlar ve eşzamanlı siparişlerde aşırı satış (user-005)."""
+from concurrent.futures import ThreadPoolExecutor
+
+def test_non_positive_quantity_rejected(client, make_table, make_product):
+    table, product = make_table(), make_product(track_stock=True, stock=5)
+    for quantity in (0, -1):
+        response = client.post("/api/orders", json={"table_number": table["number"], "items": [{"product_id": product["id"], "quantity": quantity}]})
+        assert response.status_code == 422
+    assert client.get(f"/api/products/{product['id']}").json()["stock"] == 5
+
+def test_concurrent_orders_never_oversell(client, make_table, make_product):
+    import db_writer
+    from fastapi import HTTPException
+    from routers import orders
+    table, product = make_table(), make_product(track_stock=True, stock=25)
+    payload = orders.OrderCreate(table_number=table["number"], items=[orders.OrderItemCreate(product_id=product["id"], quantity=2)])
+
+    # Yazma kuyruğu atlanır: siparişler ayrı bağlantılarda gerçekten eşzamanlı yarışır,
+    # stoğu yalnızca koşullu UPDATE korur
+    def place(_):
+        try:
+            db_writer._run_in_session(orders._create_order_tx, (payload, None), {})
+            return 200
+        except HTTPException as e:
+            return e.status_code
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        codes = list(pool.map(place, range(30)))
+    accepted = codes.count(200)
+    assert set(codes) <= {200, 400}
+    stock = client.get(f"/api/products/{product['id']}").json()["stock"]
+    assert stock >= 0
+    assert stock == 25 - 2 * accepted
+    assert accepted == 12
@@ -0,0 +1,35 @@
+"""Sık çalışan sorgular indeks kullanır; orders/order_items/stock_movements tam taranmaz (user-008)."""
+import re
+
+HOT_TABLES = ("orders", "order_items", "stock_movements")
+
+def _plan(sql, parameters):
+    from models import get_engine
+    with get_engine().connect() as conn:
+        return [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", parameters).all()]
+
+def _full_scans(statements):
+    scans = []
+    for statement in statements:
+        if not statement.sql.lstrip().upper().startswith("SELECT"):
+            continue
+        for detail in _plan(statement.sql, statement.parameters):
+            # "SCAN orders USING INDEX ..." de tüm indeksi dolaşır; yalnızca SEARCH kabul edilir
+            match = re.match(r"SCAN (\w+)", detail)
+            if match and match.group(1) in HOT_TABLES:
+                scans.append((statement.sql, detail))
+    return scans
+
+def test_hot_queries_use_indexes(client, admin_headers, make_table, make_product, capture_statements):
+    table, product = make_table(), make_product(track_stock=True, stock=100)
+    response = client.post("/api/orders", json={"table_number": table["number"], "items": [{"product_id": product["id"], "quantity": 1}]})
+    assert response.status_code == 200, response.text
+
+    with capture_statements() as statements:
+        assert client.get("/api/orders/kitchen-tickets").status_code == 200
+        assert client.get("/api/orders/kitchen-tickets", params={"updated_since": "2020-01-01T00:00:00"}).status_code == 200
+        assert client.get("/api/tables/open", headers=admin_headers).status_code == 200
+        assert client.get("/api/admin/reports/daily-smart", headers=admin_headers).status_code == 200
+    touched = [s for s in statements if any(re.search(rf"\bFROM {t}\b|\bJOIN {t}\b", s.sql) for t in HOT_TABLES)]
+    assert any("stock_movements.created_at >=" in s.sql for s in touched)
+    assert _full_scans(touched) == []
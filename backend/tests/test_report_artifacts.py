@@ -0,0 +1,48 @@
+"""Önceden hesaplanan raporlar: yedek AI yorumu kalıcı olmaz, ön hesaplamayı tek worker yapar (user-020)."""
+import asyncio
+from datetime import date
+
+def _stored_version(kind, start):
+    from models import ReportArtifact, get_sessionmaker
+    db = get_sessionmaker()()
+    try:
+        return db.query(ReportArtifact.data_version).filter(ReportArtifact.kind == kind, ReportArtifact.period_start == start).scalar()
+    finally:
+        db.close()
+
+def _report(kind, day):
+    from models import get_sessionmaker
+    from services.report_artifacts import get_report
+    db = get_sessionmaker()()
+    try:
+        return asyncio.run(get_report(db, kind, day))
+    finally:
+        db.close()
+
+def test_fallback_narrative_is_marked_and_retried(client, monkeypatch):
+    from services import ai_service, report_artifacts
+    day = date(2024, 3, 5)
+    monkeypatch.setattr(ai_service, "AI_FAKE_FAIL_MODELS", {name for name, _ in ai_service.MODELS})
+    first = _report("daily", day)
+    assert "GOOGLE_API_KEY" in first["ai_analysis"]
+    assert _stored_version("daily", day).endswith(report_artifacts.AI_FALLBACK_SUFFIX)
+
+    # Yeniden deneme süresi içinde kayıt döner, AI tekrar çağrılmaz
+    assert _report("daily", day)["generated_at"] == first["generated_at"]
+
+    # Süre dolunca ve AI yanıt verince rapor yeniden hesaplanır, işaretsiz saklanır
+    monkeypatch.setattr(report_artifacts, "REPORT_AI_RETRY_MINUTES", 0)
+    monkeypatch.setattr(ai_service, "AI_FAKE_FAIL_MODELS", set())
+    second = _report("daily", day)
+    assert second["ai_analysis"].startswith("[")
+    assert not _stored_version("daily", day).endswith(report_artifacts.AI_FALLBACK_SUFFIX)
+    assert _report("daily", day)["generated_at"] == second["generated_at"]
+
+def test_precompute_day_is_claimed_once(client):
+    from db_writer import run_write
+    from services.report_artifacts import _claim_precompute
+
+    async def claim_twice():
+        return [await run_write(_claim_precompute, date(2024, 3, 6)) for _ in range(2)]
+
+    assert asyncio.run(claim_twice()) == [True, False]
@@ -0,0 +1,23 @@
+"""Rapor iş kimliği rapora giren katalog içeriği değişince değişir (user-017)."""
+
+def _job_ids():
+    from models import get_sessionmaker
+    from services.report_jobs import report_spec
+    db = get_sessionmaker()()
+    try:
+        return report_spec(db, "full", include_ai=False).id, report_spec(db, "closing").id
+    finally:
+        db.close()
+
+def test_rename_and_price_change_invalidate_reports(client, admin_headers, make_product):
+    product = make_product(price=10)
+    initial = _job_ids()
+    assert _job_ids() == initial
+
+    assert client.put(f"/api/products/{product['id']}", json={"name": product["name"] + " (yeni)"}, headers=admin_headers).status_code == 200
+    renamed = _job_ids()
+    assert renamed[0] != initial[0] and renamed[1] != initial[1]
+
+    assert client.put(f"/api/products/{product['id']}", json={"price": 12.5}, headers=admin_headers).status_code == 200
+    repriced = _job_ids()
+    assert repriced[0] != renamed[0]
@@ -0,0 +1,92 @@
+"""Garson PIN'leri: parmak izi ile giriş, eski kayıtların taranması ve PIN tükenmesi (user-022)."""
+import asyncio
+
+def test_pin_only_login_and_legacy_backfill(client, admin_headers, monkeypatch):
+    import auth
+    from models import User, UserRole, get_sessionmaker
+    created = client.post("/api/waiters", json={"full_name": "Pin Test"}, headers=admin_headers).json()
+    login = client.post("/api/auth/pin-login", json={"pin": created["pin"]})
+    assert login.status_code == 200 and login.json()["user"]["id"] == created["id"]
+
+    # Parmak izi olmayan eski kayıt: ilk PIN girişinde bulunur ve parmak izi yazılır
+    from routers.waiters import _new_unique_pin
+    db = get_sessionmaker()()
+    try:
+        pin = asyncio.run(_new_unique_pin(db))
+        legacy = User(username=f"eski-{created['id']}", password_hash=asyncio.run(auth.hash_password(pin)), role=UserRole.WAITER, is_active=True)
+        db.add(legacy)
+        db.commit()
+        legacy_id = legacy.id
+    finally:
+        db.close()
+    monkeypatch.setattr(auth, "_legacy_pins", None)
+    login = client.post("/api/auth/pin-login", json={"pin": pin})
+    assert login.status_code == 200 and login.json()["user"]["id"] == legacy_id
+    db = get_sessionmaker()()
+    try:
+        assert db.query(User.pin_fingerprint).filter(User.id == legacy_id).scalar() == auth.pin_fingerprint(pin)
+    finally:
+        db.close()
+
+def test_new_pin_never_collides_with_legacy_pin(client, monkeypatch):
+    import auth
+    from models import User, UserRole, get_sessionmaker
+    from routers import waiters
+    db = get_sessionmaker()()
+    try:
+        legacy = User(username="eski-cakisma", password_hash=asyncio.run(auth.hash_password("4321")), role=UserRole.WAITER, is_active=True)
+        db.add(legacy)
+        db.commit()
+        monkeypatch.setattr(auth, "_legacy_pins", None)
+        # Üretici önce eski garsonun PIN'ini seçer: kullanımda sayılmalı, parmak izi de yazılmalı
+        digits = iter("4321" + "8765")
+        monkeypatch.setattr(waiters.random, "randint", lambda a, b: int(next(digits)))
+        assert asyncio.run(waiters._new_unique_pin(db)) == "8765"
+        assert legacy.pin_fingerprint == auth.pin_fingerprint("4321")
+        db.rollback()
+    finally:
+        db.close()
+
+def test_pin_check_skips_hash_scan_without_legacy_rows(client, monkeypatch):
+    import auth
+    from models import get_sessionmaker
+    calls = []
+    async def counting(user, plain):
+        calls.append(user.id)
+        return False
+    monkeypatch.setattr(auth, "authenticate_password", counting)
+    monkeypatch.setattr(auth, "_legacy_pins", False)
+    db = get_sessionmaker()()
+    try:
+        assert asyncio.run(auth.pin_in_use(db, "0000-not-a-pin")) is False
+        assert asyncio.run(auth.find_user_by_pin(db, "0000-not-a-pin")) is None
+    finally:
+        db.close()
+    assert calls == []
+
+def test_username_login_refreshes_stale_fingerprint(client, admin_headers):
+    import auth
+    from models import User, get_sessionmaker
+    created = client.post("/api/waiters", json={"full_name": "Eski Anahtar"}, headers=admin_headers).json()
+    db = get_sessionmaker()()
+    try:
+        # PIN_HMAC_KEY değişmiş gibi: kayıttaki parmak izi güncel anahtarla üretilmemiş
+        db.query(User).filter(User.id == created["id"]).update({User.pin_fingerprint: "eski-anahtar"})
+        db.commit()
+    finally:
+        db.close()
+    login = client.post("/api/auth/pin-login", json={"username": created["username"], "pin": created["pin"]})
+    assert login.status_code == 200
+    db = get_sessionmaker()()
+    try:
+        assert db.query(User.pin_fingerprint).filter(User.id == created["id"]).scalar() == auth.pin_fingerprint(created["pin"])
+    finally:
+        db.close()
+
+def test_pin_exhaustion_returns_409(client, admin_headers, monkeypatch):
+    from routers import waiters
+    async def taken(db, pin):
+        return True
+    monkeypatch.setattr(waiters, "pin_in_use", taken)
+    response = client.post("/api/waiters", json={"full_name": "Dolu"}, headers=admin_headers)
+    assert response.status_code == 409
@@ -0,0 +1,65 @@
+"""Birden fazla worker: Redis pub/sub üzerinden olay dağıtımı ve ortak sıra (user-013)."""
+import asyncio
+import json
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, payload):
+        self.sent.append(json.loads(payload))
+
+    async def close(self, code=1000):
+        pass
+
+    def events(self):
+        return [m for m in self.sent if m["type"] != "welcome"]
+
+async def _wait_for(predicate, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate() and asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(0.01)
+    # Fazladan (yinelenen) teslimatlar da gelsin
+    await asyncio.sleep(0.05)
+
+def test_events_fan_out_across_workers(monkeypatch):
+    import redis.asyncio
+    import websocket_utils as wsu
+    from pubsub import RedisBackend
+
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(redis.asyncio, "from_url", lambda url, **kw: fakeredis.aioredis.FakeRedis(server=server))
+
+    async def scenario():
+        workers = [wsu.ConnectionManager(backend=RedisBackend("redis://test", "test:ws"), ping_interval=0) for _ in range(2)]
+        for worker in workers:
+            await worker.start()
+        kitchen, table3, table4, admin = FakeWebSocket(), FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        await workers[0].connect(kitchen, "kitchen", {wsu.KITCHEN_TOPIC})
+        await workers[1].connect(table3, "customer", {wsu.table_topic(3)})
+        await workers[1].connect(table4, "customer", {wsu.table_topic(4)})
+        await workers[1].connect(admin, "admin", {wsu.ADMIN_TOPIC})
+        try:
+            # Olay 1. worker'da üretilir, soketlerin çoğu 2. worker'da
+            await workers[0].publish([wsu.KITCHEN_TOPIC, wsu.ADMIN_TOPIC, wsu.table_topic(3)], {"type": "order_created", "data": {"id": 1}})
+            await workers[1].publish([wsu.ADMIN_TOPIC], {"type": "waiter_call"})
+            await _wait_for(lambda: len(admin.events()) >= 2 and kitchen.events() and table3.events())
+            return workers[0].backend.stream_id, workers[1].backend.stream_id, [w.events.last_seq for w in workers], kitchen, table3, table4, admin
+        finally:
+            for worker in workers:
+                for ws in list(worker.connections):
+                    worker.disconnect(ws)
+                await worker.stop()
+
+    stream_a, stream_b, last_seqs, kitchen, table3, table4, admin = asyncio.run(scenario())
+    assert stream_a == stream_b
+    assert [m["type"] for m in kitchen.events()] == ["order_created"]
+    assert [m["type"] for m in table3.events()] == ["order_created"]
+    assert table4.events() == []
+    assert [m["type"] for m in admin.events()] == ["order_created", "waiter_call"]
+    # Sıra numarası tüm worker'larda ortaktır; iki worker da her iki olayı tamponuna almıştır
+    assert [m["seq"] for m in admin.events()] == [1, 2]
+    assert last_seqs == [2, 2]
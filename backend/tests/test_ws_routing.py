@@ -0,0 +1,188 @@
+"""WebSocket konu yönlendirmesi: olay yalnızca ilgili abonelere, bağlantı başına bir kez (user-011)."""
+import asyncio
+import json
+import pytest
+
+class FakeWebSocket:
+    def __init__(self, name):
+        self.name = name
+        self.sent = []
+        self.closed = False
+
+    async def send_text(self, payload):
+        self.sent.append(json.loads(payload))
+
+    async def close(self, code=1000):
+        self.closed = True
+
+    def events(self):
+        return [m["type"] for m in self.sent if m["type"] != "welcome"]
+
+async def _settle():
+    # Yazıcı görevleri kuyruklarını boşaltsın
+    for _ in range(5):
+        await asyncio.sleep(0.01)
+
+@pytest.fixture
+def routed(monkeypatch):
+    """Konulara abone sahte soketlerle bir manager; modül yayın fonksiyonları ona bağlanır"""
+    import websocket_utils as wsu
+    from pubsub import InProcessBackend
+
+    async def run(scenario):
+        manager = wsu.ConnectionManager(backend=InProcessBackend(), ping_interval=0)
+        monkeypatch.setattr(wsu, "manager", manager)
+        await manager.start()
+        sockets = {}
+        for name, client_type, register in [
+            ("kitchen", "kitchen", {}), ("admin", "admin", {}),
+            ("waiter7", "waiter", {"waiter_id": 7}), ("waiter8", "waiter", {"waiter_id": 8}),
+            ("table3", "customer", {"table_number": 3}), ("table4", "customer", {"table_number": 4}),
+        ]:
+            sockets[name] = FakeWebSocket(name)
+            await manager.connect(sockets[name], client_type, wsu.topics_for_client(client_type, register))
+        # Aynı olaya iki konudan abone olan bağlantı
+        sockets["admin_table3"] = FakeWebSocket("admin_table3")
+        await manager.connect(sockets["admin_table3"], "admin", {wsu.ADMIN_TOPIC, wsu.table_topic(3)})
+        try:
+            await scenario(wsu, sockets)
+            await _settle()
+        finally:
+            for ws in list(manager.connections):
+                manager.disconnect(ws)
+            await manager.stop()
+        return {name: ws.events() for name, ws in sockets.items()}
+    return lambda scenario: asyncio.run(run(scenario))
+
+def test_topics_for_client():
+    from websocket_utils import topics_for_client
+    assert topics_for_client("kitchen") == {"kitchen"}
+    assert topics_for_client("admin", {"waiter_id": 1}) == {"admin"}
+    assert topics_for_client("waiter", {"waiter_id": 5}) == {"waiter:5"}
+    assert topics_for_client("customer", {"table_number": 9}) == {"table:9"}
+    assert topics_for_client("customer") == set()
+
+def test_order_event_reaches_only_its_table_and_waiter(routed):
+    async def scenario(wsu, sockets):
+        await wsu.broadcast_order_update({"id": 1}, "order_created", table_number=3, waiter_id=7)
+    events = routed(scenario)
+    for name in ("kitchen", "admin", "waiter7", "table3", "admin_table3"):
+        assert events[name] == ["order_created"], name
+    assert events["waiter8"] == [] and events["table4"] == []
+
+def test_table_event_without_kitchen(routed):
+    async def scenario(wsu, sockets):
+        await wsu.broadcast_table_update({"source": 3, "target": 4}, "tables_merged", [3, 4, None], kitchen=False)
+    events = routed(scenario)
+    for name in ("admin", "table3", "table4", "admin_table3"):
+        assert events[name] == ["tables_merged"], name
+    assert events["kitchen"] == [] and events["waiter7"] == [] and events["waiter8"] == []
+
+def test_admin_only_and_all_topics(routed):
+    async def scenario(wsu, sockets):
+        await wsu.broadcast_to_admin({"type": "waiter_call"})
+        await wsu.manager.broadcast_to_all({"type": "menu_changed"})
+    events = routed(scenario)
+    assert events["admin"] == ["waiter_call", "menu_changed"]
+    assert events["admin_table3"] == ["waiter_call", "menu_changed"]
+    for name in ("kitchen", "waiter7", "waiter8", "table3", "table4"):
+        assert events[name] == ["menu_changed"], name
+
+def test_sequence_numbers_increase_per_event(routed):
+    seqs = []
+    async def scenario(wsu, sockets):
+        for i in range(3):
+            await wsu.broadcast_order_update({"id": i}, "order_updated", table_number=3)
+        await _settle()
+        seqs.extend(m["seq"] for m in sockets["table3"].sent if m["type"] == "order_updated")
+    routed(scenario)
+    assert seqs == sorted(seqs) and len(set(seqs)) == 3
+
+def test_disconnect_policy_evicts_slow_consumer_once(monkeypatch):
+    import websocket_utils as wsu
+    from pubsub import InProcessBackend
+
+    class StuckWebSocket(FakeWebSocket):
+        def __init__(self, name):
+            super().__init__(name)
+            self.close_calls = 0
+
+        async def send_text(self, payload):
+            await asyncio.Event().wait()
+
+        async def close(self, code=1000):
+            self.close_calls += 1
+            await super().close(code)
+
+    async def scenario():
+        manager = wsu.ConnectionManager(max_queue=2, slow_consumer_policy="disconnect", send_timeout=60,
+                                        backend=InProcessBackend(), ping_interval=0)
+        await manager.start()
+        ws = StuckWebSocket("slow")
+        await manager.connect(ws, "kitchen", {wsu.KITCHEN_TOPIC})
+        conn = manager.connections[ws]
+        await _settle()
+        # Kuyruk dolduktan sonra gelen her olay aynı kapatmayı yeniden planlamamalı
+        for i in range(10):
+            manager._enqueue(conn, json.dumps({"type": "x", "i": i}))
+        evict_task = conn.evict_task
+        assert conn.evicting and evict_task is not None
+        await evict_task
+        assert ws.close_calls == 1
+        assert manager.connections_evicted == 1
+        assert ws not in manager.connections
+        await manager.stop()
+
+    asyncio.run(scenario())
+
+def test_outbox_is_written_in_batches(client, capture_statements):
+    import websocket_utils as wsu
+    from pubsub import InProcessBackend
+    from models import EventOutbox, get_sessionmaker
+
+    async def scenario():
+        manager = wsu.ConnectionManager(backend=InProcessBackend(), ping_interval=0)
+        manager.outbox_enabled = True
+        await manager.start()
+        for i in range(250):
+            await manager.publish([wsu.ADMIN_TOPIC], {"type": "order_updated", "data": {"id": i}})
+        # Yayın yazmayı beklemez; kalanlar stop() sırasında yazılır
+        await manager.stop()
+        return manager.backend.stream_id
+
+    with capture_statements() as statements:
+        stream_id = asyncio.run(scenario())
+    db = get_sessionmaker()()
+    try:
+        seqs = [seq for (seq,) in db.query(EventOutbox.seq).filter(EventOutbox.stream_id == stream_id).order_by(EventOutbox.seq)]
+    finally:
+        db.close()
+    assert seqs == list(range(1, 251))
+    inserts = [s for s in statements if s.sql.lstrip().upper().startswith("INSERT INTO EVENT_OUTBOX")]
+    assert 0 < len(inserts) < 250
+
+def test_outbox_prune_keeps_other_streams_within_retention(client, monkeypatch):
+    import websocket_utils as wsu
+    from models import EventOutbox, get_sessionmaker
+    monkeypatch.setattr(wsu, "WS_OUTBOX_RETENTION", 250)
+
+    def rows(stream_id, seqs):
+        return [{"stream_id": stream_id, "seq": seq, "topics": "admin", "payload": "{}"} for seq in seqs]
+
+    db = get_sessionmaker()()
+    try:
+        db.query(EventOutbox).delete()
+        # Önceki akışın seq'leri düşük: bu akışın seq budaması onlara dokunmamalı
+        wsu._append_outbox_rows(db, rows("old", range(1, 101)))
+        wsu._append_outbox_rows(db, rows("mine", range(1001, 1101)))
+        db.commit()
+        assert db.query(EventOutbox).filter(EventOutbox.stream_id == "old").count() == 100
+        # Tablo saklama sınırını aşınca diğer akışın en eski kayıtları id'ye göre budanır
+        wsu._append_outbox_rows(db, rows("mine", range(1101, 1201)))
+        db.commit()
+        assert db.query(EventOutbox).filter(EventOutbox.stream_id == "old").count() == 50
+        assert db.query(EventOutbox).filter(EventOutbox.stream_id == "mine").count() == 200
+    finally:
+        db.query(EventOutbox).delete()
+        db.commit()
+        db.close()
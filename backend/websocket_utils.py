@@ -1,5 +1,456 @@
 import json
 import asyncio
+import logging
+import os
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+from dotenv import load_dotenv
+from fastapi import WebSocket
+from sqlalchemy import delete, func, insert
+from pubsub import create_pubsub_backend
+from db_writer import run_write
+from models import EventOutbox, get_sessionmaker
+
+load_dotenv()
+
+logger = logging.getLogger("websocket")
+
+# Bağlantı başına bekleyebilecek en fazla mesaj ve kuyruk dolunca uygulanacak politika
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "100"))
+WS_SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", "drop_oldest")  # drop_oldest | disconnect
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "10"))
+
+# Yeniden bağlanan istemcilere tekrar gönderilebilecek son olaylar (halka tampon)
+WS_EVENT_BUFFER_SIZE = int(os.getenv("WS_EVENT_BUFFER_SIZE", "1000"))
+# Olaylar ayrıca event_outbox tablosuna yazılsın mı (tampondan eski boşluklar için)
+WS_EVENT_OUTBOX = os.getenv("WS_EVENT_OUTBOX", "false").strip().lower() in ("1", "true", "yes", "on")
+WS_OUTBOX_RETENTION = int(os.getenv("WS_OUTBOX_RETENTION", "10000"))
+
+# Sunucu kalp atışı: her aralıkta {"type":"ping"} gönderilir, istemci "pong" ile yanıtlar.
+# Idle süresince hiç mesaj gelmeyen (yarı açık) bağlantı kapatılır.
+WEBSOCKET_PING_INTERVAL = float(os.getenv("WEBSOCKET_PING_INTERVAL", "30"))
+WEBSOCKET_IDLE_TIMEOUT = float(os.getenv("WEBSOCKET_IDLE_TIMEOUT", "75"))
+# Worker başına toplam ve IP başına en fazla açık soket
+WEBSOCKET_MAX_CONNECTIONS = int(os.getenv("WEBSOCKET_MAX_CONNECTIONS", "100"))
+WEBSOCKET_MAX_CONNECTIONS_PER_IP = int(os.getenv("WEBSOCKET_MAX_CONNECTIONS_PER_IP", "20"))
+# nginx arkasında istemci IP'si X-Real-IP / X-Forwarded-For başlığından alınır
+WEBSOCKET_TRUST_PROXY_HEADERS = os.getenv("WEBSOCKET_TRUST_PROXY_HEADERS", "false").strip().lower() in ("1", "true", "yes", "on")
+
+# Konu adları: kitchen, admin, waiter:{id}, table:{number}
+KITCHEN_TOPIC = "kitchen"
+ADMIN_TOPIC = "admin"
+ALL_TOPIC = "*"  # tüm bağlantılar
+
+def waiter_topic(waiter_id) -> str:
+    return f"waiter:{waiter_id}"
+
+def table_topic(table_number) -> str:
+    return f"table:{table_number}"
+
+def client_address(websocket: WebSocket) -> str:
+    """Bağlantı limitleri için istemci IP'si"""
+    if WEBSOCKET_TRUST_PROXY_HEADERS:
+        forwarded = websocket.headers.get("x-real-ip") or websocket.headers.get("x-forwarded-for", "").split(",")[0].strip()
+        if forwarded:
+            return forwarded
+    return websocket.client.host if websocket.client else "unknown"
+
+def topics_for_client(client_type: str, register_msg: Optional[dict] = None) -> Set[str]:
+    """register mesajına göre bağlantının abone olacağı konular"""
+    register_msg = register_msg or {}
+    if client_type == "kitchen":
+        return {KITCHEN_TOPIC}
+    if client_type == "admin":
+        return {ADMIN_TOPIC}
+    if client_type == "waiter" and register_msg.get("waiter_id") is not None:
+        return {waiter_topic(register_msg["waiter_id"])}
+    if register_msg.get("table_number") is not None:
+        return {table_topic(register_msg["table_number"])}
+    return set()
+
+class EventLog:
+    """Son yayınlanan olayların sınırlı halka tamponu: (seq, konular, payload)"""
+    def __init__(self, size: int):
+        self.buffer: Deque[Tuple[int, FrozenSet[str], str]] = deque(maxlen=size)
+        self.last_seq = 0
+
+    def append(self, seq: int, topics: Iterable[str], payload: str):
+        self.buffer.append((seq, frozenset(topics), payload))
+        self.last_seq = max(self.last_seq, seq)
+
+    def since(self, last_seq: int, topics: Set[str]) -> Optional[List[str]]:
+        """last_seq'ten sonraki, konulara uyan olaylar; tampon boşluğu kapsamıyorsa None"""
+        if last_seq > self.last_seq:
+            return None
+        if last_seq == self.last_seq:
+            return []
+        first_seq = self.buffer[0][0] if self.buffer else self.last_seq + 1
+        if last_seq < first_seq - 1:
+            return None
+        return [payload for seq, event_topics, payload in self.buffer if seq > last_seq and _matches(event_topics, topics)]
+
+def _matches(event_topics: FrozenSet[str], topics: Set[str]) -> bool:
+    return ALL_TOPIC in event_topics or not event_topics.isdisjoint(topics)
+
+# --- Outbox (isteğe bağlı kalıcı olay kaydı) ---
+
+def _append_outbox_rows(db, rows: List[dict]):
+    """Biriken olayları tek executemany ile yazar; seq 100'ün katını geçtiyse eskileri budar.
+
+    Seq akış başınadır: bu akışın eski olayları seq'e göre, diğer akışlarınki (yeniden
+    başlatma öncesi ya da başka worker) tablodaki son WS_OUTBOX_RETENTION kaydın
+    dışında kaldıklarında id'ye göre silinir.
+    """
+    db.execute(insert(EventOutbox), rows)
+    stream_id = rows[0]["stream_id"]
+    first, last = rows[0]["seq"], rows[-1]["seq"]
+    if last // 100 != (first - 1) // 100:
+        db.execute(delete(EventOutbox).where(EventOutbox.stream_id == stream_id, EventOutbox.seq <= last - WS_OUTBOX_RETENTION))
+        max_id = db.query(func.max(EventOutbox.id)).scalar() or 0
+        db.execute(delete(EventOutbox).where(EventOutbox.stream_id != stream_id, EventOutbox.id <= max_id - WS_OUTBOX_RETENTION))
+
+def _read_outbox(stream_id: str, last_seq: int, limit: int) -> List[Tuple[int, FrozenSet[str], str]]:
+    db = get_sessionmaker()()
+    try:
+        rows = db.query(EventOutbox.seq, EventOutbox.topics, EventOutbox.payload).filter(
+            EventOutbox.stream_id == stream_id, EventOutbox.seq > last_seq
+        ).order_by(EventOutbox.seq.asc()).limit(limit).all()
+        return [(seq, frozenset(t for t in topics.split("\t") if t), payload) for seq, topics, payload in rows]
+    finally:
+        db.close()
+
+def _latest_outbox() -> Optional[Tuple[str, int]]:
+    db = get_sessionmaker()()
+    try:
+        row = db.query(EventOutbox.stream_id, EventOutbox.seq).order_by(EventOutbox.id.desc()).first()
+        return (row[0], row[1]) if row else None
+    finally:
+        db.close()
+
+class ClientConnection:
+    """Tek bir WebSocket bağlantısı: abonelikler, sınırlı giden kuyruk ve yazıcı görevi"""
+    def __init__(self, websocket: WebSocket, client_type: str, max_queue: int):
+        self.websocket = websocket
+        self.client_type = client_type
+        self.topics: Set[str] = set()
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=max_queue)
+        self.task: Optional[asyncio.Task] = None
+        self.evicting = False  # Kapatma başladı; yeni mesaj kuyruğa alınmaz
+        self.evict_task: Optional[asyncio.Task] = None  # Görev çöp toplanmasın diye referansı tutulur
+        self.last_seen = time.monotonic()
+        self.sent = 0
+        self.dropped = 0
+
+class ConnectionManager:
+    """Konu (topic) tabanlı WebSocket dağıtıcısı.
+
+    Her bağlantı register mesajıyla bir ya da daha fazla konuya abone olur; olaylar
+    yalnızca ilgili konuların abonelerine, bağlantı başına en fazla bir kez gönderilir.
+    Mesaj bir kez JSON'a çevrilir ve bağlantıların kendi kuyruklarına bırakılır; her
+    bağlantının yazıcı görevi kendi hızında gönderir, yavaş bir telefon diğerlerini
+    bekletmez. Kuyruğu dolan bağlantıda en eski mesaj atılır (drop_oldest) ya da
+    bağlantı kapatılır (disconnect); gönderimi hata veren bağlantı çıkarılır.
+
+    Yayınlar pub/sub arka ucu üzerinden geçer (bkz. pubsub.py): birden fazla worker
+    çalışırken olay bir kez yayınlanır, soketi hangi worker tutuyorsa o dağıtır.
+
+    Her olaya artan bir "seq" eklenir ve son olaylar halka tamponda tutulur. Yeniden
+    bağlanan istemci register mesajında stream_id ve last_seq gönderirse yalnızca
+    kaçırdığı olaylar gönderilir; boşluk tampondan (ve outbox'tan) büyükse "resync"
+    mesajı ile tam yenileme istenir.
+
+    Outbox açıksa olaylar yayını bekletmeden biriktirilir ve arka plandaki görev
+    tarafından toplu halde yazma kuyruğuna gönderilir.
+
+    Açık soket sayısı worker başına toplamda ve IP başına sınırlanır (admit/release);
+    kalp atışı görevi düzenli ping gönderir, yanıt vermeyen bağlantılar /ws uç
+    noktasında idle_timeout sonunda kapatılır.
+    """
+    def __init__(self, max_queue: int = WS_SEND_QUEUE_SIZE, slow_consumer_policy: str = WS_SLOW_CONSUMER_POLICY, send_timeout: float = WS_SEND_TIMEOUT, backend=None,
+                 ping_interval: float = WEBSOCKET_PING_INTERVAL, idle_timeout: float = WEBSOCKET_IDLE_TIMEOUT,
+                 max_connections: int = WEBSOCKET_MAX_CONNECTIONS, max_connections_per_ip: int = WEBSOCKET_MAX_CONNECTIONS_PER_IP):
+        self.backend = backend or create_pubsub_backend()
+        self.backend.attach(self.deliver)
+        self.max_queue = max_queue
+        self.slow_consumer_policy = slow_consumer_policy
+        self.send_timeout = send_timeout
+        self.connections: Dict[WebSocket, ClientConnection] = {}
+        self.topics: Dict[str, Set[WebSocket]] = {}
+        self.messages_published = 0
+        self.messages_delivered = 0
+        self.messages_dropped = 0
+        self.connections_evicted = 0
+        self.events = EventLog(WS_EVENT_BUFFER_SIZE)
+        self.outbox_enabled = WS_EVENT_OUTBOX
+        self._outbox_pending: List[dict] = []
+        self._outbox_flusher: Optional[asyncio.Task] = None
+        self.replays = 0
+        self.resyncs = 0
+        self.ping_interval = ping_interval
+        self.idle_timeout = idle_timeout
+        self.max_connections = max_connections
+        self.max_connections_per_ip = max_connections_per_ip
+        self.open_sockets = 0
+        self.sockets_per_ip: Dict[str, int] = {}
+        self.connections_rejected = 0
+        self.connections_idle_closed = 0
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self.outbox_enabled:
+            # Tek süreçli kurulumda sıra numaraları yeniden başlatmada outbox'tan devam eder
+            latest = await asyncio.to_thread(_latest_outbox)
+            if latest:
+                self.backend.seed(*latest)
+        await self.backend.start()
+        self.events.last_seq = await self.backend.current_sequence()
+        if self.ping_interval > 0:
+            self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+        logger.info(f"WS pub/sub backend: {self.backend.name}")
+
+    async def stop(self):
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            try:
+                await self._heartbeat
+            except asyncio.CancelledError:
+                pass
+        # Bekleyen outbox kayıtları kapanmadan yazılır
+        if self._outbox_flusher is not None:
+            await self._outbox_flusher
+        await self.backend.stop()
+
+    def _queue_outbox(self, seq: int, topics: List[str], payload: str):
+        self._outbox_pending.append({"stream_id": self.backend.stream_id, "seq": seq, "topics": "\t".join(topics), "payload": payload})
+        if self._outbox_flusher is None or self._outbox_flusher.done():
+            self._outbox_flusher = asyncio.create_task(self._flush_outbox())
+
+    async def _flush_outbox(self):
+        # Bir parti yazılırken gelen olaylar bir sonraki partide yazılır
+        while self._outbox_pending:
+            rows, self._outbox_pending = self._outbox_pending, []
+            try:
+                await run_write(_append_outbox_rows, rows)
+            except Exception as e:
+                logger.error(f"{len(rows)} olay outbox'a yazılamadı: {e}")
+
+    def admit(self, ip: str) -> Optional[str]:
+        """Yeni soket için yer ayırır; limit aşılırsa red sebebini döner"""
+        if self.open_sockets >= self.max_connections:
+            self.connections_rejected += 1
+            return "server connection limit reached"
+        if self.sockets_per_ip.get(ip, 0) >= self.max_connections_per_ip:
+            self.connections_rejected += 1
+            return "too many connections from this address"
+        self.open_sockets += 1
+        self.sockets_per_ip[ip] = self.sockets_per_ip.get(ip, 0) + 1
+        return None
+
+    def release(self, ip: str):
+        """admit ile ayrılan yeri bırakır (soket kapanınca bir kez çağrılır)"""
+        self.open_sockets = max(0, self.open_sockets - 1)
+        remaining = self.sockets_per_ip.get(ip, 0) - 1
+        if remaining > 0:
+            self.sockets_per_ip[ip] = remaining
+        else:
+            self.sockets_per_ip.pop(ip, None)
+
+    def touch(self, websocket: WebSocket):
+        """İstemciden mesaj (pong dahil) geldi: bağlantı canlı"""
+        conn = self.connections.get(websocket)
+        if conn is not None:
+            conn.last_seen = time.monotonic()
+
+    async def close_idle(self, websocket: WebSocket):
+        """idle_timeout boyunca sessiz kalan bağlantıyı kapatır"""
+        self.connections_idle_closed += 1
+        conn = self.connections.get(websocket)
+        self.disconnect(websocket)
+        logger.info(f"WS idle timeout: {conn.client_type if conn else 'unregistered'}")
+        try:
+            await websocket.close(code=1001)
+        except Exception:
+            pass
+
+    async def _heartbeat_loop(self):
+        ping = json.dumps({"type": "ping"})
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            for conn in list(self.connections.values()):
+                self._enqueue(conn, ping)
+
+    async def connect(self, websocket: WebSocket, client_type: str = "customer", topics: Iterable[str] = (), last_seq: Optional[int] = None, stream_id: Optional[str] = None):
+        topics = set(topics)
+        resume = last_seq is not None and stream_id == self.backend.stream_id
+        # Tampondan eski boşluklar outbox'tan okunur (bu bekleme kayıttan önce yapılır)
+        backlog: List[Tuple[int, FrozenSet[str], str]] = []
+        if resume and self.outbox_enabled and self.events.since(last_seq, topics) is None and last_seq < self.events.last_seq:
+            backlog = await asyncio.to_thread(_read_outbox, stream_id, last_seq, WS_OUTBOX_RETENTION)
+            if not backlog or backlog[0][0] != last_seq + 1:
+                backlog = []
+
+        # Buradan sonrası await içermez: kayıt ve tekrar gönderim arasında canlı olay araya giremez
+        conn = ClientConnection(websocket, client_type, self.max_queue)
+        self.connections[websocket] = conn
+        for topic in topics:
+            self.subscribe(websocket, topic)
+        self._enqueue(conn, json.dumps({"type": "welcome", "stream_id": self.backend.stream_id, "seq": self.events.last_seq}))
+        if last_seq is not None:
+            replay = None
+            if resume:
+                after = backlog[-1][0] if backlog else last_seq
+                tail = self.events.since(after, topics)
+                if tail is not None:
+                    replay = [payload for _, event_topics, payload in backlog if _matches(event_topics, topics)] + tail
+            if replay is None:
+                self.resyncs += 1
+                self._enqueue(conn, json.dumps({"type": "resync", "stream_id": self.backend.stream_id, "seq": self.events.last_seq}))
+            else:
+                self.replays += 1
+                for payload in replay:
+                    self._enqueue(conn, payload)
+        conn.task = asyncio.create_task(self._writer(conn))
+        logger.info(f"WS Connected: {client_type} {sorted(conn.topics)}")
+
+    def subscribe(self, websocket: WebSocket, topic: str):
+        conn = self.connections.get(websocket)
+        if conn is None:
+            return
+        self.topics.setdefault(topic, set()).add(websocket)
+        conn.topics.add(topic)
+
+    def disconnect(self, websocket: WebSocket, client_type: Optional[str] = None):
+        conn = self.connections.pop(websocket, None)
+        if conn is None:
+            return
+        for topic in conn.topics:
+            subscribers = self.topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(websocket)
+                if not subscribers:
+                    del self.topics[topic]
+        if conn.task is not None and conn.task is not asyncio.current_task():
+            conn.task.cancel()
+        logger.info(f"WS Disconnected: {conn.client_type}")
+
+    async def _writer(self, conn: ClientConnection):
+        """Bağlantının kuyruğunu sırayla gönderir; hata/zaman aşımında bağlantıyı çıkarır"""
+        try:
+            while True:
+                payload = await conn.queue.get()
+                await asyncio.wait_for(conn.websocket.send_text(payload), timeout=self.send_timeout)
+                conn.sent += 1
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.info(f"WS send failed, evicting {conn.client_type}: {e}")
+            await self._evict(conn)
+
+    async def _evict(self, conn: ClientConnection):
+        conn.evicting = True
+        if conn.websocket in self.connections:
+            self.connections_evicted += 1
+            self.disconnect(conn.websocket)
+        try:
+            await conn.websocket.close()
+        except Exception:
+            pass
+
+    def _enqueue(self, conn: ClientConnection, payload: str):
+        if conn.evicting:
+            self.messages_dropped += 1
+            conn.dropped += 1
+            return
+        try:
+            conn.queue.put_nowait(payload)
+            return
+        except asyncio.QueueFull:
+            pass
+        if self.slow_consumer_policy == "disconnect":
+            # Kapatma bir kez planlanır; kuyruk boşalana kadar gelen olaylar yalnızca atılır
+            self.messages_dropped += 1
+            conn.dropped += 1
+            conn.evicting = True
+            conn.evict_task = asyncio.create_task(self._evict(conn))
+            return
+        # drop_oldest: en eski bekleyen mesajı at, yenisini ekle
+        try:
+            conn.queue.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+        self.messages_dropped += 1
+        conn.dropped += 1
+        conn.queue.put_nowait(payload)
+
+    def subscribers(self, topics: Iterable[str]) -> Set[WebSocket]:
+        """Konuların abonelerinin birleşimi (aynı bağlantı bir kez yer alır)"""
+        targets: Set[WebSocket] = set()
+        for topic in topics:
+            if topic == ALL_TOPIC:
+                return set(self.connections.keys())
+            targets |= self.topics.get(topic, set())
+        return targets
+
+    def deliver(self, topics: List[str], payload: str, seq: Optional[int] = None) -> int:
+        """Arka uçtan gelen (önceden kodlanmış) mesajı bu süreçteki abonelerin kuyruklarına bırakır"""
+        if seq is not None:
+            self.events.append(seq, topics, payload)
+        count = 0
+        for ws in self.subscribers(topics):
+            conn = self.connections.get(ws)
+            if conn is not None:
+                self._enqueue(conn, payload)
+                count += 1
+        self.messages_delivered += count
+        return count
+
+    async def publish(self, topics: Iterable[str], message: dict):
+        """Mesaja sıra numarası ekler, bir kez JSON'a çevirip pub/sub arka ucuna yayınlar"""
+        topics = list(topics)
+        seq = await self.backend.next_sequence()
+        if seq is not None:
+            message = dict(message, seq=seq)
+        payload = json.dumps(message, default=str)
+        self.messages_published += 1
+        if self.outbox_enabled and seq is not None:
+            self._queue_outbox(seq, topics, payload)
+        await self.backend.publish(topics, payload, seq)
+
+    async def broadcast_to_all(self, message: dict):
+        await self.publish([ALL_TOPIC], message)
+
+    async def broadcast_to_kitchen(self, message: dict):
+        await self.publish([KITCHEN_TOPIC], message)
+
+    async def broadcast_to_admin(self, message: dict):
+        await self.publish([ADMIN_TOPIC], message)
+
+    def stats(self) -> dict:
+        """Bağlantı (rol bazında), kuyruk derinliği ve atılan mesaj sayaçları"""
+        depths = [conn.queue.qsize() for conn in self.connections.values()]
+        now = time.monotonic()
+        return {
+            "connections": len(self.connections),
+            "connections_by_role": dict(Counter(conn.client_type for conn in self.connections.values())),
+            "open_sockets": self.open_sockets,
+            "distinct_ips": len(self.sockets_per_ip),
+            "max_connections": self.max_connections,
+            "max_connections_per_ip": self.max_connections_per_ip,
+            "connections_rejected": self.connections_rejected,
+            "connections_idle_closed": self.connections_idle_closed,
+            "max_idle_seconds": round(max((now - conn.last_seen for conn in self.connections.values()), default=0), 1),
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths) if depths else 0,
+            "messages_published": self.messages_published,
+            "messages_delivered": self.messages_delivered,
+            "messages_dropped": self.messages_dropped,
+            "connections_evicted": self.connections_evicted,
+            "last_seq": self.events.last_seq,
+            "buffered_events": len(self.events.buffer),
+            "replays": self.replays,
+            "resyncs": self.resyncs,
+        }
 
 # Global connection manager reference
 # main.py içindeki manager nesnesine buradan erişeceğiz
@@ -10,24 +461,34 @@ def set_connection_manager(connection_manager):
     global manager
     manager = connection_manager
 
-async def broadcast_order_update(message: dict, update_type: str = "order_updated"):
+async def broadcast_order_update(message: dict, update_type: str = "order_updated", table_number: Optional[int] = None, waiter_id: Optional[int] = None):
     """
-    Sipariş güncellemelerini (yeni sipariş, durum değişimi) ilgili herkese duyurur.
+    Sipariş güncellemelerini (yeni sipariş, durum değişimi) ilgili herkese duyurur:
+    mutfak, admin, siparişin masası ve (varsa) garsonu. Diğer masalar bu olayları almaz.
     """
     if manager:
         full_message = {
             "type": update_type,
             "data": message
         }
-        # 1. Mutfağa gönder (Sipariş düştü sesi için)
-        await manager.broadcast_to_kitchen(full_message)
-        
-        # 2. Admine gönder (Takip için)
-        await manager.broadcast_to_admin(full_message)
-        
-        # 3. Müşterilere gönder (Sipariş durumu değişti bildirimi için)
-        # Not: İdeal dünyada sadece o masaya gönderilmeli ama şimdilik broadcast OK.
-        await manager.broadcast_to_all(full_message)
+        topics: List[str] = [KITCHEN_TOPIC, ADMIN_TOPIC]
+        if table_number is not None:
+            topics.append(table_topic(table_number))
+        if waiter_id is not None:
+            topics.append(waiter_topic(waiter_id))
+        await manager.publish(topics, full_message)
+
+async def broadcast_table_update(message: dict, update_type: str, table_numbers: Iterable[Optional[int]], kitchen: bool = True):
+    """
+    Masa işlemlerini (taşıma, birleştirme, kapatma) admin'e, ilgili masalara ve
+    (kitchen ise) mutfağa duyurur.
+    """
+    if manager:
+        topics: List[str] = [ADMIN_TOPIC]
+        if kitchen:
+            topics.append(KITCHEN_TOPIC)
+        topics.extend(table_topic(n) for n in table_numbers if n is not None)
+        await manager.publish(topics, {"type": update_type, "data": message})
 
 async def broadcast_to_admin(message: dict):
     """
@@ -36,4 +497,4 @@ async def broadcast_to_admin(message: dict):
     """
     if manager:
         # message objesi { "type": "waiter_call", "table_name": "...", "message": "..." } formatında olmalı
-        await manager.broadcast_to_admin(message)
\ No newline at end of file
+        await manager.broadcast_to_admin(message)